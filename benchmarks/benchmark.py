@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+# Run headless, before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy  # noqa: E402
+import pygame  # noqa: E402
+
+from flapjack.asset_manager import AssetManager  # noqa: E402
+from flapjack.bitmap_font import BitmapFont  # noqa: E402
+from flapjack.map_loaders.tiled_map_loader import TiledMapLoader  # noqa: E402
+from flapjack.sprite_batch import SpriteBatch  # noqa: E402
+from flapjack.texture_atlas import TextureAtlas  # noqa: E402
+from flapjack.tilemap import TileMap  # noqa: E402
+
+SIZES = {
+    "small": {"chunks": 4, "chunk_size": 16, "layers": 2, "font_chars": 64, "sprites": 64, "iterations": 200},
+    "medium": {"chunks": 8, "chunk_size": 32, "layers": 3, "font_chars": 96, "sprites": 256, "iterations": 500},
+    "large": {"chunks": 16, "chunk_size": 64, "layers": 4, "font_chars": 256, "sprites": 1024, "iterations": 1000},
+}
+TILE_SIZE = 16
+TILESET_COLUMNS = 16
+ANIMATED_TILE = 3
+SOLID_TILE = 4
+FONT_SEPARATOR = (255, 0, 255, 255)
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a benchmark. The decorated function sets up the benchmark and returns the operation to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Assets:
+    """Synthetic maps, fonts and atlases of a configurable size, written to a temporary directory."""
+
+    def __init__(self, directory, params, seed):
+        self.directory = directory
+        self.params = params
+        self.random = random.Random(seed)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get_tileset(self):
+        tileset = pygame.Surface((TILESET_COLUMNS * TILE_SIZE, TILESET_COLUMNS * TILE_SIZE), pygame.SRCALPHA)
+        for tile_id in range(TILESET_COLUMNS * TILESET_COLUMNS):
+            colour = (tile_id * 37 % 256, tile_id * 91 % 256, tile_id * 13 % 256, 255)
+            tileset.fill(colour, ((tile_id % TILESET_COLUMNS) * TILE_SIZE, (tile_id // TILESET_COLUMNS) * TILE_SIZE,
+                                  TILE_SIZE, TILE_SIZE))
+        return tileset
+
+    def write_tiled_map(self):
+        """Writes a square Tiled infinite map with a few empty, animated and solid tiles.
+
+        :return: The path of the map, without the file extension
+        :rtype: str
+        """
+        chunks, chunk_size, layer_count = self.params["chunks"], self.params["chunk_size"], self.params["layers"]
+        layers = []
+        for layer_index in range(layer_count):
+            layer_chunks = []
+            for chunk_y in range(chunks):
+                for chunk_x in range(chunks):
+                    data = [self.random.choice((0, 0, ANIMATED_TILE + 1, SOLID_TILE + 1, self.random.randint(1, 64)))
+                            for _ in range(chunk_size * chunk_size)]
+                    layer_chunks.append({"x": chunk_x * chunk_size, "y": chunk_y * chunk_size,
+                                         "width": chunk_size, "height": chunk_size, "data": data})
+            layers.append({"type": "tilelayer", "name": "layer " + str(layer_index), "chunks": layer_chunks})
+        AssetManager.save_json({"tilewidth": TILE_SIZE, "tileheight": TILE_SIZE, "infinite": True, "layers": layers},
+                               self.path("map.json"))
+        AssetManager.save_json({"tiles": [
+            {"id": ANIMATED_TILE, "animation": [{"tileid": ANIMATED_TILE, "duration": 100},
+                                                {"tileid": ANIMATED_TILE + 1, "duration": 100}]},
+            {"id": SOLID_TILE, "properties": [{"name": "solid", "type": "bool", "value": True}]},
+        ]}, self.path("tiles.json"))
+        return self.path("map")
+
+    def get_tilemap(self):
+        if not os.path.exists(self.path("map.json")):
+            self.write_tiled_map()
+        return TileMap(TiledMapLoader.load_map_dict(self.path("map.json")), self.get_tileset(),
+                       TiledMapLoader.load_tile_properties(self.path("tiles.json")))
+
+    def get_font_chars(self):
+        return "".join(chr(33 + i) for i in range(self.params["font_chars"]))
+
+    def get_font_surface(self, char_height=8, chars_per_row=32):
+        """Draws a font sheet in the layout BitmapFont reads, with separator lines around every character."""
+        widths = [self.random.randint(2, 6) for _ in self.get_font_chars()]
+        rows = [widths[i:i + chars_per_row] for i in range(0, len(widths), chars_per_row)]
+        surface = pygame.Surface((max(sum(row) + len(row) + 1 for row in rows), len(rows) * (char_height + 1) + 1),
+                                 pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 0))
+        for row_index in range(len(rows) + 1):
+            surface.fill(FONT_SEPARATOR, (0, row_index * (char_height + 1), surface.get_width(), 1))
+        for row_index, row in enumerate(rows):
+            x, y = 0, row_index * (char_height + 1) + 1
+            for width in row:
+                surface.fill(FONT_SEPARATOR, (x, y, 1, char_height))
+                surface.fill((255, 255, 255, 255), (x + 1, y + 1, width, char_height - 2))
+                x += width + 1
+            surface.fill(FONT_SEPARATOR, (x, y, 1, char_height))
+        return surface
+
+    def write_atlas(self):
+        """Writes a grid texture atlas with one region per sprite.
+
+        :return: The name of the atlas and the names of its sprites
+        :rtype: tuple
+        """
+        sprites = self.params["sprites"]
+        columns = int(numpy.ceil(numpy.sqrt(sprites)))
+        spritesheet = pygame.Surface((columns * TILE_SIZE, columns * TILE_SIZE), pygame.SRCALPHA)
+        atlas = {}
+        for index in range(sprites):
+            x, y = (index % columns) * TILE_SIZE, (index // columns) * TILE_SIZE
+            spritesheet.fill((index % 256, 128, 64, 255), (x, y, TILE_SIZE, TILE_SIZE))
+            atlas["sprite_" + str(index)] = {"x": x, "y": y, "width": TILE_SIZE, "height": TILE_SIZE}
+        pygame.image.save(spritesheet, self.path("atlas.png"))
+        AssetManager.save_json(atlas, self.path("atlas.json"))
+        return self.path("atlas"), list(atlas.keys())
+
+
+@benchmark("tilemap_render_chunk")
+def bench_render_chunk(assets):
+    tilemap = assets.get_tilemap()
+    chunks = list(tilemap.chunks.keys())
+    return lambda: tilemap._render_chunk(assets.random.choice(chunks))
+
+
+@benchmark("tilemap_get_chunk_surface_animated")
+def bench_get_chunk_surface(assets):
+    tilemap = assets.get_tilemap()
+    chunks = list(tilemap.chunks.keys())
+    for chunk in chunks:
+        tilemap.get_chunk_surface(chunk)
+
+    def operation():
+        tilemap.update_animations()
+        for chunk in chunks:
+            tilemap.get_chunk_surface(chunk)
+    return operation
+
+
+@benchmark("tilemap_get_overlapping_tiles")
+def bench_get_overlapping_tiles(assets):
+    tilemap = assets.get_tilemap()
+    map_size = assets.params["chunks"] * assets.params["chunk_size"] * TILE_SIZE
+    rects = [pygame.Rect(assets.random.randrange(map_size), assets.random.randrange(map_size), 48, 48)
+             for _ in range(256)]
+    return lambda: tilemap.get_overlapping_tiles(assets.random.choice(rects), properties=("solid",))
+
+
+@benchmark("bitmap_font_render_on")
+def bench_render_on(assets):
+    font = BitmapFont(assets.get_font_surface(), assets.get_font_chars())
+    surface = pygame.Surface((640, 32), pygame.SRCALPHA)
+    text = "".join(assets.random.choice(assets.get_font_chars() + "  ") for _ in range(80))
+    return lambda: font.render_on(text, (255, 255, 0), surface, (0, 0))
+
+
+@benchmark("bitmap_font_parse")
+def bench_font_parse(assets):
+    font_surface, chars = assets.get_font_surface(), assets.get_font_chars()
+    return lambda: BitmapFont(font_surface, chars)
+
+
+@benchmark("tiled_load_map_dict")
+def bench_load_map_dict(assets):
+    path = assets.write_tiled_map() + ".json"
+    return lambda: TiledMapLoader.load_map_dict(path)
+
+
+@benchmark("texture_atlas_find_region")
+def bench_find_region(assets):
+    name, sprite_names = assets.write_atlas()
+    atlas = TextureAtlas(name)
+    return lambda: atlas.find_region(assets.random.choice(sprite_names))
+
+
+@benchmark("sprite_batch_render")
+def bench_sprite_batch_render(assets):
+    name, sprite_names = assets.write_atlas()
+    batch = SpriteBatch(TextureAtlas(name))
+    surface = pygame.Surface((640, 480))
+    camera = pygame.Rect(0, 0, 640, 480)
+    random = assets.random
+    sprites = [(random.choice(sprite_names), (random.randrange(-320, 960), random.randrange(-240, 720)),
+                random.choice((0, SpriteBatch.FLIP_HORIZONTAL)), random.randrange(3))
+               for _ in range(assets.params["sprites"] * 4)]
+
+    def operation():
+        batch.clear()
+        for sprite, position, flags, layer in sprites:
+            batch.draw(sprite, position, flags, layer)
+        batch.render(surface, camera)
+    return operation
+
+
+def run_benchmark(operation, iterations, warmup):
+    """Times every call of an operation.
+
+    :return: The throughput and latency percentiles of the operation
+    :rtype: dict
+    """
+    for _ in range(warmup):
+        operation()
+    timings = numpy.empty(iterations)
+    perf_counter_ns = time.perf_counter_ns
+    for iteration in range(iterations):
+        start = perf_counter_ns()
+        operation()
+        timings[iteration] = perf_counter_ns() - start
+    timings /= 1000  # Microseconds
+    return {"iterations": iterations,
+            "ops_per_second": iterations / (timings.sum() / 1e6),
+            "mean_us": float(timings.mean()),
+            "p50_us": float(numpy.percentile(timings, 50)),
+            "p90_us": float(numpy.percentile(timings, 90)),
+            "p99_us": float(numpy.percentile(timings, 99)),
+            "max_us": float(timings.max())}
+
+
+def compare(results, baseline, threshold):
+    """Compares the median latency of each benchmark with a baseline.
+
+    :return: The names of the benchmarks that are slower than the baseline by more than the threshold
+    :rtype: list
+    """
+    regressions = []
+    print("\n{:<40}{:>14}{:>14}{:>10}".format("benchmark", "baseline p50", "p50", "change"))
+    for name, result in results.items():
+        if name not in baseline.keys():
+            continue
+        change = result["p50_us"] / baseline[name]["p50_us"] - 1
+        if change > threshold:
+            regressions.append(name)
+        print("{:<40}{:>12.1f}us{:>12.1f}us{:>+9.1%}{}".format(name, baseline[name]["p50_us"], result["p50_us"],
+                                                            change, "  REGRESSION" if change > threshold else ""))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Runs the flapjack benchmarks headless on synthetic assets.")
+    parser.add_argument("--size", choices=SIZES.keys(), default="small", help="The size of the synthetic assets")
+    parser.add_argument("--chunks", type=int, help="The width and height of the map in chunks")
+    parser.add_argument("--chunk-size", type=int, help="The width and height of each chunk in tiles")
+    parser.add_argument("--layers", type=int, help="The number of map layers")
+    parser.add_argument("--font-chars", type=int, help="The number of characters in the font")
+    parser.add_argument("--sprites", type=int, help="The number of sprites in the atlas")
+    parser.add_argument("--iterations", type=int, help="The number of timed calls of each benchmark")
+    parser.add_argument("--warmup", type=int, default=10, help="The number of untimed calls before timing")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the synthetic assets")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS.keys(), help="The benchmarks to run")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results with this JSON file written by --output")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="The fractional slowdown of the median latency reported as a regression")
+    args = parser.parse_args(args)
+
+    params = dict(SIZES[args.size])
+    for param in params.keys():
+        if getattr(args, param) is not None:
+            params[param] = getattr(args, param)
+
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.only or BENCHMARKS.keys():
+            assets = Assets(directory, params, args.seed)
+            operation = BENCHMARKS[name](assets)
+            results[name] = run_benchmark(operation, params["iterations"], args.warmup)
+            print("{:<40}{:>12.0f} ops/s  p50 {:>9.1f}us  p99 {:>9.1f}us".format(
+                name, results[name]["ops_per_second"], results[name]["p50_us"], results[name]["p99_us"]))
+    pygame.display.quit()
+
+    report = {"meta": {"python": platform.python_version(),
+                       "pygame": pygame.version.ver,
+                       "numpy": numpy.__version__,
+                       "platform": platform.platform(),
+                       "params": params,
+                       "seed": args.seed},
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["meta"]["params"] != params:
+            print("Warning: the baseline was run with different parameters", baseline["meta"]["params"])
+        if compare(results, baseline["results"], args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,12 +11,17 @@ class Animation:
         self._keyframes = keyframes
         self._keyframe = 0
 
+        self._clock = None
+
     def update(self):
-        """Updates the animation by a frame.
+        """Updates the animation by a frame. Animations registered with an AnimationClock are advanced by the clock
+        instead, so this does nothing for them.
 
         :return: True if the animation changed keyframe with this update, false if not
         :rtype: bool
         """
+        if self._clock is not None:
+            return False
         self._current_frame += 1
         self._current_frame %= self._keyframes[self._keyframe]["frames"]
 
@@ -33,3 +38,5 @@ class Animation:
         self._keyframes = keyframes
         self._keyframe = 0
         self._current_frame = 0
+        if self._clock is not None:
+            self._clock.register(self)
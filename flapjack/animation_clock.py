@@ -0,0 +1,161 @@
+import numpy
+
+
+class AnimationClock:
+    """Drives many animations from a single time delta, advancing all of them in one vectorised step.
+
+    Keyframes are timed by their "duration" in milliseconds, or by their "frames" converted with the frame duration
+    if they have no duration.
+    """
+
+    def __init__(self, frame_duration=1000 / 60):
+        """
+
+        :param frame_duration: The number of milliseconds per frame for keyframes timed in frames
+        :type frame_duration: float
+        """
+        self.frame_duration = frame_duration
+        self.ticks = 0
+
+        self._animations = []
+        self._indices = {}
+        self._keyframe_durations = []
+        self._restarting = set()
+
+        # One row per registered animation, rebuilt from the lists above when animations are added or removed
+        self._durations = numpy.zeros((0, 0))  # The duration of each keyframe, padded with zeros
+        self._periods = numpy.zeros(0)  # The duration of every keyframe added together
+        self._keyframe_counts = numpy.zeros(0, dtype=numpy.int64)
+        self._keyframes = numpy.zeros(0, dtype=numpy.int64)
+        self._elapsed = numpy.zeros(0)  # The time spent on the current keyframe
+        self._changed_ticks = numpy.zeros(0, dtype=numpy.int64)  # The tick each animation last changed keyframe on
+        self._dirty = False
+
+    def _get_keyframe_durations(self, keyframes):
+        return [keyframe["duration"] if "duration" in keyframe.keys() else keyframe["frames"] * self.frame_duration
+                for keyframe in keyframes]
+
+    def register(self, animation):
+        """Adds an animation to be advanced by the clock, starting from its current keyframe.
+        Registering an animation again restarts its timing, e.g. after its keyframes change.
+
+        :param animation: The animation
+        :type animation: Animation
+        :return: The registered animation
+        :rtype: Animation
+        """
+        self._sync()
+        durations = self._get_keyframe_durations(animation._keyframes)
+        if min(durations) <= 0:
+            raise ValueError("Every keyframe of an animation must have a positive duration")
+        if animation in self._indices.keys():
+            self._keyframe_durations[self._indices[animation]] = durations
+        else:
+            self._indices[animation] = len(self._animations)
+            self._animations.append(animation)
+            self._keyframe_durations.append(durations)
+        animation._clock = self
+        self._restarting.add(animation)
+        self._dirty = True
+        return animation
+
+    def unregister(self, animation):
+        """Stops the clock advancing an animation. The animation keeps its current keyframe.
+
+        :param animation: The animation
+        :type animation: Animation
+        :return: None
+        """
+        if animation not in self._indices.keys():
+            return
+        self._sync()
+        self._restarting.discard(animation)
+        index = self._indices.pop(animation)
+        keep = numpy.arange(len(self._animations)) != index
+        del self._animations[index]
+        del self._keyframe_durations[index]
+        for i, other in enumerate(self._animations[index:], index):
+            self._indices[other] = i
+        self._keyframes, self._elapsed = self._keyframes[keep], self._elapsed[keep]
+        self._changed_ticks = self._changed_ticks[keep]
+        animation._clock = None
+        self._dirty = True
+
+    def _sync(self):
+        """Rebuilds the arrays if animations have been registered or unregistered.
+
+        :return: None
+        """
+        if not self._dirty:
+            return
+        count = len(self._animations)
+        width = max((len(durations) for durations in self._keyframe_durations), default=0)
+        self._durations = numpy.zeros((count, width))
+        for row, durations in zip(self._durations, self._keyframe_durations):
+            row[:len(durations)] = durations
+        self._periods = self._durations.sum(axis=1)
+        self._keyframe_counts = numpy.array([len(durations) for durations in self._keyframe_durations],
+                                            dtype=numpy.int64)
+
+        added = count - len(self._keyframes)
+        self._keyframes = numpy.concatenate([self._keyframes[:count], numpy.zeros(max(added, 0), dtype=numpy.int64)])
+        self._elapsed = numpy.concatenate([self._elapsed[:count], numpy.zeros(max(added, 0))])
+        self._changed_ticks = numpy.concatenate([self._changed_ticks[:count],
+                                                 numpy.zeros(max(added, 0), dtype=numpy.int64)])
+        for animation in self._restarting:
+            index = self._indices[animation]
+            self._keyframes[index] = animation._keyframe % self._keyframe_counts[index]
+            self._elapsed[index] = 0
+        self._restarting.clear()
+        self._dirty = False
+
+    def tick(self, delta):
+        """Advances every registered animation by the given time.
+
+        :param delta: The number of milliseconds since the last tick
+        :type delta: float
+        :return: The animations that changed keyframe this tick
+        :rtype: list
+        """
+        self._sync()
+        self.ticks += 1
+        if not self._animations:
+            return []
+        self._elapsed += delta
+        rows = numpy.arange(len(self._animations))
+        # Skip whole loops of the animation first so that large deltas only need one pass per keyframe
+        changed = self._elapsed >= self._periods
+        self._elapsed %= self._periods
+        for _ in range(self._durations.shape[1]):
+            advancing = self._elapsed >= self._durations[rows, self._keyframes]
+            if not advancing.any():
+                break
+            self._elapsed[advancing] -= self._durations[advancing, self._keyframes[advancing]]
+            self._keyframes[advancing] = (self._keyframes[advancing] + 1) % self._keyframe_counts[advancing]
+            changed |= advancing
+
+        changed_indices = numpy.flatnonzero(changed)
+        self._changed_ticks[changed_indices] = self.ticks
+        changed_animations = []
+        for index, keyframe in zip(changed_indices.tolist(), self._keyframes[changed_indices].tolist()):
+            animation = self._animations[index]
+            animation._keyframe = keyframe
+            changed_animations.append(animation)
+        return changed_animations
+
+    def get_changed_since(self, tick):
+        """Gets the animations that changed keyframe after the given tick, for code that doesn't see every tick.
+
+        :param tick: The value of ticks when the caller last checked
+        :type tick: int
+        :return: The animations that changed keyframe since then
+        :rtype: list
+        """
+        self._sync()
+        return [self._animations[index] for index in numpy.flatnonzero(self._changed_ticks > tick).tolist()]
+
+    def __contains__(self, animation):
+        return animation in self._indices.keys()
+
+    def __len__(self):
+        return len(self._animations)
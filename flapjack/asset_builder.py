@@ -0,0 +1,474 @@
+import hashlib
+import os
+import posixpath
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from .asset_manager import AssetManager
+
+
+class AssetBuilder:
+    """Preprocesses a directory of assets into runtime-ready formats in an output directory, converting files in
+    parallel and skipping any whose inputs haven't changed since the last build.
+
+    Each file is converted by its kind:
+
+    - Tiled infinite maps are compiled for BinaryMapLoader into .fjm files. Maps with flipped tiles are copied
+      unchanged, as compiled maps don't store flip flags, and so are maps that aren't infinite.
+    - Tiled tile property files are converted to the dict form BinaryMapLoader.load_tile_properties reads.
+    - Directories of sprites ending in .atlas are packed into a texture atlas by AtlasPacker, e.g. player.atlas into
+      player.json and player.png.
+    - Font descriptions ending in .font.json, with the "image", "chars" and optional "spacing" and "colorkey" of a
+      bitmap font, are turned into a copy of the font image and its saved glyph metrics.
+    - Any other file is copied unchanged.
+
+    The outputs of every built input are recorded in a manifest.json in the output directory with the content hashes
+    of the inputs. BuiltAssets reads it to load the outputs. Assets whose outputs would overwrite each other, e.g.
+    player.atlas and player.json, fail the whole build before anything is written.
+    """
+
+    # Increase when the outputs of a kind of asset change, so that every asset is built again
+    version = 1
+    manifest_name = "manifest.json"
+    atlas_extension = ".atlas"
+    font_extension = ".font.json"
+
+    def __init__(self, source, output, workers=None):
+        """
+
+        :param source: The directory of assets to build
+        :type source: str
+        :param output: The directory to write the built assets and manifest to
+        :type output: str
+        :param workers: The number of processes converting assets. The number of CPUs by default, 1 to convert
+            everything in this process.
+        :type workers: int
+        """
+        self.source = os.path.abspath(source)
+        self.output = os.path.abspath(output)
+        self.workers = workers
+
+    def get_manifest_path(self):
+        return os.path.join(self.output, self.manifest_name)
+
+    def _load_manifest(self):
+        path = self.get_manifest_path()
+        if os.path.exists(path):
+            manifest = AssetManager.load_json(path)
+            if manifest.get("version") == self.version:
+                return manifest
+        return {"version": self.version, "assets": {}}
+
+    def find_assets(self):
+        """Finds every asset in the source directory.
+
+        :return: The kind and inputs of each asset by the path of the asset relative to the source directory, with /
+            separators. The inputs are relative paths too.
+        :rtype: dict
+        """
+        assets = {}
+        font_images = set()
+        for root, directories, filenames in os.walk(self.source):
+            # Don't build the output directory if it is inside the source directory
+            directories[:] = sorted(directory for directory in directories if not directory.startswith(".")
+                                    and os.path.join(root, directory) != self.output)
+            for directory in list(directories):
+                if directory.endswith(self.atlas_extension):
+                    directories.remove(directory)
+                    path = self._get_relative_path(os.path.join(root, directory))
+                    inputs = []
+                    for atlas_root, atlas_directories, atlas_filenames in os.walk(os.path.join(root, directory)):
+                        atlas_directories.sort()
+                        inputs += [self._get_relative_path(os.path.join(atlas_root, filename))
+                                   for filename in sorted(atlas_filenames)]
+                    assets[path] = ("atlas", inputs)
+            for filename in sorted(filenames):
+                if filename.startswith("."):
+                    continue
+                path = self._get_relative_path(os.path.join(root, filename))
+                if filename.endswith(self.font_extension):
+                    try:
+                        font = AssetManager.load_json(os.path.join(root, filename))
+                        image = self._get_relative_path(os.path.join(root, font["image"]))
+                    except (ValueError, KeyError, TypeError):
+                        # Building the font reports what is wrong with its description
+                        assets[path] = ("font", [path])
+                        continue
+                    font_images.add(image)
+                    assets[path] = ("font", [path, image])
+                elif filename.endswith(".json"):
+                    assets[path] = ("json", [path])
+                else:
+                    assets[path] = ("copy", [path])
+        # Font images are copied by their font
+        for image in font_images:
+            assets.pop(image, None)
+        return assets
+
+    def check_outputs(self, assets):
+        """Checks that no two assets would be built into the same output file.
+        A Tiled map only counts as writing a .fjm file if another asset writes that file too, so only those maps are
+        read.
+
+        :param assets: The assets found by find_assets
+        :type assets: dict
+        :return: None
+        """
+        owners = {self.manifest_name: "the build manifest"}
+        collisions = []
+        for path, (kind, inputs) in assets.items():
+            for output in self._get_output_names(path, kind, inputs):
+                if output in owners.keys():
+                    collisions.append((owners[output], path, output))
+                else:
+                    owners[output] = path
+        for path, (kind, inputs) in assets.items():
+            compiled_output = os.path.splitext(path)[0] + ".fjm"
+            if kind == "json" and compiled_output in owners.keys():
+                try:
+                    data = AssetManager.load_json(os.path.join(self.source, path))
+                except (OSError, ValueError):
+                    # Building the asset reports what is wrong with it
+                    continue
+                if self._is_infinite_map(data):
+                    collisions.append((owners[compiled_output], path, compiled_output))
+        if collisions:
+            raise ValueError("Assets would be built into the same output: " + ", ".join(
+                first + " and " + second + " into " + output for first, second, output in collisions))
+
+    def _get_output_names(self, path, kind, inputs):
+        """Gets the outputs an asset is built into, relative to the output directory. Only the first page of an atlas
+        is included, and Tiled maps are assumed to be copied.
+
+        :return: The paths of the outputs with / separators
+        :rtype: list
+        """
+        if kind == "atlas":
+            name = path[:-len(self.atlas_extension)]
+            return [name + ".json", name + ".png"]
+        if kind == "font":
+            if len(inputs) < 2:
+                return []
+            image = posixpath.join(posixpath.dirname(path), posixpath.basename(inputs[1]))
+            return [image, os.path.splitext(image)[0] + ".glyphs.json"]
+        return [path]
+
+    def _get_relative_path(self, path):
+        return os.path.relpath(path, self.source).replace(os.sep, "/")
+
+    def _hash_inputs(self, kind, inputs, previous_inputs):
+        """Hashes the contents of the inputs of an asset. Files with the same size and modification time as in the
+        previous build aren't read again.
+
+        :return: The hash of the asset and the [size, modification time, hash] of each input
+        :rtype: tuple
+        """
+        input_stats = {}
+        asset_hash = hashlib.sha256((kind + ":" + str(self.version)).encode())
+        for path in inputs:
+            stat = os.stat(os.path.join(self.source, path))
+            previous = previous_inputs.get(path)
+            if previous is not None and previous[:2] == [stat.st_size, stat.st_mtime_ns]:
+                file_hash = previous[2]
+            else:
+                file_hash = self.hash_file(os.path.join(self.source, path))
+            input_stats[path] = [stat.st_size, stat.st_mtime_ns, file_hash]
+            asset_hash.update((path + ":" + file_hash + "\n").encode())
+        return asset_hash.hexdigest(), input_stats
+
+    @staticmethod
+    def hash_file(filename):
+        """Hashes the contents of a file.
+
+        :param filename: The file
+        :type filename: str
+        :return: The hex SHA-256 digest of the file
+        :rtype: str
+        """
+        file_hash = hashlib.sha256()
+        with open(filename, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    def build(self, force=False, on_progress=None):
+        """Builds every asset that changed since the last build, and removes the outputs of assets that were deleted.
+
+        :param force: Whether to build every asset even if it hasn't changed
+        :type force: bool
+        :param on_progress: (Optional) function called with the path of each asset and whether it was built, skipped
+            or failed as it finishes
+        :type on_progress: callable
+        :return: The paths of the assets that were built, skipped and failed, with the errors of failed assets
+        :rtype: dict
+        """
+        manifest = self._load_manifest()
+        previous_assets = manifest["assets"]
+        assets = {}
+        jobs = {}
+        report = {"built": [], "skipped": [], "failed": {}}
+        found_assets = self.find_assets()
+        self.check_outputs(found_assets)
+        for path, (kind, inputs) in found_assets.items():
+            previous = previous_assets.get(path, {})
+            try:
+                asset_hash, input_stats = self._hash_inputs(kind, inputs, previous.get("inputs", {}))
+            except OSError as exception:
+                report["failed"][path] = type(exception).__name__ + ": " + str(exception)
+                if on_progress is not None:
+                    on_progress(path, "failed")
+                continue
+            if not force and previous.get("hash") == asset_hash and \
+                    all(os.path.exists(os.path.join(self.output, output)) for output in previous["outputs"]):
+                assets[path] = previous
+                report["skipped"].append(path)
+                if on_progress is not None:
+                    on_progress(path, "skipped")
+            else:
+                assets[path] = {"kind": kind, "hash": asset_hash, "inputs": input_stats}
+                jobs[path] = (kind, os.path.join(self.source, path), os.path.join(self.output, path))
+
+        if self.workers == 1 or len(jobs) <= 1:
+            results = ((path, self._run_job(*job)) for path, job in jobs.items())
+            self._collect(results, assets, report, on_progress)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = {path: executor.submit(self._run_job, *job) for path, job in jobs.items()}
+                self._collect(((path, future.result()) for path, future in futures.items()), assets, report,
+                              on_progress)
+
+        # Remove the outputs that are no longer produced by any asset
+        outputs = {output for asset in assets.values() for output in asset.get("outputs", [])}
+        for path, previous in previous_assets.items():
+            for output in previous.get("outputs", []):
+                if output not in outputs and os.path.exists(os.path.join(self.output, output)):
+                    os.remove(os.path.join(self.output, output))
+
+        os.makedirs(self.output, exist_ok=True)
+        manifest = {"version": self.version, "assets": dict(sorted(assets.items()))}
+        temporary_path = os.path.splitext(self.get_manifest_path())[0] + ".tmp.json"
+        AssetManager.save_json(manifest, temporary_path)
+        os.replace(temporary_path, self.get_manifest_path())
+        return report
+
+    def _collect(self, results, assets, report, on_progress):
+        for path, (outputs, info, error) in results:
+            if error is None:
+                assets[path].update(outputs=[self._get_output_path(output) for output in outputs], info=info)
+                report["built"].append(path)
+            else:
+                # Failed assets are left out of the manifest so that they are tried again by the next build
+                del assets[path]
+                report["failed"][path] = error
+            if on_progress is not None:
+                on_progress(path, "built" if error is None else "failed")
+
+    def _get_output_path(self, path):
+        return os.path.relpath(path, self.output).replace(os.sep, "/")
+
+    @staticmethod
+    def _run_job(kind, source, output):
+        """Converts an asset. This runs in a worker process.
+
+        :param kind: The kind of the asset found by find_assets
+        :type kind: str
+        :param source: The path of the asset
+        :type source: str
+        :param output: The path of the asset in the output directory, which outputs are named after
+        :type output: str
+        :return: The paths of the files written, any information needed to load them and the error message if the
+            asset couldn't be converted
+        :rtype: tuple
+        """
+        try:
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            if kind == "atlas":
+                outputs, info = AssetBuilder._build_atlas(source, output)
+            elif kind == "font":
+                outputs, info = AssetBuilder._build_font(source, output)
+            elif kind == "json":
+                outputs, info = AssetBuilder._build_json(source, output)
+            else:
+                shutil.copyfile(source, output)
+                outputs, info = [output], {}
+        except Exception as exception:
+            return [], {}, type(exception).__name__ + ": " + str(exception)
+        return outputs, info, None
+
+    @staticmethod
+    def _build_json(source, output):
+        from .map_loaders.binary_map_loader import BinaryMapLoader
+        from .map_loaders.tiled_map_loader import TiledMapLoader
+        data = AssetManager.load_json(source)
+        if AssetBuilder._is_infinite_map(data):
+            map_dict = TiledMapLoader.load_map_dict(source, compact=True)
+            flipped = any("flags" in chunk_data.keys() for chunk_data in map_dict["chunks"].values())
+            if map_dict["chunks"] and not flipped:
+                output = os.path.splitext(output)[0] + ".fjm"
+                BinaryMapLoader.compile_map(map_dict, output)
+                return [output], {"type": "map", "loader": "binary"}
+            shutil.copyfile(source, output)
+            return [output], {"type": "map", "loader": "tiled"}
+        if isinstance(data, dict) and isinstance(data.get("tiles"), list):
+            BinaryMapLoader.compile_tile_properties(TiledMapLoader.load_tile_properties(source), output)
+            return [output], {"type": "tile_properties"}
+        shutil.copyfile(source, output)
+        return [output], {}
+
+    @staticmethod
+    def _is_infinite_map(data):
+        """Checks whether JSON data is a Tiled infinite map, the only kind of map that can be loaded as a TileMap.
+
+        :param data: The JSON data
+        :return: True if the data is a Tiled map with every tile layer stored in chunks, false if not
+        :rtype: bool
+        """
+        if not isinstance(data, dict) or "tilewidth" not in data.keys() or not isinstance(data.get("layers"), list):
+            return False
+        return all("chunks" in layer.keys() for layer in data["layers"]
+                   if isinstance(layer, dict) and layer.get("type", "tilelayer") == "tilelayer")
+
+    @staticmethod
+    def _build_atlas(source, output):
+        from .atlas_packer import AtlasPacker
+        from .texture_atlas import TextureAtlas
+        name = output[:-len(AssetBuilder.atlas_extension)]
+        packer = AtlasPacker()
+        packer.add_directory(source)
+        page_count = packer.save(name)
+        pages = [TextureAtlas.get_page_name(name, page) + ".png" for page in range(page_count)]
+        return [name + ".json"] + pages, {}
+
+    @staticmethod
+    def _build_font(source, output):
+        from .bitmap_font import BitmapFont
+        font = AssetManager.load_json(source)
+        image = os.path.join(os.path.dirname(source), font["image"])
+        output_image = os.path.join(os.path.dirname(output), os.path.basename(font["image"]))
+        colorkey = font.get("colorkey")
+        bitmap_font = BitmapFont.load(image, font["chars"], font.get("spacing", 1),
+                                      None if colorkey is None else tuple(colorkey))
+        shutil.copyfile(image, output_image)
+        metrics_filename = BitmapFont.get_metrics_filename(output_image)
+        AssetManager.save_json(bitmap_font.get_metrics(), metrics_filename)
+        return [output_image, metrics_filename], {"chars": font["chars"], "spacing": font.get("spacing", 1),
+                                                  "colorkey": colorkey}
+
+
+class BuiltAssets:
+    """Loads assets from a directory written by AssetBuilder, using the manifest to find the outputs of each asset."""
+
+    def __init__(self, directory):
+        """
+
+        :param directory: The output directory of the build
+        :type directory: str
+        """
+        self.directory = directory
+        self._assets = AssetManager.load_json(os.path.join(directory, AssetBuilder.manifest_name))["assets"]
+
+    def _get_asset(self, source):
+        if source not in self._assets.keys():
+            raise KeyError(source + " was not built into " + self.directory)
+        return self._assets[source]
+
+    def get_path(self, source):
+        """Gets the path of the main output of an asset, e.g. the compiled map of a Tiled map.
+
+        :param source: The path of the asset relative to the source directory of the build, with / separators
+        :type source: str
+        :return: The path of the output
+        :rtype: str
+        """
+        return os.path.join(self.directory, self._get_asset(source)["outputs"][0])
+
+    def load_map(self, source, tileset, tile_properties=None, colorkey=None, compact=False):
+        """Loads a built Tiled map with the loader its output needs.
+
+        :param source: The path of the Tiled map relative to the source directory of the build
+        :type source: str
+        :param tileset: The tileset image as a pygame Surface
+        :type tileset: pygame.Surface
+        :param tile_properties: The (optional) path of the Tiled tile properties relative to the source directory
+        :type tile_properties: str
+        :param colorkey: The (optional) colorkey of the tileset for transparent blitting
+        :type colorkey: tuple
+        :param compact: Whether to store the map's chunk layers as numpy arrays keyed by (x, y) tuples
+        :type compact: bool
+        :return: The loaded map
+        :rtype: TileMap
+        """
+        from .map_loaders.binary_map_loader import BinaryMapLoader
+        from .map_loaders.tiled_map_loader import TiledMapLoader
+        loader = BinaryMapLoader() if self._get_asset(source)["info"]["loader"] == "binary" else TiledMapLoader()
+        if tile_properties is not None:
+            tile_properties = self.load_tile_properties(tile_properties)
+        return loader.load_map(self.get_path(source), tileset, tile_properties, colorkey, compact)
+
+    def load_tile_properties(self, source):
+        """Loads built Tiled tile properties.
+
+        :param source: The path of the Tiled tile properties relative to the source directory of the build
+        :type source: str
+        :return: The tile data in dict form
+        :rtype: dict
+        """
+        from .map_loaders.binary_map_loader import BinaryMapLoader
+        return BinaryMapLoader.load_tile_properties(self.get_path(source))
+
+    def load_atlas(self, source, **kwargs):
+        """Loads a built texture atlas.
+
+        :param source: The path of the .atlas directory, or of an atlas .json file, relative to the source directory
+        :type source: str
+        :param kwargs: Any other arguments of TextureAtlas
+        :return: The loaded atlas
+        :rtype: TextureAtlas
+        """
+        from .texture_atlas import TextureAtlas
+        return TextureAtlas(os.path.splitext(self.get_path(source))[0], **kwargs)
+
+    def load_font(self, source, **kwargs):
+        """Loads a built bitmap font using its saved glyph metrics.
+
+        :param source: The path of the .font.json description relative to the source directory of the build
+        :type source: str
+        :param kwargs: Any other arguments of BitmapFont
+        :return: The loaded font
+        :rtype: BitmapFont
+        """
+        import pygame
+        from .bitmap_font import BitmapFont
+        asset = self._get_asset(source)
+        image, metrics = (os.path.join(self.directory, output) for output in asset["outputs"])
+        font_surface = pygame.image.load(image)
+        if asset["info"]["colorkey"] is not None:
+            font_surface.set_colorkey(asset["info"]["colorkey"])
+        return BitmapFont(font_surface, asset["info"]["chars"], asset["info"]["spacing"],
+                          metrics=AssetManager.load_json(metrics), **kwargs)
+
+
+def main(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Converts a directory of assets into runtime-ready formats.")
+    parser.add_argument("source", help="The directory of assets to build")
+    parser.add_argument("output", help="The directory to write the built assets to")
+    parser.add_argument("--workers", type=int, default=None, help="The number of processes. The number of CPUs by "
+                                                                  "default.")
+    parser.add_argument("--force", action="store_true", help="Build every asset even if it hasn't changed")
+    args = parser.parse_args(args)
+
+    try:
+        report = AssetBuilder(args.source, args.output, args.workers).build(args.force)
+    except ValueError as exception:
+        print(str(exception))
+        return 1
+    for path, error in report["failed"].items():
+        print("Failed to build " + path + ": " + error)
+    print("Built " + str(len(report["built"])) + " assets, skipped " + str(len(report["skipped"])) + " unchanged, "
+          + str(len(report["failed"])) + " failed")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
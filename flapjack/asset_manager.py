@@ -1,8 +1,129 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .profiler import Profiler, profiled
+
+
+class AssetHandle:
+    """A reference to an asset cached by an AssetManager. The asset can be evicted once all its handles are released."""
+
+    def __init__(self, manager, key, asset):
+        """
+
+        :param manager: The asset manager caching the asset
+        :type manager: AssetManager
+        :param key: The cache key of the asset
+        :type key: tuple
+        :param asset: The cached asset
+        """
+        self.asset = asset
+        self._manager = manager
+        self._key = key
+        self.released = False
+
+    def release(self):
+        """Gives up this reference to the asset. Releasing a handle more than once does nothing.
+
+        :return: None
+        """
+        if not self.released:
+            self.released = True
+            self._manager._release(self._key)
+
+    def __enter__(self):
+        return self.asset
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class _CacheEntry:
+    def __init__(self):
+        self.future = Future()
+        self.references = 1
+        self.size = 0
+
+
+class LoadBatch:
+    """Class for tracking the progress of a group of assets being loaded in the background."""
+
+    def __init__(self, futures, on_progress=None):
+        """
+
+        :param futures: The futures of the assets being loaded, in order
+        :type futures: list
+        :param on_progress: (Optional) function called with the number of loaded assets and the total number of
+            assets every time an asset finishes loading. It is called from the worker that loaded the asset.
+        :type on_progress: callable
+        """
+        self.futures = futures
+        self.on_progress = on_progress
+        self._completed = 0
+        self._lock = threading.Lock()
+        for future in futures:
+            future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        with self._lock:
+            self._completed += 1
+            completed = self._completed
+        if self.on_progress is not None:
+            self.on_progress(completed, len(self.futures))
+
+    def get_progress(self):
+        """Gets the fraction of the assets that have finished loading.
+
+        :return: The progress between 0 and 1
+        :rtype: float
+        """
+        return self._completed / len(self.futures) if self.futures else 1.0
+
+    def done(self):
+        """Checks whether every asset has finished loading.
+
+        :return: True if every asset has finished loading, false if not
+        :rtype: bool
+        """
+        return all(future.done() for future in self.futures)
+
+    def result(self, timeout=None):
+        """Waits for every asset to finish loading and returns them.
+
+        :param timeout: The (optional) maximum number of seconds to wait for each asset
+        :type timeout: float
+        :return: The loaded assets in the order they were requested
+        :rtype: list
+        """
+        return [future.result(timeout) for future in self.futures]
+
+
 class AssetManager:
     """A handy class for storing any kind of assets such as images, fonts, audio, etc."""
 
-    def __init__(self):
+    def __init__(self, workers=4, executor=None, max_bytes=None):
+        """
+
+        :param workers: The number of worker threads used to load assets in the background
+        :type workers: int
+        :param executor: An (optional) concurrent.futures executor to load assets with instead of a thread pool.
+            A process pool needs the loaders, their arguments and the loaded assets to be picklable.
+        :type executor: concurrent.futures.Executor
+        :param max_bytes: The (optional) number of bytes that unreferenced cached assets are evicted to stay within.
+            Assets are measured when they load and again whenever a handle to them is released.
+        :type max_bytes: int
+        """
         self.__assets = {}
+        self.__lock = threading.Lock()
+        self.__workers = workers
+        self.__executor = executor
+
+        self.max_bytes = max_bytes
+        self.__cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self.resident_bytes = 0
 
     def add_asset(self, asset):
         """Adds an already loaded asset into the database.
@@ -11,10 +132,11 @@ class AssetManager:
         :return: The added asset
         """
         asset_type = type(asset)
-        if asset_type in self.__assets.keys():
-            self.__assets[asset_type].add(asset)
-        else:
-            self.__assets[asset_type] = {asset}
+        with self.__lock:
+            if asset_type in self.__assets.keys():
+                self.__assets[asset_type].add(asset)
+            else:
+                self.__assets[asset_type] = {asset}
         return asset
 
     def remove_asset(self, asset):
@@ -24,8 +146,9 @@ class AssetManager:
         :return: The removed asset. None if the asset was not found in the database
         """
         asset_type = type(asset)
-        if asset_type in self.__assets.keys():
-            return self.__assets[asset_type].discard(asset)
+        with self.__lock:
+            if asset_type in self.__assets.keys():
+                return self.__assets[asset_type].discard(asset)
         return None
 
     def get_assets(self):
@@ -46,6 +169,256 @@ class AssetManager:
         """
         return self.__assets[asset_type] if asset_type in self.__assets.keys() else set()
 
+    def _get_executor(self):
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix="AssetManager")
+        return self.__executor
+
+    def load_async(self, loader, *args, **kwargs):
+        """Loads an asset in the background and adds it into the database once it has loaded.
+        Assets that can't be stored in the database, such as the dicts returned by load_json, are only returned by the
+        future. The future can be awaited in a coroutine by wrapping it with asyncio.wrap_future.
+
+        :param loader: The function or class that loads the asset e.g. TextureAtlas or AssetManager.load_json
+        :type loader: callable
+        :param args: The arguments to call the loader with
+        :param kwargs: The keyword arguments to call the loader with
+        :return: The future of the loaded asset
+        :rtype: concurrent.futures.Future
+        """
+        future = self._get_executor().submit(self._call_loader, loader, *args, **kwargs)
+        future.add_done_callback(self._on_loaded)
+        return future
+
+    @staticmethod
+    @profiled("AssetManager.load")
+    def _call_loader(loader, *args, **kwargs):
+        return loader(*args, **kwargs)
+
+    def _on_loaded(self, future):
+        if not future.cancelled() and future.exception() is None and future.result().__hash__ is not None:
+            self.add_asset(future.result())
+
+    def load_batch(self, requests, on_progress=None):
+        """Loads many assets in parallel in the background, adding each into the database once it has loaded.
+
+        :param requests: The assets to load, each as a tuple of the loader and (optionally) its arguments and
+            keyword arguments e.g. [(TextureAtlas, ("sprites",)), (AssetManager.load_json, ("items",), {})]
+        :type requests: iterable
+        :param on_progress: (Optional) function called with the number of loaded assets and the total number of
+            assets every time an asset finishes loading. It is called from the worker that loaded the asset.
+        :type on_progress: callable
+        :return: The batch tracking the progress of the loads
+        :rtype: LoadBatch
+        """
+        futures = []
+        for request in requests:
+            loader, *arguments = request
+            args = arguments[0] if len(arguments) > 0 else ()
+            kwargs = arguments[1] if len(arguments) > 1 else {}
+            futures.append(self.load_async(loader, *args, **kwargs))
+        return LoadBatch(futures, on_progress)
+
+    def shutdown(self, wait=True):
+        """Stops the background loading workers.
+
+        :param wait: Whether to wait for the assets still loading to finish
+        :type wait: bool
+        :return: None
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=wait)
+            self.__executor = None
+
+    @staticmethod
+    def estimate_size(asset):
+        """Estimates the number of bytes of pixel data held by an asset.
+        Surfaces are measured from their dimensions and depth, objects with a get_memory_size method are asked and
+        other objects are measured by the surfaces stored in their attributes.
+
+        :param asset: The asset
+        :return: The estimated size of the asset in bytes
+        :rtype: int
+        """
+        import pygame
+        if isinstance(asset, pygame.Surface):
+            return asset.get_pitch() * asset.get_height()
+        if hasattr(asset, "get_memory_size"):
+            return asset.get_memory_size()
+        return sum(value.get_pitch() * value.get_height() for value in getattr(asset, "__dict__", {}).values()
+                   if isinstance(value, pygame.Surface))
+
+    @staticmethod
+    def _get_cache_key(loader, args, kwargs):
+        return loader, AssetManager._make_hashable(args), AssetManager._make_hashable(kwargs)
+
+    @staticmethod
+    def _make_hashable(value):
+        """Converts lists, dicts and sets in the arguments of a loader to hashable equivalents, recursively.
+        Other unhashable values such as numpy arrays raise TypeError, as they have no reliable key.
+
+        :param value: The value
+        :return: A hashable value that is equal for equal arguments
+        """
+        if isinstance(value, (list, tuple)):
+            return type(value).__name__, tuple(AssetManager._make_hashable(item) for item in value)
+        if isinstance(value, dict):
+            return "dict", tuple(sorted(((AssetManager._make_hashable(key), AssetManager._make_hashable(item))
+                                         for key, item in value.items()), key=repr))
+        if isinstance(value, (set, frozenset)):
+            return "set", frozenset(AssetManager._make_hashable(item) for item in value)
+        try:
+            hash(value)
+        except TypeError:
+            raise TypeError("Unhashable loader argument of type " + type(value).__name__ + " can't be used as part of "
+                            "a cache key")
+        return value
+
+    def _reserve(self, key):
+        """Adds a reference to the cache entry of a key, creating the entry if it doesn't exist.
+
+        :return: The cache entry and whether it was created
+        :rtype: tuple
+        """
+        with self.__lock:
+            entry = self.__cache.get(key)
+            if entry is not None:
+                self.cache_hits += 1
+                entry.references += 1
+                self.__cache.move_to_end(key)
+                return entry, False
+            self.cache_misses += 1
+            entry = self.__cache[key] = _CacheEntry()
+            return entry, True
+
+    def _load_entry(self, key, entry, load):
+        """Loads the asset of a cache entry and resolves the entry's future. If anything fails, the future is given
+        the exception and the entry is dropped so the asset can be loaded again.
+
+        :param key: The cache key of the entry
+        :type key: tuple
+        :param entry: The cache entry
+        :type entry: _CacheEntry
+        :param load: Function without arguments that loads or returns the asset
+        :type load: callable
+        :return: None
+        """
+        try:
+            asset = load()
+            size = self.estimate_size(asset)
+            if asset.__hash__ is not None:
+                self.add_asset(asset)
+        except BaseException as exception:
+            with self.__lock:
+                if self.__cache.get(key) is entry:
+                    del self.__cache[key]
+            entry.future.set_exception(exception)
+            return
+        if Profiler.active is not None:
+            Profiler.active.count("AssetManager.bytes_loaded", size)
+        with self.__lock:
+            entry.size = size
+            self.resident_bytes += size
+        entry.future.set_result(asset)
+        self._evict()
+
+    def acquire(self, loader, *args, **kwargs):
+        """Loads an asset, or reuses it if it was already loaded by the same loader with the same arguments.
+        The asset stays cached at least until the returned handle is released.
+
+        :param loader: The function or class that loads the asset e.g. TextureAtlas or AssetManager.load_json
+        :type loader: callable
+        :param args: The arguments to call the loader with
+        :param kwargs: The keyword arguments to call the loader with
+        :return: A handle to the asset
+        :rtype: AssetHandle
+        """
+        key = self._get_cache_key(loader, args, kwargs)
+        entry, created = self._reserve(key)
+        if created:
+            self._load_entry(key, entry, lambda: self._call_loader(loader, *args, **kwargs))
+        try:
+            return AssetHandle(self, key, entry.future.result())
+        except BaseException:
+            self._release(key)
+            raise
+
+    def acquire_async(self, loader, *args, **kwargs):
+        """Loads an asset in the background, or reuses it if it was already loaded or is loading with the same loader
+        and arguments. The asset stays cached at least until the handle is released.
+
+        :param loader: The function or class that loads the asset e.g. TextureAtlas or AssetManager.load_json
+        :type loader: callable
+        :param args: The arguments to call the loader with
+        :param kwargs: The keyword arguments to call the loader with
+        :return: The future of a handle to the asset
+        :rtype: concurrent.futures.Future
+        """
+        key = self._get_cache_key(loader, args, kwargs)
+        entry, created = self._reserve(key)
+        if created:
+            # Only the loader runs in the executor, so the manager itself never has to be pickled by a process pool
+            load_future = self._get_executor().submit(self._call_loader, loader, *args, **kwargs)
+            load_future.add_done_callback(lambda future: self._load_entry(key, entry, future.result))
+        handle_future = Future()
+
+        def on_loaded(future):
+            if future.exception() is None:
+                handle_future.set_result(AssetHandle(self, key, future.result()))
+            else:
+                self._release(key)
+                handle_future.set_exception(future.exception())
+
+        entry.future.add_done_callback(on_loaded)
+        return handle_future
+
+    def _release(self, key):
+        with self.__lock:
+            entry = self.__cache.get(key)
+            if entry is not None:
+                entry.references -= 1
+        if entry is not None and entry.future.done() and entry.future.exception() is None:
+            # Assets such as a TileMap's chunk cache can grow while in use, so measure them again
+            size = self.estimate_size(entry.future.result())
+            with self.__lock:
+                if self.__cache.get(key) is entry:
+                    self.resident_bytes += size - entry.size
+                    entry.size = size
+        self._evict()
+
+    def _evict(self):
+        """Evicts the least recently used unreferenced assets until the cache is within its byte budget.
+
+        :return: None
+        """
+        if self.max_bytes is None:
+            return
+        evicted = []
+        with self.__lock:
+            for key, entry in list(self.__cache.items()):
+                if self.resident_bytes <= self.max_bytes:
+                    break
+                if entry.references <= 0 and entry.future.done():
+                    del self.__cache[key]
+                    self.resident_bytes -= entry.size
+                    self.cache_evictions += 1
+                    evicted.append(entry.future.result())
+        for asset in evicted:
+            if asset.__hash__ is not None:
+                self.remove_asset(asset)
+
+    def get_cache_stats(self):
+        """Gets the counters of the asset cache.
+
+        :return: The hits, misses, evictions, number of cached assets and resident bytes of the cache
+        :rtype: dict
+        """
+        return {"hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "evictions": self.cache_evictions,
+                "assets": len(self.__cache),
+                "resident_bytes": self.resident_bytes}
+
     @staticmethod
     def load_json(filename):
         """Useful method for loading json data to a dict.
@@ -0,0 +1,184 @@
+import os
+
+import pygame
+
+from .asset_manager import AssetManager
+from .texture_atlas import TextureAtlas
+
+
+class AtlasPacker:
+    """Packs many sprites into the pages of a texture atlas that TextureAtlas can load.
+
+    Sprites are packed tallest first onto shelves, starting a new page once a page is full. Sprites with identical
+    pixels are only packed once and share a region.
+    """
+
+    image_extensions = (".png", ".bmp", ".gif", ".jpg", ".jpeg", ".tga")
+
+    def __init__(self, max_size=(2048, 2048), padding=1, merge_duplicates=True):
+        """
+
+        :param max_size: The maximum (width, height) of each page
+        :type max_size: tuple
+        :param padding: The number of transparent pixels between sprites, to stop neighbouring sprites bleeding into
+            each other when scaled or rotated
+        :type padding: int
+        :param merge_duplicates: Whether sprites with identical pixels share one region
+        :type merge_duplicates: bool
+        """
+        self.max_width, self.max_height = max_size
+        self.padding = padding
+        self.merge_duplicates = merge_duplicates
+        self._sprites = {}
+
+    def add_sprite(self, name, surface):
+        """Adds a sprite to be packed.
+
+        :param name: The name of the sprite in the atlas
+        :type name: str
+        :param surface: The image of the sprite
+        :type surface: pygame.Surface
+        :return: None
+        """
+        width, height = surface.get_size()
+        if width + self.padding > self.max_width or height + self.padding > self.max_height:
+            raise ValueError("Sprite " + name + " does not fit in a page of the atlas")
+        self._sprites[name] = surface
+
+    def add_directory(self, directory):
+        """Adds every image in a directory and its subdirectories. Each sprite is named by its path relative to the
+        directory, without the file extension and with / separators e.g. "player/walk_1".
+
+        :param directory: The directory of sprites
+        :type directory: str
+        :return: The number of sprites added
+        :rtype: int
+        """
+        added = 0
+        for root, directories, filenames in os.walk(directory):
+            directories.sort()
+            for filename in sorted(filenames):
+                name, extension = os.path.splitext(filename)
+                if extension.lower() in self.image_extensions:
+                    path = os.path.join(root, filename)
+                    name = os.path.join(os.path.relpath(root, directory), name).replace(os.sep, "/")
+                    self.add_sprite(name[2:] if name.startswith("./") else name, pygame.image.load(path))
+                    added += 1
+        return added
+
+    def _get_unique_sprites(self):
+        """Groups the names of sprites with identical pixels.
+
+        :return: The surface and names of each unique sprite
+        :rtype: list
+        """
+        unique = {}
+        for name, surface in self._sprites.items():
+            if self.merge_duplicates:
+                key = (surface.get_size(), pygame.image.tobytes(surface, "RGBA"))
+            else:
+                key = name
+            if key in unique.keys():
+                unique[key][1].append(name)
+            else:
+                unique[key] = (surface, [name])
+        return list(unique.values())
+
+    def pack(self):
+        """Packs the added sprites into pages.
+
+        :return: The pages, each as a surface and an atlas of {name: {"x", "y", "width", "height"}} regions
+        :rtype: list
+        """
+        sprites = sorted(self._get_unique_sprites(), key=lambda sprite: (-sprite[0].get_height(),
+                                                                          -sprite[0].get_width()))
+        pages = []
+        for surface, names in sprites:
+            width, height = surface.get_width() + self.padding, surface.get_height() + self.padding
+            for page in pages:
+                position = self._place(page["shelves"], width, height)
+                if position is not None:
+                    break
+            else:
+                page = {"shelves": [], "sprites": [], "width": 0, "height": 0}
+                pages.append(page)
+                position = self._place(page["shelves"], width, height)
+            page["sprites"].append((surface, position, names))
+            page["width"] = max(page["width"], position[0] + width)
+            page["height"] = max(page["height"], position[1] + height)
+
+        packed = []
+        for page in pages:
+            surface = pygame.Surface((page["width"] - self.padding, page["height"] - self.padding), pygame.SRCALPHA)
+            surface.fill((0, 0, 0, 0))
+            surface.blits([(sprite, position) for sprite, position, _ in page["sprites"]], doreturn=False)
+            atlas = {}
+            for sprite, (x, y), names in page["sprites"]:
+                for name in names:
+                    atlas[name] = {"x": x, "y": y, "width": sprite.get_width(), "height": sprite.get_height()}
+            packed.append((surface, dict(sorted(atlas.items()))))
+        return packed
+
+    def _place(self, shelves, width, height):
+        """Finds a place for a sprite on the shelves of a page, adding a shelf if none fit.
+
+        :param shelves: The [y, height, next x] of each shelf of the page
+        :type shelves: list
+        :param width: The width of the sprite including padding
+        :type width: int
+        :param height: The height of the sprite including padding
+        :type height: int
+        :return: The (x, y) of the sprite, or None if the page is full
+        :rtype: tuple
+        """
+        for shelf in shelves:
+            y, shelf_height, x = shelf
+            if height <= shelf_height and x + width <= self.max_width:
+                shelf[2] += width
+                return x, y
+        y = shelves[-1][0] + shelves[-1][1] if shelves else 0
+        if y + height > self.max_height:
+            return None
+        shelves.append([y, height, width])
+        return 0, y
+
+    def save(self, name, image_filetype=".png"):
+        """Packs the added sprites and writes the pages and atlas files that TextureAtlas loads.
+        The first page is written to name + image_filetype and any further pages to name_1, name_2 etc. The regions
+        of sprites on further pages have a "page" number.
+
+        :param name: The name of the atlas to write without any file extension
+        :type name: str
+        :param image_filetype: The file extension of the page images. .png by default.
+        :type image_filetype: str
+        :return: The number of pages written
+        :rtype: int
+        """
+        pages = self.pack()
+        atlas = {}
+        for page_index, (page, page_atlas) in enumerate(pages):
+            pygame.image.save(page, TextureAtlas.get_page_name(name, page_index) + image_filetype)
+            for sprite_name, region in page_atlas.items():
+                atlas[sprite_name] = dict(region, page=page_index) if page_index > 0 else region
+        AssetManager.save_json(atlas, name + ".json")
+        return len(pages)
+
+
+def main(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Packs a directory of sprites into a texture atlas.")
+    parser.add_argument("directory", help="The directory of sprites to pack")
+    parser.add_argument("name", help="The name of the atlas to write, without any file extension")
+    parser.add_argument("--max-size", type=int, nargs=2, default=(2048, 2048), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--padding", type=int, default=1)
+    parser.add_argument("--keep-duplicates", action="store_true", help="Pack identical sprites separately")
+    args = parser.parse_args(args)
+
+    packer = AtlasPacker(tuple(args.max_size), args.padding, not args.keep_duplicates)
+    sprite_count = packer.add_directory(args.directory)
+    page_count = packer.save(args.name)
+    print("Packed " + str(sprite_count) + " sprites into " + str(page_count) + " pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
+import os
+from collections import OrderedDict
+
+import numpy
 import pygame
 
+from .asset_manager import AssetManager
+from .profiler import Profiler, profiled
+from .text_layout import TextLayout
+
 
 class BitmapFont:
     """Class for loading and rendering bitmap fonts."""
-    def __init__(self, font_surface, chars, spacing=1):
+    def __init__(self, font_surface, chars, spacing=1, glyph_cache_size=512, render_cache_size=0, metrics=None,
+                 layout_cache_size=64):
         """
 
         :param font_surface: A loaded pygame surface with the font's characters
@@ -12,48 +21,123 @@ class BitmapFont:
         :type chars: str
         :param spacing: The number of pixels between each character
         :type spacing: int
+        :param glyph_cache_size: The maximum number of coloured characters kept for reuse
+        :type glyph_cache_size: int
+        :param render_cache_size: The maximum number of surfaces returned by render kept for reuse. 0 by default.
+            Cached surfaces are shared between calls with the same arguments, so don't draw on them.
+        :type render_cache_size: int
+        :param metrics: (Optional) glyph metrics from get_metrics to use instead of scanning the font surface
+        :type metrics: dict
+        :param layout_cache_size: The maximum number of text layouts kept for reuse
+        :type layout_cache_size: int
         """
         self._font_surface = font_surface
         self._chars = chars
 
+        self.glyph_cache_size = glyph_cache_size
+        self.render_cache_size = render_cache_size
+        self._glyph_cache = OrderedDict()
+        self._render_cache = OrderedDict()
+        self.layout_cache_size = layout_cache_size
+        self._layout_cache = OrderedDict()
+
         self.space_width = 0
         self.spacing = spacing
 
-        char_surfarray = pygame.surfarray.pixels2d(font_surface)
-        self.char_height = self._get_char_height(char_surfarray)
-        self._char_rects = self._get_char_rects(char_surfarray)
+        if metrics is None:
+            char_surfarray = pygame.surfarray.pixels2d(font_surface)
+            self.char_height = self._get_char_height(char_surfarray)
+            self._char_rects = self._get_char_rects(char_surfarray)
+            del char_surfarray
+        else:
+            self._set_metrics(metrics)
 
     def _get_char_height(self, char_surfarray):
-        height = 0
-        separator_colour = char_surfarray[0][0]
-        line_queue = []
-        for i, pixel in enumerate(char_surfarray[1]):
-            if pixel == separator_colour:
-                line_queue.append(i)
-                if len(line_queue) == 2:
-                    y1, y2 = line_queue
-                    return y2 - y1 - 1
+        separator_colour = char_surfarray[0, 0]
+        y1, y2 = numpy.flatnonzero(char_surfarray[1] == separator_colour)[:2]
+        return int(y2 - y1 - 1)
 
+    @profiled("BitmapFont.parse")
     def _get_char_rects(self, char_surfarray):
         char_rects = {}
-        separator_colour = char_surfarray[0][0]
-        char_rows = len(char_surfarray[0]) // (self.char_height + 1)
-        columns = len(char_surfarray)
-        for row in range(1, char_rows * (self.char_height + 1), self.char_height + 1):
-            line_queue = []
-            for column in range(columns):
-                pixel = char_surfarray[column][row]
-                if pixel == separator_colour:
-                    line_queue = [column] + line_queue
-                    if len(line_queue) == 2:
-                        x1, x2 = line_queue.pop() + 1, line_queue[0]
-                        if len(char_rects.keys()) < len(self._chars):
-                            char_rects[self._chars[len(char_rects.keys())]] = pygame.Rect(x1, row, x2 - x1,
-                                                                                          self.char_height)
-                            self.space_width += (x2 - x1)
+        separator_colour = char_surfarray[0, 0]
+        char_rows = char_surfarray.shape[1] // (self.char_height + 1)
+        rows = range(1, char_rows * (self.char_height + 1), self.char_height + 1)
+        # Each column of separators holds the separator pixels of one row of characters
+        separators = char_surfarray[:, rows.start:rows.stop:rows.step] == separator_colour
+        for row, row_separators in zip(rows, separators.T):
+            columns = numpy.flatnonzero(row_separators)
+            for x1, x2 in zip((columns[:-1] + 1).tolist(), columns[1:].tolist()):
+                if len(char_rects.keys()) < len(self._chars):
+                    char_rects[self._chars[len(char_rects.keys())]] = pygame.Rect(x1, row, x2 - x1, self.char_height)
+                    self.space_width += (x2 - x1)
         self.space_width //= len(self._chars)
         return char_rects
 
+    def get_metrics(self):
+        """Get the glyph metrics of the font so they can be saved and reused instead of scanning the font surface.
+
+        :return: The characters, character height, space width and character rects of the font
+        :rtype: dict
+        """
+        return {"chars": self._chars,
+                "size": list(self._font_surface.get_size()),
+                "char_height": self.char_height,
+                "space_width": self.space_width,
+                "rects": {char: list(rect) for char, rect in self._char_rects.items()}}
+
+    def _set_metrics(self, metrics):
+        if metrics["chars"] != self._chars or tuple(metrics["size"]) != self._font_surface.get_size():
+            raise ValueError("The glyph metrics were made for a different font")
+        self.char_height = metrics["char_height"]
+        self.space_width = metrics["space_width"]
+        self._char_rects = {char: pygame.Rect(rect) for char, rect in metrics["rects"].items()}
+
+    @staticmethod
+    def get_metrics_filename(filename):
+        """Get the name of the file the glyph metrics of a font image are saved next to it as.
+
+        :param filename: The font image file
+        :type filename: str
+        :return: The glyph metrics file
+        :rtype: str
+        """
+        return os.path.splitext(filename)[0] + ".glyphs.json"
+
+    @staticmethod
+    def load(filename, chars, spacing=1, colorkey=None, cache_metrics=False, **kwargs):
+        """Loads a font image and creates a BitmapFont from it.
+
+        :param filename: The font image file
+        :type filename: str
+        :param chars: The characters of the font image in order
+        :type chars: str
+        :param spacing: The number of pixels between each character
+        :type spacing: int
+        :param colorkey: (Optional) colorkey of the font image
+        :type colorkey: tuple
+        :param cache_metrics: Whether to save the glyph metrics next to the image the first time it is loaded
+            and reuse them on later loads instead of scanning the image
+        :type cache_metrics: bool
+        :param kwargs: Any other arguments of BitmapFont
+        :return: The loaded font
+        :rtype: BitmapFont
+        """
+        font_surface = pygame.image.load(filename)
+        if colorkey is not None:
+            font_surface.set_colorkey(colorkey)
+        if not cache_metrics:
+            return BitmapFont(font_surface, chars, spacing, **kwargs)
+
+        metrics_filename = BitmapFont.get_metrics_filename(filename)
+        if os.path.exists(metrics_filename) and os.path.getmtime(metrics_filename) >= os.path.getmtime(filename):
+            metrics = AssetManager.load_json(metrics_filename)
+            if metrics["chars"] == chars and tuple(metrics["size"]) == font_surface.get_size():
+                return BitmapFont(font_surface, chars, spacing, metrics=metrics, **kwargs)
+        font = BitmapFont(font_surface, chars, spacing, **kwargs)
+        AssetManager.save_json(font.get_metrics(), metrics_filename)
+        return font
+
     def get_char_surface(self, char):
         """Return the surface of a given character.
 
@@ -64,6 +148,59 @@ class BitmapFont:
         """
         return self._font_surface.subsurface(self._char_rects[char]) if char in self._char_rects.keys() else None
 
+    def get_char_width(self, char):
+        """Return the width of a given character.
+
+        :param char: The character
+        :type char: str
+        :return: The width of the character in pixels. None if the character is not in the font.
+        :rtype: int
+        """
+        rect = self._char_rects.get(char)
+        return None if rect is None else rect.width
+
+    def get_colorkey(self):
+        """Return the colorkey of the font surface.
+
+        :return: The colorkey. None if the font surface has no colorkey.
+        :rtype: tuple
+        """
+        return self._font_surface.get_colorkey()
+
+    def get_glyph(self, char, colour):
+        """Return the surface of a given character in the given colour, reusing it if it was made recently.
+
+        :param char: The character to get the surface for
+        :type char: str
+        :param colour: The colour of the character
+        :type colour: tuple
+        :return: The coloured character as a surface. None if the character is not in the font.
+        :rtype: pygame.Surface
+        """
+        key = (char, tuple(colour))
+        glyph = self._glyph_cache.get(key)
+        if glyph is not None:
+            self._glyph_cache.move_to_end(key)
+            return glyph
+        if char not in self._char_rects.keys():
+            return None
+        glyph = self.get_char_surface(char).copy()
+        glyph.fill(colour, special_flags=pygame.BLEND_MULT)
+        if self.glyph_cache_size > 0:
+            self._glyph_cache[key] = glyph
+            if len(self._glyph_cache) > self.glyph_cache_size:
+                self._glyph_cache.popitem(last=False)
+        return glyph
+
+    def clear_caches(self):
+        """Discards every cached coloured character, rendered surface and text layout.
+
+        :return: None
+        """
+        self._glyph_cache.clear()
+        self._render_cache.clear()
+        self._layout_cache.clear()
+
     def render(self, text, colour, flags=0):
         """Get a surface with the rendered text on it.
 
@@ -75,13 +212,24 @@ class BitmapFont:
         :return: The rendered surface
         :rtype: pygame.Surface
         """
+        key = (text, tuple(colour), flags)
+        surface = self._render_cache.get(key)
+        if surface is not None:
+            self._render_cache.move_to_end(key)
+            return surface
+
         surface = pygame.Surface(self.size(text), flags=flags)
         if self._font_surface.get_colorkey() is not None:
             surface.fill(self._font_surface.get_colorkey())
             surface.set_colorkey(self._font_surface.get_colorkey())
         self.render_on(text, colour, surface, (0, 0))
+        if self.render_cache_size > 0:
+            self._render_cache[key] = surface
+            if len(self._render_cache) > self.render_cache_size:
+                self._render_cache.popitem(last=False)
         return surface
 
+    @profiled("BitmapFont.render_on")
     def render_on(self, text, colour, surface, position):
         """Render the text directly onto a given surface.
 
@@ -97,14 +245,48 @@ class BitmapFont:
         """
         x, y = position
         char_x = 0
+        blit_sequence = []
         for char in text:
             if char in self._char_rects.keys():
-                char_surface = self.get_char_surface(char).copy()
-                char_surface.fill(colour, special_flags=pygame.BLEND_MULT)
-                surface.blit(char_surface, (x + char_x, y + 0))
+                blit_sequence.append((self.get_glyph(char, colour), (x + char_x, y)))
                 char_x += self._char_rects[char].width + self.spacing
             else:
                 char_x += self.space_width
+        surface.blits(blit_sequence, doreturn=False)
+        if Profiler.active is not None:
+            Profiler.active.count("BitmapFont.glyphs_blitted", len(blit_sequence))
+
+    def layout(self, text, width=None, align="left", line_spacing=1, spacing=None, kerning=None):
+        """Lay out a block of text with word-wrapping, newlines and alignment.
+        Laying out the same text with the same arguments again returns the same layout without measuring it again.
+
+        :param text: The text. Newlines always start a new line.
+        :type text: str
+        :param width: The (optional) width in pixels to wrap the text to. Only newlines split the text if not given.
+        :type width: int
+        :param align: How each line is aligned within the width of the layout. "left", "center" or "right".
+        :type align: str
+        :param line_spacing: The number of pixels between each line
+        :type line_spacing: int
+        :param spacing: The number of pixels between each character. The font's spacing by default.
+        :type spacing: int
+        :param kerning: The (optional) extra pixels between pairs of characters e.g. {("A", "V"): -1}
+        :type kerning: dict
+        :return: The laid out text
+        :rtype: TextLayout
+        """
+        key = (text, width, align, line_spacing, self.spacing if spacing is None else spacing,
+               None if not kerning else tuple(sorted(kerning.items())))
+        layout = self._layout_cache.get(key)
+        if layout is not None:
+            self._layout_cache.move_to_end(key)
+            return layout
+        layout = TextLayout(self, text, width, align, line_spacing, spacing, kerning)
+        if self.layout_cache_size > 0:
+            self._layout_cache[key] = layout
+            if len(self._layout_cache) > self.layout_cache_size:
+                self._layout_cache.popitem(last=False)
+        return layout
 
     def size(self, text):
         """Determine size of the rendered surface when this text is rendered.
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+
+
+class ChunkCache:
+    """A least recently used cache for rendered chunk surfaces with an optional chunk count and memory budget."""
+
+    def __init__(self, max_chunks=None, max_bytes=None, on_evict=None):
+        """
+
+        :param max_chunks: The (optional) maximum number of chunks kept in the cache
+        :type max_chunks: int
+        :param max_bytes: The (optional) maximum number of bytes of pixel data kept in the cache
+        :type max_bytes: int
+        :param on_evict: An (optional) function called with the key and surfaces of every chunk that gets evicted
+        :type on_evict: callable
+        """
+        self.max_chunks = max_chunks
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resident_bytes = 0
+
+        self._entries = OrderedDict()
+        self._sizes = {}
+
+    @staticmethod
+    def get_surfaces_size(surfaces):
+        """Estimates the number of bytes of pixel data held by a list of surfaces.
+
+        :param surfaces: The surfaces you want the size of. None entries are skipped.
+        :type surfaces: list
+        :return: The size of the surfaces in bytes
+        :rtype: int
+        """
+        return sum(surface.get_pitch() * surface.get_height() for surface in surfaces if surface is not None)
+
+    def get(self, key):
+        """Gets the surfaces cached for a chunk and marks the chunk as most recently used.
+
+        :param key: The chunk key
+        :return: The cached surfaces. None if the chunk is not in the cache.
+        :rtype: list
+        """
+        surfaces = self._entries.get(key)
+        if surfaces is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return surfaces
+
+    def peek(self, key):
+        """Gets the surfaces cached for a chunk without affecting the counters or the eviction order.
+
+        :param key: The chunk key
+        :return: The cached surfaces. None if the chunk is not in the cache.
+        :rtype: list
+        """
+        return self._entries.get(key)
+
+    def put(self, key, surfaces):
+        """Adds the surfaces of a chunk to the cache, evicting the least recently used chunks if over budget.
+
+        :param key: The chunk key
+        :param surfaces: The rendered surfaces of the chunk
+        :type surfaces: list
+        :return: The added surfaces
+        :rtype: list
+        """
+        self.discard(key)
+        size = self.get_surfaces_size(surfaces)
+        self._entries[key] = surfaces
+        self._sizes[key] = size
+        self.resident_bytes += size
+        self._evict(keep=key)
+        return surfaces
+
+    def discard(self, key):
+        """Removes a chunk from the cache without counting it as an eviction.
+
+        :param key: The chunk key
+        :return: The surfaces that were removed. None if the chunk was not in the cache.
+        :rtype: list
+        """
+        if key not in self._entries:
+            return None
+        self.resident_bytes -= self._sizes.pop(key)
+        return self._entries.pop(key)
+
+    def clear(self):
+        """Removes every chunk from the cache.
+
+        :return: None
+        """
+        self._entries.clear()
+        self._sizes.clear()
+        self.resident_bytes = 0
+
+    def _is_over_budget(self):
+        if self.max_chunks is not None and len(self._entries) > self.max_chunks:
+            return True
+        return self.max_bytes is not None and self.resident_bytes > self.max_bytes
+
+    def _evict(self, keep=None):
+        while self._is_over_budget():
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            surfaces = self.discard(key)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(key, surfaces)
+
+    def get_stats(self):
+        """Gets the counters of the cache.
+
+        :return: The hits, misses, evictions, number of chunks and resident bytes of the cache
+        :rtype: dict
+        """
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "chunks": len(self._entries),
+                "resident_bytes": self.resident_bytes}
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries))
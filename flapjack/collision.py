@@ -0,0 +1,183 @@
+import numpy
+import pygame
+
+
+class TileCollider:
+    """Finds every tile of a TileMap covered by a rect using precomputed per-property bitmasks of each chunk."""
+
+    def __init__(self, tilemap, properties=(), layers=None):
+        """
+
+        :param tilemap: The map to query
+        :type tilemap: TileMap
+        :param properties: The names of the tile properties to precompute. Others are added when first queried.
+        :type properties: tuple
+        :param layers: The (optional) indices of the layers queried by default. All layers if not given.
+        :type layers: tuple
+        """
+        self.tilemap = tilemap
+        self.layers = None if layers is None else list(layers)
+
+        # Bit 0 is set for every tile that exists, bit n for every tile whose nth property is true
+        self._property_bits = {}
+        self._mask_table = None
+        # chunk key: (layers, height, width) array of tile bitmasks
+        self._chunk_masks = {}
+        for tile_property in properties:
+            self._add_property(tile_property)
+        self._build_mask_table()
+
+        tilemap.add_tile_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stops following edits to the map and discards the tile bitmasks. Call it once the collider is no longer
+        needed, as the map otherwise keeps the collider alive.
+
+        :return: None
+        """
+        self.tilemap.remove_tile_listener(self._on_tile_changed)
+        self._chunk_masks.clear()
+
+    def _add_property(self, tile_property):
+        if tile_property not in self._property_bits.keys():
+            if len(self._property_bits) == 63:
+                raise ValueError("A TileCollider can't track more than 63 properties")
+            self._property_bits[tile_property] = 1 << (len(self._property_bits) + 1)
+
+    def _build_mask_table(self):
+        """Builds the table of property bitmasks indexed by tile id + 1, with a trailing entry for unknown tile ids.
+
+        :return: None
+        """
+        tilemap = self.tilemap
+        tile_count = len(tilemap._tile_textures)
+        max_id = max([tile_count - 1] + [int(tile_id) for tile_id in tilemap.tile_properties.keys()])
+        table = numpy.zeros(max_id + 3, dtype=numpy.uint64)
+        table[1:max_id + 2] = 1
+        for tile_id, properties in tilemap.tile_properties.items():
+            for tile_property, bit in self._property_bits.items():
+                if properties.get(tile_property, False):
+                    table[int(tile_id) + 1] |= numpy.uint64(bit)
+        self._mask_table = table
+        self._chunk_masks.clear()
+
+    def _get_required_mask(self, properties):
+        if any(tile_property not in self._property_bits.keys() for tile_property in properties):
+            for tile_property in properties:
+                self._add_property(tile_property)
+            self._build_mask_table()
+        required = 1
+        for tile_property in properties:
+            required |= self._property_bits[tile_property]
+        return numpy.uint64(required)
+
+    def _get_chunk_masks(self, chunk):
+        """Gets the bitmasks of every tile in a chunk, building them first if needed.
+
+        :param chunk: The chunk key
+        :type chunk: str or tuple
+        :return: The (layers, height, width) array of tile bitmasks
+        :rtype: numpy.ndarray
+        """
+        if chunk not in self._chunk_masks.keys():
+            layers = [numpy.asarray(layer).astype(numpy.intp) + 1 for layer in self.tilemap.chunks[chunk]["layers"]]
+            self._chunk_masks[chunk] = numpy.take(self._mask_table, numpy.stack(layers), mode="clip")
+        return self._chunk_masks[chunk]
+
+    def _on_tile_changed(self, chunk, layer_index, position, tile_id):
+        if chunk in self._chunk_masks.keys():
+            if position is None:
+                del self._chunk_masks[chunk]
+            else:
+                x, y = position
+                index = min(int(tile_id) + 1, len(self._mask_table) - 1)
+                self._chunk_masks[chunk][layer_index, y, x] = self._mask_table[index]
+
+    def _get_matches(self, rect, properties, layers):
+        """Yields the origin and matching tile grid of every chunk the rect overlaps.
+
+        :return: Generator of ((tile_x, tile_y), matches) where matches is a boolean grid of the covered tiles
+        """
+        tilemap = self.tilemap
+        if rect.width <= 0 or rect.height <= 0:
+            return
+        required = self._get_required_mask(properties)
+        layers = self.layers if layers is None else list(layers)
+        left, top = rect.left // tilemap.tile_width, rect.top // tilemap.tile_height
+        right, bottom = (rect.right - 1) // tilemap.tile_width + 1, (rect.bottom - 1) // tilemap.tile_height + 1
+
+        chunk_left, chunk_top, chunk_right, chunk_bottom = tilemap._get_chunk_range(rect)
+        for chunk_y in range(chunk_top, chunk_bottom):
+            for chunk_x in range(chunk_left, chunk_right):
+                chunk = tilemap._get_chunk_key((chunk_x, chunk_y))
+                if chunk not in tilemap.chunks.keys():
+                    continue
+                origin_x, origin_y = chunk_x * tilemap.chunk_width, chunk_y * tilemap.chunk_height
+                x1, y1 = max(left - origin_x, 0), max(top - origin_y, 0)
+                x2, y2 = min(right - origin_x, tilemap.chunk_width), min(bottom - origin_y, tilemap.chunk_height)
+                masks = self._get_chunk_masks(chunk)[:, y1:y2, x1:x2]
+                if layers is not None:
+                    masks = masks[layers]
+                yield (origin_x + x1, origin_y + y1), ((masks & required) == required).any(axis=0)
+
+    def get_colliding_tiles(self, rect, properties=(), layers=None):
+        """Get every tile covered by the rect that has the given properties set to true on any of the layers.
+        Gets any covered tiles if no properties are specified.
+
+        :param rect: The rectangle you want to check, in map coordinates
+        :type rect: pygame.Rect
+        :param properties: A list of properties that the tiles must declare to be true
+        :type properties: tuple
+        :param layers: The (optional) indices of the layers to check. The collider's layers by default.
+        :type layers: tuple
+        :return: A list of tile rectangles
+        :rtype: list
+        """
+        tile_width, tile_height = self.tilemap.tile_width, self.tilemap.tile_height
+        tiles = []
+        for (tile_x, tile_y), matches in self._get_matches(rect, properties, layers):
+            ys, xs = numpy.nonzero(matches)
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                tiles.append(pygame.Rect((tile_x + x) * tile_width, (tile_y + y) * tile_height,
+                                         tile_width, tile_height))
+        return tiles
+
+    def collides(self, rect, properties=(), layers=None):
+        """Checks whether the rect covers any tile that has the given properties set to true.
+
+        :param rect: The rectangle you want to check, in map coordinates
+        :type rect: pygame.Rect
+        :param properties: A list of properties that the tiles must declare to be true
+        :type properties: tuple
+        :param layers: The (optional) indices of the layers to check. The collider's layers by default.
+        :type layers: tuple
+        :return: True if the rect covers a matching tile, false if not
+        :rtype: bool
+        """
+        return any(matches.any() for _, matches in self._get_matches(rect, properties, layers))
+
+    def sweep(self, rect, velocity, properties=(), layers=None):
+        """Get every tile that has the given properties set to true within the bounds of the rect's whole move.
+        The tiles are sorted by their distance from the rect at the start of the move.
+
+        :param rect: The rectangle at the start of the move, in map coordinates
+        :type rect: pygame.Rect
+        :param velocity: The (x, y) distance the rect moves
+        :type velocity: tuple
+        :param properties: A list of properties that the tiles must declare to be true
+        :type properties: tuple
+        :param layers: The (optional) indices of the layers to check. The collider's layers by default.
+        :type layers: tuple
+        :return: A list of tile rectangles
+        :rtype: list
+        """
+        velocity_x, velocity_y = velocity
+        swept = rect.union(rect.move(velocity_x, velocity_y))
+        tiles = self.get_colliding_tiles(swept, properties, layers)
+
+        def distance(tile):
+            gap_x = max(tile.left - rect.right, rect.left - tile.right, 0)
+            gap_y = max(tile.top - rect.bottom, rect.top - tile.bottom, 0)
+            return gap_x + gap_y
+
+        return sorted(tiles, key=distance)
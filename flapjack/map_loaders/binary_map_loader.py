@@ -0,0 +1,127 @@
+import mmap
+import struct
+
+import numpy
+
+from .lazy_chunks import LazyChunks
+from .map_loader import MapLoader
+from ..asset_manager import AssetManager
+from ..profiler import profiled
+
+
+class BinaryChunks(LazyChunks):
+    """Mapping of the chunks in a memory-mapped compiled map file that reads each chunk when it is first accessed."""
+
+    def __init__(self, buffer, index, dtype, chunk_size, compact=False):
+        """
+
+        :param buffer: The memory-mapped map file
+        :type buffer: mmap.mmap
+        :param index: The (layer count, byte offset) of each chunk by (x, y) tuple
+        :type index: dict
+        :param dtype: The type of the tile ids in the file
+        :type dtype: numpy.dtype
+        :param chunk_size: The [width, height] of the chunks
+        :type chunk_size: list
+        :param compact: Whether to key chunks by (x, y) tuples with numpy layers instead of "x,y" strings with lists
+        :type compact: bool
+        """
+        super().__init__(index.keys(), compact)
+        self._buffer = buffer
+        self._index = index
+        self._dtype = dtype
+        self._chunk_width, self._chunk_height = chunk_size
+
+    def _load_chunk(self, key):
+        layer_count, offset = self._index[key]
+        layers = numpy.frombuffer(self._buffer, self._dtype, layer_count * self._chunk_height * self._chunk_width,
+                                  offset).reshape(layer_count, self._chunk_height, self._chunk_width)
+        # Copy the chunk out of the read-only mapping so that it can be edited
+        layers = layers.copy()
+        return {"layers": list(layers) if self.compact else layers.tolist()}
+
+
+class BinaryMapLoader(MapLoader):
+    """Loads maps compiled by compile_map, memory-mapping the file and only reading chunks when they are needed.
+
+    The file starts with a header of the magic bytes, format version, tile id size in bytes, chunk size, tile size and
+    chunk count. It is followed by an index of the x, y, layer count and byte offset of every chunk, then the tile
+    ids of each chunk as little-endian (layers, height, width) arrays.
+    """
+
+    magic = b"FJMP"
+    version = 1
+    header_format = struct.Struct("<4sHHIIIII")
+    index_dtype = numpy.dtype([("x", "<i4"), ("y", "<i4"), ("layers", "<u4"), ("offset", "<u8")])
+
+    @staticmethod
+    def compile_map(map_dict, filename):
+        """Writes map data in dict form to a compiled map file. Tile flip flags are not stored.
+
+        :param map_dict: The map data in dict form, with "x,y" string or (x, y) tuple chunk keys
+        :type map_dict: dict
+        :param filename: The file to write
+        :type filename: str
+        :return: None
+        """
+        chunk_width, chunk_height = map_dict["chunk_size"]
+        tile_width, tile_height = map_dict["tile_size"]
+        chunks = []
+        max_id = 0
+        for chunk, chunk_data in map_dict["chunks"].items():
+            chunk_x, chunk_y = (int(i) for i in chunk.split(",")) if isinstance(chunk, str) else chunk
+            layers = numpy.asarray(chunk_data["layers"], dtype=numpy.int64).reshape(-1, chunk_height, chunk_width)
+            max_id = max(max_id, int(layers.max(initial=0)))
+            chunks.append((chunk_x, chunk_y, layers))
+        dtype = numpy.dtype("<i2" if max_id <= numpy.iinfo(numpy.int16).max else "<i4")
+
+        index = numpy.zeros(len(chunks), dtype=BinaryMapLoader.index_dtype)
+        data_start = BinaryMapLoader.header_format.size + index.nbytes
+        offset = data_start + (-data_start % 8)
+        for entry, (chunk_x, chunk_y, layers) in zip(index, chunks):
+            entry["x"], entry["y"], entry["layers"], entry["offset"] = chunk_x, chunk_y, len(layers), offset
+            offset += layers.size * dtype.itemsize
+
+        with open(filename, "wb") as map_file:
+            map_file.write(BinaryMapLoader.header_format.pack(BinaryMapLoader.magic, BinaryMapLoader.version,
+                                                              dtype.itemsize, chunk_width, chunk_height,
+                                                              tile_width, tile_height, len(chunks)))
+            map_file.write(index.tobytes())
+            map_file.write(bytes(-data_start % 8))
+            for _, _, layers in chunks:
+                map_file.write(layers.astype(dtype).tobytes())
+
+    @staticmethod
+    def compile_tile_properties(tile_properties, filename):
+        """Writes tile properties in dict form to a file that load_tile_properties can read.
+
+        :param tile_properties: The properties for tiles in dict form
+        :type tile_properties: dict
+        :param filename: The file to write
+        :type filename: str
+        :return: None
+        """
+        AssetManager.save_json(tile_properties, filename)
+
+    @staticmethod
+    @profiled("BinaryMapLoader.load_map_dict")
+    def load_map_dict(filename, compact=False):
+        with open(filename, "rb") as map_file:
+            buffer = mmap.mmap(map_file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = BinaryMapLoader.header_format.unpack_from(buffer, 0)
+        magic, version, itemsize, chunk_width, chunk_height, tile_width, tile_height, chunk_count = header
+        if magic != BinaryMapLoader.magic or version != BinaryMapLoader.version:
+            raise ValueError(filename + " is not a compiled map of version " + str(BinaryMapLoader.version))
+
+        entries = numpy.frombuffer(buffer, BinaryMapLoader.index_dtype, chunk_count, BinaryMapLoader.header_format.size)
+        index = {(x, y): (layers, offset) for x, y, layers, offset in entries.tolist()}
+        dtype = numpy.dtype("<i2" if itemsize == 2 else "<i4")
+        chunk_size = [chunk_width, chunk_height]
+        return {"chunks": BinaryChunks(buffer, index, dtype, chunk_size, compact),
+                "chunk_size": chunk_size,
+                "tile_size": [tile_width, tile_height],
+                "compact": compact}
+
+    @staticmethod
+    def load_tile_properties(filename):
+        return AssetManager.load_json(filename)
@@ -0,0 +1,125 @@
+import threading
+from abc import abstractmethod
+from collections.abc import Mapping
+
+from ..profiler import Profiler, profiled
+
+
+class LazyChunks(Mapping):
+    """Generic mapping of map chunks that loads each chunk's tile data when it is first accessed and can unload it
+    again to bound memory use. Loaded chunks are private copies, so editing them never changes the source.
+
+    Chunks that aren't in the source, e.g. ones created by TileMap.set_tiles, can be added by assigning them. Added
+    chunks are only held in memory and are never unloaded.
+    """
+
+    def __init__(self, chunk_keys, compact=False):
+        """
+
+        :param chunk_keys: The (x, y) tuples of every chunk in the map
+        :type chunk_keys: iterable
+        :param compact: Whether to key chunks by (x, y) tuples with numpy layers instead of "x,y" strings with lists
+        :type compact: bool
+        """
+        self._chunk_keys = set(chunk_keys)
+        self.compact = compact
+        self._chunks = {}
+        self._created_chunks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_index_key(chunk):
+        if isinstance(chunk, str):
+            chunk_x, chunk_y = chunk.split(",")
+            return int(chunk_x), int(chunk_y)
+        return tuple(chunk)
+
+    def _get_map_key(self, key):
+        return key if self.compact else str(key[0]) + "," + str(key[1])
+
+    @abstractmethod
+    def _load_chunk(self, key):
+        """Loads the tile data of a chunk.
+
+        :param key: The (x, y) of the chunk
+        :type key: tuple
+        :return: The chunk in dict form, with layers as numpy arrays if compact or nested lists if not
+        :rtype: dict
+        """
+        pass
+
+    @profiled("LazyChunks.load_chunk")
+    def _load(self, key):
+        chunk_data = self._load_chunk(key)
+        if Profiler.active is not None:
+            Profiler.active.count("LazyChunks.chunks_loaded")
+        return chunk_data
+
+    def __getitem__(self, chunk):
+        key = self._get_index_key(chunk)
+        chunk_data = self._created_chunks.get(key)
+        if chunk_data is not None:
+            return chunk_data
+        chunk_data = self._chunks.get(key)
+        if chunk_data is None:
+            if key not in self._chunk_keys:
+                raise KeyError(chunk)
+            with self._lock:
+                chunk_data = self._chunks.get(key)
+                if chunk_data is None:
+                    chunk_data = self._chunks[key] = self._load(key)
+        return chunk_data
+
+    def __setitem__(self, chunk, chunk_data):
+        key = self._get_index_key(chunk)
+        with self._lock:
+            self._created_chunks[key] = chunk_data
+            self._chunks.pop(key, None)
+
+    def __contains__(self, chunk):
+        try:
+            key = self._get_index_key(chunk)
+        except (TypeError, ValueError):
+            return False
+        return key in self._chunk_keys or key in self._created_chunks.keys()
+
+    def __iter__(self):
+        for key in self._chunk_keys:
+            yield self._get_map_key(key)
+        for key in list(self._created_chunks.keys()):
+            if key not in self._chunk_keys:
+                yield self._get_map_key(key)
+
+    def __len__(self):
+        return len(self._chunk_keys | self._created_chunks.keys())
+
+    def is_loaded(self, chunk):
+        """Checks whether the tile data of a chunk is loaded.
+
+        :param chunk: The chunk key
+        :type chunk: str or tuple
+        :return: True if the chunk is loaded, false if not
+        :rtype: bool
+        """
+        key = self._get_index_key(chunk)
+        return key in self._chunks.keys() or key in self._created_chunks.keys()
+
+    def get_loaded_chunks(self):
+        """Gets the keys of the chunks whose tile data is loaded.
+
+        :return: The chunk keys
+        :rtype: list
+        """
+        keys = list(self._chunks.keys()) + list(self._created_chunks.keys())
+        return [self._get_map_key(key) for key in keys]
+
+    def unload(self, chunk):
+        """Discards the loaded tile data of a chunk, including any edits made to it.
+        It is loaded again from the source the next time it is accessed. Added chunks are never unloaded.
+
+        :param chunk: The chunk key
+        :type chunk: str or tuple
+        :return: None
+        """
+        with self._lock:
+            self._chunks.pop(self._get_index_key(chunk), None)
@@ -1,39 +1,48 @@
 from abc import ABC, abstractmethod
 
+from ..profiler import profiled
 from ..tilemap import TileMap
 
 
 class MapLoader(ABC):
     """Generic class for loading maps into flapjack from different formats."""
 
-    def load_map(self, filename, tileset, tile_properties=None, colorkey=None):
+    @profiled("MapLoader.load_map")
+    def load_map(self, filename, tileset, tile_properties=None, colorkey=None, compact=False):
         """Generates a new map instance from the file given.
 
         :param filename: The name of the file
         :type filename: str
         :param tileset: The tileset image as a pygame Surface
         :type tileset: pygame.Surface
-        :param tile_properties: The (optional) properties for tiles as a filename to be loaded
-        :type tile_properties: str
+        :param tile_properties: The (optional) properties for tiles as a filename to be loaded, or already loaded
+            in dict form
+        :type tile_properties: str or dict
         :param colorkey: The (optional) colorkey of the tileset for transparent blitting
         :type colorkey: tuple
+        :param compact: Whether to store the map's chunk layers as numpy arrays keyed by (x, y) tuples
+        :type compact: bool
         :return: The generated TileMap
         :rtype TileMap
         """
-        map_dict = self.load_map_dict(filename)
+        map_dict = self.load_map_dict(filename, compact=compact)
         if tile_properties is None:
-            tilemap = TileMap(map_dict, tileset, colorkey=colorkey)
+            tilemap = TileMap(map_dict, tileset, colorkey=colorkey, compact=compact)
         else:
-            tilemap = TileMap(map_dict, tileset, self.load_tile_properties(tile_properties), colorkey)
+            if not isinstance(tile_properties, dict):
+                tile_properties = self.load_tile_properties(tile_properties)
+            tilemap = TileMap(map_dict, tileset, tile_properties, colorkey, compact=compact)
         return tilemap
 
     @staticmethod
     @abstractmethod
-    def load_map_dict(filename):
+    def load_map_dict(filename, compact=False):
         """Converts and returns the map data into a formatted dictionary for a TileMap.
 
         :param filename: The map file you want to load
         :type filename: str
+        :param compact: Whether to key chunks by (x, y) tuples and store their layers as 2D numpy arrays
+        :type compact: bool
         :return: The map data in dict form
         :rtype: dict
         """
@@ -0,0 +1,157 @@
+import json
+import mmap
+import re
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed for compact tile maps
+    numpy = None
+
+from .lazy_chunks import LazyChunks
+from .tiled_map_loader import TiledMapLoader
+from ..profiler import profiled
+
+
+class StreamingTiledChunks(LazyChunks):
+    """Mapping of the chunks of a memory-mapped Tiled infinite map that parses each chunk when it is first accessed."""
+
+    def __init__(self, buffer, index, layers, chunk_size, compact=False):
+        """
+
+        :param buffer: The memory-mapped Tiled map file
+        :type buffer: mmap.mmap
+        :param index: The (start, end) byte offsets of each chunk's JSON object by tile layer index, by (x, y) tuple
+        :type index: dict
+        :param layers: The scalar properties of each tile layer e.g. its encoding
+        :type layers: list
+        :param chunk_size: The [width, height] of the chunks
+        :type chunk_size: list
+        :param compact: Whether to key chunks by (x, y) tuples with numpy layers instead of "x,y" strings with lists
+        :type compact: bool
+        """
+        super().__init__(index.keys(), compact)
+        self._buffer = buffer
+        self._index = index
+        self._layers = layers
+        self._chunk_width, self._chunk_height = chunk_size
+
+    def _load_chunk(self, key):
+        spans = self._index[key]
+        chunk_data = {"layers": []}
+        for layer_index, layer in enumerate(self._layers):
+            if layer_index in spans.keys():
+                start, end = spans[layer_index]
+                chunk = json.loads(self._buffer[start:end])
+                TiledMapLoader.add_chunk_layer(chunk_data, *TiledMapLoader.get_chunk_tiles(chunk, layer, self.compact))
+            elif self.compact:
+                empty = numpy.full((self._chunk_height, self._chunk_width), -1, dtype=numpy.int32)
+                TiledMapLoader.add_chunk_layer(chunk_data, empty, None)
+            else:
+                empty = [[-1] * self._chunk_width for _ in range(self._chunk_height)]
+                TiledMapLoader.add_chunk_layer(chunk_data, empty, None)
+        return chunk_data
+
+
+class StreamingTiledMapLoader(TiledMapLoader):
+    """Loads Tiled infinite maps by indexing where each chunk is in the file and only parsing chunks when needed.
+
+    Unlike TiledMapLoader, every chunk has one layer per tile layer of the map, with -1 filling the layers the chunk
+    is missing from, so a layer index means the same layer in every chunk.
+    """
+
+    # A string, optionally followed by a colon if it is a key, or a bracket
+    _token = re.compile(rb'"(?:[^"\\]|\\.)*"(\s*:)?|[\[\]{}]')
+    _scalar = re.compile(rb'\s*("(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null)')
+    _scalar_keys = {
+        "root": {"tilewidth", "tileheight"},
+        "layer": {"type", "name", "encoding", "compression"},
+        "chunk": {"x", "y", "width", "height"},
+    }
+
+    @staticmethod
+    def _get_role(parent_role, bracket, key):
+        """Gets the part of the Tiled map that a JSON object or array is.
+
+        :return: "root", "layers", "layer", "chunks", "chunk" or None if the container is none of them
+        :rtype: str
+        """
+        if parent_role is None:
+            return None
+        if parent_role == "document":
+            return "root" if bracket == b"{" else None
+        if parent_role == "root" and bracket == b"[" and key == "layers":
+            return "layers"
+        if parent_role == "layers" and bracket == b"{":
+            return "layer"
+        if parent_role == "layer" and bracket == b"[" and key == "chunks":
+            return "chunks"
+        if parent_role == "chunks" and bracket == b"{":
+            return "chunk"
+        return None
+
+    @staticmethod
+    def index_map(buffer):
+        """Finds every chunk of a Tiled map in one pass over the file, without parsing the chunks' tile data.
+
+        :param buffer: The contents of the Tiled map file
+        :type buffer: bytes or mmap.mmap
+        :return: The root properties, the scalar properties of every layer, and the layer index, properties and
+            (start, end) byte offsets of every chunk
+        :rtype: tuple
+        """
+        loader = StreamingTiledMapLoader
+        root = {}
+        layers = []
+        chunks = []
+        stack = [("document", None)]
+        key = None
+        for match in loader._token.finditer(buffer):
+            token = match.group(0)
+            if token[:1] == b'"':
+                key = None
+                if match.group(1) is not None:
+                    key = json.loads(token[:len(token) - len(match.group(1))])
+                    role, values = stack[-1]
+                    if role in loader._scalar_keys.keys() and key in loader._scalar_keys[role]:
+                        values[key] = json.loads(loader._scalar.match(buffer, match.end()).group(1))
+                continue
+            if token in (b"{", b"["):
+                role = loader._get_role(stack[-1][0], token, key)
+                values = root if role == "root" else {} if role in ("layer", "chunk") else None
+                if role == "layer":
+                    layers.append(values)
+                elif role == "chunk":
+                    values["start"] = match.start()
+                stack.append((role, values))
+            else:
+                role, values = stack.pop()
+                if role == "chunk":
+                    values["end"] = match.end()
+                    chunks.append((len(layers) - 1, values))
+            key = None
+        return root, layers, chunks
+
+    @staticmethod
+    @profiled("StreamingTiledMapLoader.load_map_dict")
+    def load_map_dict(filename, compact=False):
+        with open(filename, "rb") as map_file:
+            buffer = mmap.mmap(map_file.fileno(), 0, access=mmap.ACCESS_READ)
+        root, layers, chunks = StreamingTiledMapLoader.index_map(buffer)
+
+        tile_layer_indices = {}
+        for layer_index, layer in enumerate(layers):
+            if layer.get("type", "tilelayer") == "tilelayer":
+                tile_layer_indices[layer_index] = len(tile_layer_indices)
+        chunk_size = [0, 0]
+        index = {}
+        for layer_index, chunk in chunks:
+            if layer_index in tile_layer_indices.keys():
+                chunk_size = [chunk["width"], chunk["height"]]
+                key = (chunk["x"] // chunk["width"], chunk["y"] // chunk["height"])
+                index.setdefault(key, {})[tile_layer_indices[layer_index]] = (chunk["start"], chunk["end"])
+
+        tile_layers = [layers[layer_index] for layer_index in tile_layer_indices.keys()]
+        return {"chunks": StreamingTiledChunks(buffer, index, tile_layers, chunk_size, compact),
+                "chunk_size": chunk_size,
+                "tile_size": [root["tilewidth"], root["tileheight"]],
+                "compact": compact}
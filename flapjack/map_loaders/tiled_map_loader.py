@@ -1,23 +1,134 @@
+import base64
+import copy
+import gzip
+import os
+import struct
+import zlib
+
+try:
+    import numpy
+except ImportError:  # numpy is only needed for compact tile maps, other maps are decoded into lists
+    numpy = None
+
 from .map_loader import MapLoader
 from ..asset_manager import AssetManager
+from ..profiler import Profiler, profiled
 from ..tilemap import TileMap
 
 
 class TiledMapLoader(MapLoader):
+    # The flip flags stored in the highest bits of Tiled's global tile ids
+    flag_bits = 28
+    tile_id_mask = 0x0FFFFFFF
+
+    @staticmethod
+    def decode_chunk_data(chunk, layer):
+        """Decodes the tile data of a Tiled chunk, which may be a list or base64 encoded and compressed.
+
+        :param chunk: The Tiled chunk
+        :type chunk: dict
+        :param layer: The Tiled layer the chunk is in
+        :type layer: dict
+        :return: The global tile ids of the chunk including their flip flags, in row order. A list if numpy isn't
+            installed.
+        :rtype: numpy.ndarray or list
+        """
+        if layer.get("encoding", "csv") != "base64":
+            if numpy is None:
+                return list(chunk["data"])
+            return numpy.array(chunk["data"], dtype=numpy.uint32)
+        data = base64.b64decode(chunk["data"])
+        compression = layer.get("compression", "")
+        if compression == "zlib":
+            data = zlib.decompress(data)
+        elif compression == "gzip":
+            data = gzip.decompress(data)
+        elif compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("Loading zstd compressed Tiled maps requires zstandard to be installed")
+            # Tiled doesn't always write the decompressed size, which ZstdDecompressor.decompress needs
+            data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        elif compression:
+            raise ValueError("Unsupported Tiled layer compression: " + compression)
+        if numpy is None:
+            return list(struct.unpack("<" + str(len(data) // 4) + "I", data))
+        return numpy.frombuffer(data, dtype="<u4")
+
+    @staticmethod
+    def get_chunk_tiles(chunk, layer, compact=False):
+        """Converts the tile data of a Tiled chunk into the rows of tile ids and flip flags of a TileMap chunk layer.
+
+        :param chunk: The Tiled chunk
+        :type chunk: dict
+        :param layer: The Tiled layer the chunk is in
+        :type layer: dict
+        :param compact: Whether to return 2D numpy arrays instead of nested lists. Requires numpy.
+        :type compact: bool
+        :return: The tile ids of the chunk, -1 where there is no tile, and the flip flags of the tiles or None if no
+            tile is flipped
+        :rtype: tuple
+        """
+        if numpy is None:
+            if compact:
+                raise ImportError("Compact tile maps require numpy to be installed")
+            global_ids = TiledMapLoader.decode_chunk_data(chunk, layer)
+            width, mask, flag_bits = chunk["width"], TiledMapLoader.tile_id_mask, TiledMapLoader.flag_bits
+            rows = [global_ids[y:y + width] for y in range(0, chunk["height"] * width, width)]
+            tiles = [[(global_id & mask) - 1 for global_id in row] for row in rows]
+            if not any(global_id >> flag_bits for global_id in global_ids):
+                return tiles, None
+            return tiles, [[global_id >> flag_bits for global_id in row] for row in rows]
+        global_ids = TiledMapLoader.decode_chunk_data(chunk, layer).reshape(chunk["height"], chunk["width"])
+        tiles = (global_ids & TiledMapLoader.tile_id_mask).astype(numpy.int32) - 1
+        flags = (global_ids >> TiledMapLoader.flag_bits).astype(numpy.uint8)
+        flags = flags if flags.any() else None
+        if compact:
+            return tiles, flags
+        return tiles.tolist(), None if flags is None else flags.tolist()
+
+    @staticmethod
+    def add_chunk_layer(chunk_data, tiles, flags):
+        """Appends a layer of tile ids and flip flags to a TileMap chunk.
+
+        :param chunk_data: The chunk in dict form
+        :type chunk_data: dict
+        :param tiles: The tile ids of the layer
+        :type tiles: list or numpy.ndarray
+        :param flags: The flip flags of the layer, or None if no tile is flipped
+        :type flags: list or numpy.ndarray
+        :return: None
+        """
+        if flags is not None and "flags" not in chunk_data.keys():
+            chunk_data["flags"] = [None] * len(chunk_data["layers"])
+        chunk_data["layers"].append(tiles)
+        if "flags" in chunk_data.keys():
+            chunk_data["flags"].append(flags)
+
     @staticmethod
-    def load_map_dict(filename):
+    @profiled("TiledMapLoader.load_map_dict")
+    def load_map_dict(filename, compact=False):
         source_data = AssetManager.load_json(filename)
-        map_dict = TileMap.map_dict_format
+        if Profiler.active is not None:
+            # Measured after loading, with the extension load_json adds, so profiling can't change what fails
+            filename += "" if filename.endswith(".json") else ".json"
+            Profiler.active.count("MapLoader.bytes_loaded", os.path.getsize(filename))
+        map_dict = copy.deepcopy(TileMap.map_dict_format)
         map_dict["tile_size"] = [source_data["tilewidth"], source_data["tileheight"]]
         for layer in source_data["layers"]:
+            if layer.get("type", "tilelayer") != "tilelayer":
+                continue
             for chunk in layer["chunks"]:
-                chunk_key = str(chunk["x"] // chunk["width"]) + "," + str(chunk["y"] // chunk["height"])
+                if compact:
+                    chunk_key = (chunk["x"] // chunk["width"], chunk["y"] // chunk["height"])
+                else:
+                    chunk_key = str(chunk["x"] // chunk["width"]) + "," + str(chunk["y"] // chunk["height"])
                 if chunk_key not in map_dict["chunks"].keys():
                     map_dict["chunks"][chunk_key] = {"layers": []}
                 map_dict["chunk_size"] = [chunk["width"], chunk["height"]]
-                chunk["data"] = [i - 1 for i in chunk["data"]]
-                tiles = [chunk["data"][i:i + chunk["width"]] for i in range(0, len(chunk["data"]), chunk["width"])]
-                map_dict["chunks"][chunk_key]["layers"].append(tiles)
+                TiledMapLoader.add_chunk_layer(map_dict["chunks"][chunk_key],
+                                               *TiledMapLoader.get_chunk_tiles(chunk, layer, compact))
         return map_dict
 
     @staticmethod
@@ -32,6 +143,10 @@ class TiledMapLoader(MapLoader):
                     tile_properties[str(tile["id"])] = {}
                 tile_properties[str(tile["id"])]["animation"] = []
                 for animation in tile["animation"]:
-                    tile_properties[str(tile["id"])]["animation"].append({"texture": animation["tileid"],
-                                                                          "frames": animation["duration"] // 17})
+                    # Frames at 60 frames per second for Animation.update, the duration for AnimationClock
+                    tile_properties[str(tile["id"])]["animation"].append({
+                        "texture": animation["tileid"],
+                        "frames": max(1, animation["duration"] // 17),
+                        "duration": animation["duration"],
+                    })
         return tile_properties
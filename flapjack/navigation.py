@@ -0,0 +1,771 @@
+import heapq
+import math
+from collections import OrderedDict, deque
+
+import numpy
+
+from .profiler import Profiler, profiled
+
+_INF = math.inf
+_SQRT2 = math.sqrt(2)
+
+
+class NavigationGrid:
+    """Finds paths across the tiles of a TileMap using a grid of movement costs derived from the tile properties.
+
+    The grid spans every chunk of the map, so paths cross chunk boundaries freely. Tiles that declare any of the
+    blocking properties to be true can't be walked on, and tiles with the cost property cost that much to walk onto.
+    A cell covered by tiles on several layers costs as much as its most expensive tile. Cells outside of the map's
+    chunks are blocked.
+
+    Positions and paths are in tile coordinates across the whole map, i.e. map coordinates divided by the tile size.
+    The grid updates itself whenever tiles change through TileMap.set_tile, set_tiles or fill_tiles.
+    """
+
+    def __init__(self, tilemap, blocking=("solid",), cost_property="cost", layers=None, diagonal=True,
+                 empty_cost=1, max_flow_fields=16):
+        """
+
+        :param tilemap: The map to navigate
+        :type tilemap: TileMap
+        :param blocking: The names of the tile properties that make a tile impassable when true
+        :type blocking: tuple
+        :param cost_property: The name of the tile property giving the cost of walking onto a tile. Tiles without it
+            cost 1. Costs must be positive.
+        :type cost_property: str
+        :param layers: The (optional) indices of the layers that affect movement. All layers if not given.
+        :type layers: tuple
+        :param diagonal: Whether paths can move diagonally. Diagonal moves can't cut the corners of blocked cells.
+        :type diagonal: bool
+        :param empty_cost: The cost of cells with no tile on any of the layers. math.inf to make them impassable.
+        :type empty_cost: float
+        :param max_flow_fields: The number of flow fields kept by get_flow_field
+        :type max_flow_fields: int
+        """
+        self.tilemap = tilemap
+        self.blocking = tuple(blocking)
+        self.cost_property = cost_property
+        self.layers = None if layers is None else list(layers)
+        self.diagonal = diagonal
+        self.empty_cost = empty_cost
+        self.max_flow_fields = max_flow_fields
+        # Increases every time the grid changes, so callers can tell when their paths may be out of date
+        self.version = 0
+
+        self.left, self.top, self.width, self.height = 0, 0, 0, 0
+        self._cost_table = None
+        # The costs have a border of blocked cells so that neighbours never need bounds checks
+        self._costs = numpy.zeros((2, 2))
+        self._stride = 2
+        self._flat = []  # The costs as a flat list, which is much faster to index one cell at a time
+        # The cheapest walkable cost, how many cells have it and how many cells are walkable, kept up to date by
+        # edits so that they never need the whole grid to be scanned
+        self._min_cost = 1
+        self._min_cost_cells = 0
+        self._walkable_cells = 0
+        self._regions = None
+        self._flow_fields = OrderedDict()
+
+        self.rebuild()
+        tilemap.add_tile_listener(self._on_tile_changed)
+
+    def close(self):
+        """Stops following edits to the map and discards the cached flow fields and regions. Call it once the grid is
+        no longer needed, as the map otherwise keeps the grid alive and updating.
+
+        :return: None
+        """
+        self.tilemap.remove_tile_listener(self._on_tile_changed)
+        self._flow_fields.clear()
+        self._regions = None
+
+    def _build_cost_table(self):
+        """Builds the table of costs indexed by tile id + 1. Empty tiles cost 0 so they never raise the cost of a cell
+        and the trailing entry, for tile ids outside of the table, costs 1.
+
+        :return: None
+        """
+        tilemap = self.tilemap
+        max_id = max([len(tilemap._tile_textures) - 1] + [int(tile_id) for tile_id in tilemap.tile_properties.keys()])
+        table = numpy.ones(max_id + 3)
+        table[0] = 0
+        for tile_id, properties in tilemap.tile_properties.items():
+            if any(properties.get(tile_property, False) for tile_property in self.blocking):
+                table[int(tile_id) + 1] = _INF
+            elif self.cost_property in properties.keys():
+                cost = float(properties[self.cost_property])
+                if cost <= 0:
+                    raise ValueError("Tile " + tile_id + " has a cost of " + str(cost) + ", costs must be positive")
+                table[int(tile_id) + 1] = cost
+        if self.empty_cost <= 0:
+            raise ValueError("The cost of empty cells must be positive")
+        self._cost_table = table
+
+    def _get_chunk_costs(self, chunk):
+        """Gets the cost of every cell of a chunk.
+
+        :param chunk: The chunk key
+        :type chunk: str or tuple
+        :return: The (height, width) array of costs
+        :rtype: numpy.ndarray
+        """
+        layers = self.tilemap.chunks[chunk]["layers"]
+        indices = self._get_layer_indices(layers)
+        if not indices:
+            return numpy.full((self.tilemap.chunk_height, self.tilemap.chunk_width), float(self.empty_cost))
+        tile_ids = numpy.stack([numpy.asarray(layers[i]).astype(numpy.intp) + 1 for i in indices])
+        costs = numpy.take(self._cost_table, tile_ids, mode="clip").max(axis=0)
+        costs[costs == 0] = self.empty_cost
+        return costs
+
+    def _get_cell_cost(self, chunk, position):
+        """Gets the cost of one cell of a chunk.
+
+        :param chunk: The chunk key
+        :type chunk: str or tuple
+        :param position: The (x, y) of the cell in the chunk
+        :type position: tuple
+        :return: The cost
+        :rtype: float
+        """
+        layers = self.tilemap.chunks[chunk]["layers"]
+        x, y = position
+        table = self._cost_table
+        costs = [table[min(max(int(layers[i][y][x]) + 1, 0), len(table) - 1)] for i in self._get_layer_indices(layers)]
+        cost = max(costs, default=0)
+        return float(self.empty_cost) if cost == 0 else float(cost)
+
+    def _get_layer_indices(self, layers):
+        return range(len(layers)) if self.layers is None else [i for i in self.layers if i < len(layers)]
+
+    @profiled("NavigationGrid.rebuild")
+    def rebuild(self):
+        """Rebuilds the whole grid from the map, e.g. after changing the tile properties.
+        Every chunk of the map is read, so lazily loaded maps are loaded in full.
+
+        :return: None
+        """
+        tilemap = self.tilemap
+        self._build_cost_table()
+        chunk_positions = {chunk: self._get_chunk_coordinates(chunk) for chunk in tilemap.chunks.keys()}
+        if chunk_positions:
+            left = min(x for x, _ in chunk_positions.values())
+            top = min(y for _, y in chunk_positions.values())
+            right = max(x for x, _ in chunk_positions.values()) + 1
+            bottom = max(y for _, y in chunk_positions.values()) + 1
+            self.left, self.top = left * tilemap.chunk_width, top * tilemap.chunk_height
+            self.width, self.height = (right - left) * tilemap.chunk_width, (bottom - top) * tilemap.chunk_height
+        else:
+            self.left, self.top, self.width, self.height = 0, 0, 0, 0
+
+        self._costs = numpy.full((self.height + 2, self.width + 2), _INF)
+        for chunk, (chunk_x, chunk_y) in chunk_positions.items():
+            x = chunk_x * tilemap.chunk_width - self.left + 1
+            y = chunk_y * tilemap.chunk_height - self.top + 1
+            self._costs[y:y + tilemap.chunk_height, x:x + tilemap.chunk_width] = self._get_chunk_costs(chunk)
+        self._stride = self.width + 2
+        self._flat = self._costs.ravel().tolist()
+        self._count_costs()
+        self._changed()
+
+    def _get_chunk_coordinates(self, chunk):
+        return tuple(int(i) for i in chunk.split(",")) if isinstance(chunk, str) else tuple(chunk)
+
+    def _count_costs(self):
+        """Finds the cheapest walkable cost and counts the cells that have it across the whole grid.
+
+        :return: None
+        """
+        walkable = self._costs[numpy.isfinite(self._costs)]
+        self._walkable_cells = int(walkable.size)
+        self._min_cost = float(walkable.min()) if walkable.size else 1
+        self._min_cost_cells = int((walkable == self._min_cost).sum())
+
+    def _update_cost_counts(self, old_costs, new_costs):
+        """Updates the cheapest walkable cost from the costs of the cells that changed. The whole grid is only scanned
+        again when every cell that had the cheapest cost changed to a more expensive one.
+
+        :param old_costs: The previous costs of the changed cells
+        :type old_costs: numpy.ndarray
+        :param new_costs: The new costs of the changed cells
+        :type new_costs: numpy.ndarray
+        :return: None
+        """
+        old_costs = old_costs[numpy.isfinite(old_costs)]
+        new_costs = new_costs[numpy.isfinite(new_costs)]
+        self._walkable_cells += new_costs.size - old_costs.size
+        if new_costs.size and (self._min_cost_cells == 0 or new_costs.min() < self._min_cost):
+            self._min_cost = float(new_costs.min())
+            self._min_cost_cells = int((new_costs == self._min_cost).sum())
+            return
+        self._min_cost_cells += int((new_costs == self._min_cost).sum()) - int((old_costs == self._min_cost).sum())
+        if self._min_cost_cells <= 0:
+            self._count_costs()
+
+    def _changed(self):
+        """Forgets everything derived from the costs after they change.
+
+        :return: None
+        """
+        self._regions = None
+        self._flow_fields.clear()
+        self.version += 1
+
+    def _on_tile_changed(self, chunk, layer_index, position, tile_id):
+        if self.layers is not None and layer_index not in self.layers:
+            return
+        tilemap = self.tilemap
+        chunk_x, chunk_y = self._get_chunk_coordinates(chunk)
+        x, y = chunk_x * tilemap.chunk_width - self.left, chunk_y * tilemap.chunk_height - self.top
+        if x < 0 or y < 0 or x + tilemap.chunk_width > self.width or y + tilemap.chunk_height > self.height:
+            # A chunk was created outside of the grid, so the grid needs to grow
+            self.rebuild()
+            return
+        if position is not None:
+            # Only the one cell can have changed
+            tile_x, tile_y = position
+            cost = self._get_cell_cost(chunk, position)
+            index = (y + 1 + tile_y) * self._stride + x + 1 + tile_x
+            old_cost = self._flat[index]
+            if cost == old_cost:
+                return
+            self._costs[y + 1 + tile_y, x + 1 + tile_x] = cost
+            self._flat[index] = cost
+            self._update_cost_counts(numpy.array([old_cost]), numpy.array([cost]))
+        else:
+            costs = self._get_chunk_costs(chunk)
+            region = self._costs[y + 1:y + 1 + tilemap.chunk_height, x + 1:x + 1 + tilemap.chunk_width]
+            old_costs = region.copy()
+            region[:] = costs
+            for row, row_costs in enumerate(costs.tolist()):
+                start = (y + 1 + row) * self._stride + x + 1
+                self._flat[start:start + tilemap.chunk_width] = row_costs
+            self._update_cost_counts(old_costs, costs)
+        self._changed()
+
+    def _get_index(self, position):
+        """Gets the index of a tile in the flat list of costs.
+
+        :param position: The (x, y) tile coordinates
+        :type position: tuple
+        :return: The index, or None if the tile is outside of the grid
+        :rtype: int
+        """
+        x, y = position[0] - self.left, position[1] - self.top
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return (y + 1) * self._stride + x + 1
+        return None
+
+    def _get_position(self, index):
+        y, x = divmod(index, self._stride)
+        return x - 1 + self.left, y - 1 + self.top
+
+    def get_cost(self, position):
+        """Gets the cost of walking onto a tile.
+
+        :param position: The (x, y) tile coordinates
+        :type position: tuple
+        :return: The cost, math.inf if the tile is blocked or outside of the map
+        :rtype: float
+        """
+        index = self._get_index(position)
+        return _INF if index is None else self._flat[index]
+
+    def is_walkable(self, position):
+        """Checks whether a tile can be walked on.
+
+        :param position: The (x, y) tile coordinates
+        :type position: tuple
+        :return: True if the tile can be walked on, false if not
+        :rtype: bool
+        """
+        return self.get_cost(position) < _INF
+
+    def get_cost_grid(self):
+        """Gets the costs of every cell of the grid. Index it with [y - top, x - left].
+
+        :return: The (height, width) array of costs, with math.inf for blocked cells
+        :rtype: numpy.ndarray
+        """
+        return self._costs[1:-1, 1:-1]
+
+    def _get_neighbours(self, index):
+        """Gets the cells that can be moved to from a cell.
+
+        :param index: The index of the cell
+        :type index: int
+        :return: (index, distance) of each neighbour
+        :rtype: list
+        """
+        flat, stride = self._flat, self._stride
+        neighbours = [(neighbour, 1) for neighbour in (index - stride, index + 1, index + stride, index - 1)
+                      if flat[neighbour] < _INF]
+        if self.diagonal:
+            for dx, dy in ((1, -1), (1, 1), (-1, 1), (-1, -1)):
+                if flat[index + dx] < _INF and flat[index + dy * stride] < _INF:
+                    neighbour = index + dy * stride + dx
+                    if flat[neighbour] < _INF:
+                        neighbours.append((neighbour, _SQRT2))
+        return neighbours
+
+    def _get_heuristic(self, index, goal):
+        dy, dx = divmod(index, self._stride)
+        goal_y, goal_x = divmod(goal, self._stride)
+        dx, dy = abs(dx - goal_x), abs(dy - goal_y)
+        if self.diagonal:
+            return (max(dx, dy) + (_SQRT2 - 1) * min(dx, dy)) * self._min_cost
+        return (dx + dy) * self._min_cost
+
+    def _is_uniform(self):
+        """Checks whether every walkable cell has the same cost, which is when jump point search can be used.
+
+        :return: True if the costs are uniform, false if not
+        :rtype: bool
+        """
+        return self._min_cost_cells == self._walkable_cells
+
+    @profiled("NavigationGrid.find_path")
+    def find_path(self, start, goal):
+        """Finds the cheapest path between two tiles. Jump point search is used on maps where every walkable tile
+        costs the same and diagonal moves are allowed, and A* otherwise.
+
+        :param start: The (x, y) tile coordinates to start at
+        :type start: tuple
+        :param goal: The (x, y) tile coordinates to reach
+        :type goal: tuple
+        :return: The (x, y) tile coordinates of every step from the start to the goal inclusive, or None if the goal
+            can't be reached or either tile is blocked
+        :rtype: list
+        """
+        start_index, goal_index = self._get_index(start), self._get_index(goal)
+        if start_index is None or goal_index is None:
+            return None
+        if self._flat[start_index] == _INF or self._flat[goal_index] == _INF:
+            return None
+        if self._regions is not None and self._regions[start_index] != self._regions[goal_index]:
+            return None
+        if start_index == goal_index:
+            return [tuple(start)]
+        if self.diagonal and self._is_uniform():
+            indices = self._expand_jumps(self._jump_point_search(start_index, goal_index))
+        else:
+            indices = self._a_star(start_index, goal_index)
+        return None if indices is None else [self._get_position(index) for index in indices]
+
+    def _a_star(self, start, goal):
+        """Finds the cheapest path between two cells with A*.
+
+        :return: The indices of the cells of the path, or None if there is no path
+        :rtype: list
+        """
+        flat, stride, min_cost = self._flat, self._stride, self._min_cost
+        goal_y, goal_x = divmod(goal, stride)
+        diagonal_factor = (_SQRT2 - 2 if self.diagonal else 0) * min_cost
+        costs = {start: 0}
+        parents = {start: None}
+        closed = set()
+        open_cells = [(self._get_heuristic(start, goal), 0, start)]
+        counter = 1
+        while open_cells:
+            _, _, index = heapq.heappop(open_cells)
+            if index in closed:
+                continue
+            if index == goal:
+                self._count_expanded(len(closed))
+                return self._get_path_indices(parents, goal)
+            closed.add(index)
+            cost = costs[index]
+            for neighbour, distance in self._get_neighbours(index):
+                neighbour_cost = cost + flat[neighbour] * distance
+                if neighbour_cost < costs.get(neighbour, _INF):
+                    costs[neighbour] = neighbour_cost
+                    parents[neighbour] = index
+                    # The heuristic inlined: octile distance, or manhattan distance without diagonal moves
+                    y, x = divmod(neighbour, stride)
+                    dx, dy = abs(x - goal_x), abs(y - goal_y)
+                    heuristic = (dx + dy) * min_cost + diagonal_factor * (dx if dx < dy else dy)
+                    heapq.heappush(open_cells, (neighbour_cost + heuristic, counter, neighbour))
+                    counter += 1
+        self._count_expanded(len(closed))
+        return None
+
+    def _jump_point_search(self, start, goal):
+        """Finds the shortest path between two cells with jump point search, which skips over the open cells between
+        the turning points of the path. Only valid if every walkable cell has the same cost.
+
+        :return: The indices of the jump points of the path, or None if there is no path
+        :rtype: list
+        """
+        stride = self._stride
+        costs = {start: 0}
+        parents = {start: None}
+        closed = set()
+        open_cells = [(self._get_heuristic(start, goal), 0, start)]
+        counter = 1
+        while open_cells:
+            _, _, index = heapq.heappop(open_cells)
+            if index in closed:
+                continue
+            if index == goal:
+                self._count_expanded(len(closed))
+                return self._get_path_indices(parents, goal)
+            closed.add(index)
+            cost = costs[index]
+            for dx, dy in self._get_jump_directions(index, parents[index]):
+                jump_point = self._jump(index + dy * stride + dx, dx, dy, goal)
+                if jump_point is None or jump_point in closed:
+                    continue
+                jump_cost = cost + self._get_heuristic(index, jump_point)
+                if jump_cost < costs.get(jump_point, _INF):
+                    costs[jump_point] = jump_cost
+                    parents[jump_point] = index
+                    heapq.heappush(open_cells, (jump_cost + self._get_heuristic(jump_point, goal), counter,
+                                                jump_point))
+                    counter += 1
+        self._count_expanded(len(closed))
+        return None
+
+    def _get_jump_directions(self, index, parent):
+        """Gets the directions worth searching from a jump point, pruning the cells that are reached at least as
+        cheaply without passing through it.
+
+        :param index: The index of the jump point
+        :type index: int
+        :param parent: The index of the jump point it was reached from, or None for the start
+        :type parent: int
+        :return: The (dx, dy) of each direction
+        :rtype: list
+        """
+        flat, stride = self._flat, self._stride
+        if parent is None:
+            return [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                    if (dx or dy) and flat[index + dx] < _INF and flat[index + dy * stride] < _INF
+                    and flat[index + dy * stride + dx] < _INF]
+        y, x = divmod(index, stride)
+        parent_y, parent_x = divmod(parent, stride)
+        dx, dy = (x > parent_x) - (x < parent_x), (y > parent_y) - (y < parent_y)
+        directions = []
+        if dx and dy:
+            vertical, horizontal = flat[index + dy * stride] < _INF, flat[index + dx] < _INF
+            if vertical:
+                directions.append((0, dy))
+            if horizontal:
+                directions.append((dx, 0))
+            if vertical and horizontal:
+                directions.append((dx, dy))
+        elif dx:
+            ahead, above, below = flat[index + dx] < _INF, flat[index - stride] < _INF, flat[index + stride] < _INF
+            if ahead:
+                directions.append((dx, 0))
+                if above:
+                    directions.append((dx, -1))
+                if below:
+                    directions.append((dx, 1))
+            if above:
+                directions.append((0, -1))
+            if below:
+                directions.append((0, 1))
+        else:
+            ahead, left, right = flat[index + dy * stride] < _INF, flat[index - 1] < _INF, flat[index + 1] < _INF
+            if ahead:
+                directions.append((0, dy))
+                if left:
+                    directions.append((-1, dy))
+                if right:
+                    directions.append((1, dy))
+            if left:
+                directions.append((-1, 0))
+            if right:
+                directions.append((1, 0))
+        return directions
+
+    def _jump(self, index, dx, dy, goal):
+        """Moves from a cell in a direction until reaching a jump point.
+
+        :return: The index of the jump point, or None if a blocked cell is reached first
+        :rtype: int
+        """
+        if not (dx and dy):
+            return self._jump_straight(index, dx + dy * self._stride, self._stride if dx else 1, goal)
+        flat, stride = self._flat, self._stride
+        while flat[index] < _INF:
+            if index == goal:
+                return index
+            if self._jump_straight(index + dx, dx, stride, goal) is not None or \
+                    self._jump_straight(index + dy * stride, dy * stride, 1, goal) is not None:
+                return index
+            if flat[index + dx] == _INF or flat[index + dy * stride] == _INF:
+                return None
+            index += dy * stride + dx
+        return None
+
+    def _jump_straight(self, index, step, side, goal):
+        """Moves from a cell horizontally or vertically until reaching a jump point, which is a cell with a forced
+        neighbour: an open cell to the side that was blocked from the previous cell.
+
+        :param step: The index offset of the direction of movement
+        :type step: int
+        :param side: The index offset perpendicular to the movement
+        :type side: int
+        :return: The index of the jump point, or None if a blocked cell is reached first
+        :rtype: int
+        """
+        flat = self._flat
+        while flat[index] < _INF:
+            if index == goal:
+                return index
+            if (flat[index - side] < _INF and flat[index - step - side] == _INF) or \
+                    (flat[index + side] < _INF and flat[index - step + side] == _INF):
+                return index
+            index += step
+        return None
+
+    def _expand_jumps(self, jump_points):
+        """Fills in the cells between the jump points of a path.
+
+        :return: The indices of every cell of the path, or None if there is no path
+        :rtype: list
+        """
+        if jump_points is None:
+            return None
+        stride = self._stride
+        indices = [jump_points[0]]
+        for point in jump_points[1:]:
+            y, x = divmod(indices[-1], stride)
+            point_y, point_x = divmod(point, stride)
+            step = ((point_y > y) - (point_y < y)) * stride + (point_x > x) - (point_x < x)
+            for _ in range(max(abs(point_x - x), abs(point_y - y))):
+                indices.append(indices[-1] + step)
+        return indices
+
+    @staticmethod
+    def _get_path_indices(parents, goal):
+        indices = []
+        index = goal
+        while index is not None:
+            indices.append(index)
+            index = parents[index]
+        indices.reverse()
+        return indices
+
+    @staticmethod
+    def _count_expanded(count):
+        profiler = Profiler.active
+        if profiler is not None:
+            profiler.count("NavigationGrid.cells_expanded", count)
+
+    def find_paths(self, queries, flow_field_threshold=4):
+        """Finds paths for many agents at once. Agents sharing a goal follow one flow field when there are enough of
+        them, identical queries are only searched once and unreachable goals are rejected without a search.
+
+        :param queries: The (start, goal) tile coordinates of each agent
+        :type queries: list
+        :param flow_field_threshold: The number of agents with the same goal needed to use a flow field for it
+        :type flow_field_threshold: int
+        :return: The path of each query in the same order, as returned by find_path
+        :rtype: list
+        """
+        queries = [(tuple(start), tuple(goal)) for start, goal in queries]
+        if len(queries) > 1:
+            self._get_regions()
+        goal_counts = {}
+        for _, goal in queries:
+            goal_counts[goal] = goal_counts.get(goal, 0) + 1
+        paths = {}
+        results = []
+        for query in queries:
+            if query not in paths.keys():
+                start, goal = query
+                if goal_counts[goal] >= flow_field_threshold:
+                    paths[query] = self.get_flow_field(goal).get_path(start)
+                else:
+                    paths[query] = self.find_path(start, goal)
+            path = paths[query]
+            results.append(None if path is None else list(path))
+        return results
+
+    def _get_regions(self):
+        """Labels every walkable cell with the connected region it belongs to, building the labels first if needed.
+        Diagonal moves can't cut corners, so cells connected diagonally are always connected orthogonally too.
+
+        :return: The region of each cell, -1 for blocked cells
+        :rtype: list
+        """
+        if self._regions is None:
+            flat, stride = self._flat, self._stride
+            regions = [-1] * len(flat)
+            region = 0
+            for index, cost in enumerate(flat):
+                if cost == _INF or regions[index] != -1:
+                    continue
+                regions[index] = region
+                queue = deque((index,))
+                while queue:
+                    cell = queue.popleft()
+                    for neighbour in (cell - stride, cell + 1, cell + stride, cell - 1):
+                        if regions[neighbour] == -1 and flat[neighbour] < _INF:
+                            regions[neighbour] = region
+                            queue.append(neighbour)
+                region += 1
+            self._regions = regions
+        return self._regions
+
+    def is_reachable(self, start, goal):
+        """Checks whether there is any path between two tiles, without searching for it.
+        The first check after the grid changes labels the connected regions of the whole grid.
+
+        :param start: The (x, y) tile coordinates to start at
+        :type start: tuple
+        :param goal: The (x, y) tile coordinates to reach
+        :type goal: tuple
+        :return: True if the goal can be reached, false if not
+        :rtype: bool
+        """
+        start_index, goal_index = self._get_index(start), self._get_index(goal)
+        if start_index is None or goal_index is None:
+            return False
+        regions = self._get_regions()
+        return regions[start_index] != -1 and regions[start_index] == regions[goal_index]
+
+    def get_flow_field(self, goal):
+        """Gets the flow field leading every tile to a goal, building it first if needed. The most recently used flow
+        fields are kept until the grid changes.
+
+        :param goal: The (x, y) tile coordinates of the goal
+        :type goal: tuple
+        :return: The flow field
+        :rtype: FlowField
+        """
+        goal = tuple(goal)
+        if goal in self._flow_fields.keys():
+            self._flow_fields.move_to_end(goal)
+            return self._flow_fields[goal]
+        flow_field = self._build_flow_field(goal)
+        self._flow_fields[goal] = flow_field
+        if len(self._flow_fields) > self.max_flow_fields:
+            self._flow_fields.popitem(last=False)
+        return flow_field
+
+    @profiled("NavigationGrid.build_flow_field")
+    def _build_flow_field(self, goal):
+        """Finds the cheapest path from every cell to the goal with Dijkstra's algorithm run out from the goal.
+
+        :param goal: The (x, y) tile coordinates of the goal
+        :type goal: tuple
+        :return: The flow field
+        :rtype: FlowField
+        """
+        flat = self._flat
+        distances = [_INF] * len(flat)
+        next_cells = [-1] * len(flat)
+        goal_index = self._get_index(goal)
+        if goal_index is not None and flat[goal_index] < _INF:
+            distances[goal_index] = 0
+            open_cells = [(0, goal_index)]
+            while open_cells:
+                distance, index = heapq.heappop(open_cells)
+                if distance > distances[index]:
+                    continue
+                # Moving from a neighbour onto this cell costs this cell's cost
+                cost = flat[index]
+                for neighbour, step in self._get_neighbours(index):
+                    neighbour_distance = distance + cost * step
+                    if neighbour_distance < distances[neighbour]:
+                        distances[neighbour] = neighbour_distance
+                        next_cells[neighbour] = index
+                        heapq.heappush(open_cells, (neighbour_distance, neighbour))
+        return FlowField(self, goal, distances, next_cells)
+
+
+class FlowField:
+    """The cheapest direction to a goal from every tile of a NavigationGrid, shared by any number of agents.
+    A flow field describes the grid at the version it was built for.
+    """
+
+    def __init__(self, grid, goal, distances, next_cells):
+        """
+
+        :param grid: The grid the flow field was built from
+        :type grid: NavigationGrid
+        :param goal: The (x, y) tile coordinates of the goal
+        :type goal: tuple
+        :param distances: The cost of reaching the goal from each cell of the grid's flat list of costs
+        :type distances: list
+        :param next_cells: The index of the next cell towards the goal from each cell, -1 if there is none
+        :type next_cells: list
+        """
+        self.grid = grid
+        self.goal = goal
+        self.version = grid.version
+        self._distances = distances
+        self._next_cells = next_cells
+
+    def get_distance(self, position):
+        """Gets the cost of reaching the goal from a tile.
+
+        :param position: The (x, y) tile coordinates
+        :type position: tuple
+        :return: The cost, math.inf if the goal can't be reached
+        :rtype: float
+        """
+        index = self.grid._get_index(position)
+        return _INF if index is None else self._distances[index]
+
+    def get_next(self, position):
+        """Gets the next tile on the way to the goal from a tile.
+
+        :param position: The (x, y) tile coordinates
+        :type position: tuple
+        :return: The (x, y) tile coordinates of the next tile, the position itself at the goal or None if the goal
+            can't be reached
+        :rtype: tuple
+        """
+        index = self.grid._get_index(position)
+        if index is None or self._distances[index] == _INF:
+            return None
+        next_cell = self._next_cells[index]
+        return tuple(position) if next_cell == -1 else self.grid._get_position(next_cell)
+
+    def get_direction(self, position):
+        """Gets the direction to move in from a tile to get closer to the goal.
+
+        :param position: The (x, y) tile coordinates
+        :type position: tuple
+        :return: The (dx, dy) step, (0, 0) at the goal or None if the goal can't be reached
+        :rtype: tuple
+        """
+        next_position = self.get_next(position)
+        if next_position is None:
+            return None
+        return next_position[0] - position[0], next_position[1] - position[1]
+
+    def get_path(self, start):
+        """Follows the flow field from a tile to the goal.
+
+        :param start: The (x, y) tile coordinates to start at
+        :type start: tuple
+        :return: The (x, y) tile coordinates of every step from the start to the goal inclusive, or None if the goal
+            can't be reached
+        :rtype: list
+        """
+        grid = self.grid
+        index = grid._get_index(start)
+        if index is None or self._distances[index] == _INF:
+            return None
+        path = [tuple(start)]
+        index = self._next_cells[index]
+        while index != -1:
+            path.append(grid._get_position(index))
+            index = self._next_cells[index]
+        return path
+
+    def get_distance_grid(self):
+        """Gets the cost of reaching the goal from every cell of the grid. Index it with [y - top, x - left] using the
+        grid's top and left.
+
+        :return: The (height, width) array of costs, with math.inf where the goal can't be reached
+        :rtype: numpy.ndarray
+        """
+        grid = self.grid
+        distances = numpy.array(self._distances).reshape(grid.height + 2, grid.width + 2)
+        return distances[1:-1, 1:-1]
@@ -0,0 +1,225 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+
+class Profiler:
+    """Records the timings of flapjack operations and counters such as tiles blitted, for finding frame spikes.
+
+    Instrumentation only records anything while a profiler is enabled. Otherwise each instrumented call only checks
+    that Profiler.active is None.
+    """
+
+    # The enabled profiler, or None if profiling is disabled
+    active = None
+
+    def __init__(self, max_events=1000000, frame_history=300):
+        """
+
+        :param max_events: The maximum number of timed operations and counter changes kept for trace export. Later
+            ones are left out of the trace but still add to the totals of their frame.
+        :type max_events: int
+        :param frame_history: The number of frames kept by next_frame
+        :type frame_history: int
+        """
+        self.max_events = max_events
+        self.dropped_events = 0
+        self.frames = deque(maxlen=frame_history)
+
+        self._events = []  # (name, thread id, start ns, duration ns, args)
+        self._counters = []  # (name, thread id, time ns, value)
+        # The totals of the current frame, kept apart from the capped events so that frames are always complete
+        self._frame_operations = {}  # name: [calls, total ns, max ns]
+        self._frame_counters = {}  # name: total
+        self._frame_start = time.perf_counter_ns()
+        self._origin = self._frame_start
+        self._lock = threading.Lock()
+
+    def enable(self):
+        """Makes this the active profiler, so flapjack starts recording into it.
+
+        :return: This profiler
+        :rtype: Profiler
+        """
+        Profiler.active = self
+        self._frame_start = time.perf_counter_ns()
+        return self
+
+    def disable(self):
+        """Stops recording into this profiler if it is active. The recorded events are kept.
+
+        :return: None
+        """
+        if Profiler.active is self:
+            Profiler.active = None
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+    def record(self, name, start, duration, args=None):
+        """Records a timed operation.
+
+        :param name: The name of the operation e.g. "TileMap.render_chunk"
+        :type name: str
+        :param start: The time.perf_counter_ns() the operation started at
+        :type start: int
+        :param duration: The duration of the operation in nanoseconds
+        :type duration: int
+        :param args: (Optional) details of the operation, shown in trace viewers
+        :type args: dict
+        :return: None
+        """
+        with self._lock:
+            totals = self._frame_operations.get(name)
+            if totals is None:
+                self._frame_operations[name] = [1, duration, duration]
+            else:
+                totals[0] += 1
+                totals[1] += duration
+                totals[2] = max(totals[2], duration)
+            if len(self._events) < self.max_events:
+                self._events.append((name, threading.get_ident(), start, duration, args))
+            else:
+                self.dropped_events += 1
+
+    def count(self, name, value=1):
+        """Adds to a counter, such as the number of tiles blitted or bytes loaded.
+
+        :param name: The name of the counter e.g. "TileMap.tiles_blitted"
+        :type name: str
+        :param value: The amount to add
+        :type value: int
+        :return: None
+        """
+        with self._lock:
+            self._frame_counters[name] = self._frame_counters.get(name, 0) + value
+            if len(self._counters) < self.max_events:
+                self._counters.append((name, threading.get_ident(), time.perf_counter_ns(), value))
+            else:
+                self.dropped_events += 1
+
+    def span(self, name, **args):
+        """Times a block of code, e.g. a game's own update step, alongside flapjack's operations.
+
+        :param name: The name of the operation
+        :type name: str
+        :param args: (Optional) details of the operation, shown in trace viewers
+        :return: A context manager timing the block
+        """
+        return _Span(self, name, args or None)
+
+    def next_frame(self):
+        """Ends the current frame, adding the total time and count of every operation and counter during it to
+        frames. Call it once per game loop iteration.
+
+        :return: The totals of the frame that ended
+        :rtype: dict
+        """
+        with self._lock:
+            now = time.perf_counter_ns()
+            frame_start = self._frame_start
+            operations, counters = self._frame_operations, self._frame_counters
+            self._frame_operations, self._frame_counters = {}, {}
+            self._frame_start = now
+            if len(self._events) < self.max_events:
+                self._events.append(("frame", threading.get_ident(), frame_start, now - frame_start, None))
+            else:
+                self.dropped_events += 1
+        frame = {"start_ms": (frame_start - self._origin) / 1e6,
+                 "duration_ms": (now - frame_start) / 1e6,
+                 "operations": {name: {"calls": calls, "total_ms": total / 1e6, "max_ms": longest / 1e6}
+                                for name, (calls, total, longest) in operations.items()},
+                 "counters": counters}
+        self.frames.append(frame)
+        return frame
+
+    def get_slowest_frames(self, count=10):
+        """Gets the longest of the recorded frames.
+
+        :param count: The number of frames
+        :type count: int
+        :return: The totals of the frames, slowest first
+        :rtype: list
+        """
+        return sorted(self.frames, key=lambda frame: frame["duration_ms"], reverse=True)[:count]
+
+    def clear(self):
+        """Discards every recorded event, counter and frame.
+
+        :return: None
+        """
+        with self._lock:
+            self._events.clear()
+            self._counters.clear()
+            self._frame_operations, self._frame_counters = {}, {}
+        self.frames.clear()
+        self.dropped_events = 0
+
+    def export_chrome_trace(self, filename):
+        """Writes the recorded events in the Chrome trace event format, which chrome://tracing, Perfetto and
+        speedscope can open.
+
+        :param filename: The .json file to write
+        :type filename: str
+        :return: None
+        """
+        import json
+        process_id = os.getpid()
+        with self._lock:
+            events, counters = list(self._events), list(self._counters)
+        trace_events = []
+        for name, thread_id, start, duration, args in events:
+            event = {"name": name, "cat": name.split(".")[0], "ph": "X", "pid": process_id, "tid": thread_id,
+                     "ts": (start - self._origin) / 1000, "dur": duration / 1000}
+            if args is not None:
+                event["args"] = args
+            trace_events.append(event)
+        totals = {}
+        for name, thread_id, timestamp, value in counters:
+            totals[name] = totals.get(name, 0) + value
+            trace_events.append({"name": name, "ph": "C", "pid": process_id, "tid": thread_id,
+                                 "ts": (timestamp - self._origin) / 1000, "args": {"total": totals[name]}})
+        with open(filename, "w") as trace_file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, trace_file)
+
+
+class _Span:
+    def __init__(self, profiler, name, args):
+        self._profiler = profiler
+        self._name = name
+        self._args = args
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler.record(self._name, self._start, time.perf_counter_ns() - self._start, self._args)
+
+
+def profiled(name):
+    """Decorator that records every call of a function to the active profiler under the given name.
+
+    :param name: The name of the operation e.g. "TileMap.render_chunk"
+    :type name: str
+    :return: The decorator
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = Profiler.active
+            if profiler is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record(name, start, time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,167 @@
+import pygame
+
+from .animation import Animation
+from .profiler import Profiler, profiled
+
+
+class SpriteBatch:
+    """Collects the sprites drawn during a frame and blits all of them with a single Surface.blits call.
+
+    Sprites are drawn in order of layer, then grouped by atlas, then in the order they were submitted. Regions and
+    their flipped versions are looked up once per atlas and kept, so drawing the same sprite again is a dict lookup.
+    Flipped surfaces are flipped again every time they are drawn.
+
+    Typical use is to clear the batch, submit every sprite with draw and then render it, once per frame.
+    """
+
+    # Flip flags, with the same values as the flip flags of TileMap
+    FLIP_HORIZONTAL = 8
+    FLIP_VERTICAL = 4
+
+    def __init__(self, atlas=None):
+        """
+
+        :param atlas: (Optional) the atlas that sprites are found in when draw isn't given one
+        :type atlas: TextureAtlas
+        """
+        self.atlas = atlas
+        self._textures = {}  # atlas: {(sprite name, flags): surface}
+        self._atlas_order = {}  # atlas: the order its sprites are grouped in
+        self._sprites = []  # (layer, atlas order, submission order, texture, x, y)
+        self._sorted = True
+
+    def get_texture(self, sprite, flags=0, atlas=None):
+        """Gets the texture of a sprite, finding and flipping it first if needed.
+
+        :param sprite: The name of the sprite in the atlas, an Animation whose current texture is a sprite name or a
+            surface
+        :type sprite: str or Animation or pygame.Surface
+        :param flags: The flip flags e.g. SpriteBatch.FLIP_HORIZONTAL | SpriteBatch.FLIP_VERTICAL
+        :type flags: int
+        :param atlas: The atlas to find the sprite in. The batch's atlas by default.
+        :type atlas: TextureAtlas
+        :return: The texture
+        :rtype: pygame.Surface
+        """
+        if isinstance(sprite, Animation):
+            sprite = sprite.get_current_texture()
+        if isinstance(sprite, pygame.Surface):
+            # Surfaces are flipped every time rather than kept, as they may be created and discarded every frame
+            if not flags:
+                return sprite
+            return pygame.transform.flip(sprite, bool(flags & self.FLIP_HORIZONTAL), bool(flags & self.FLIP_VERTICAL))
+        atlas = self.atlas if atlas is None else atlas
+        if atlas is None:
+            raise ValueError("Sprite " + repr(sprite) + " can't be found without an atlas")
+        textures = self._textures.get(atlas)
+        if textures is None:
+            textures = self._textures[atlas] = {}
+        key = (sprite, flags)
+        texture = textures.get(key)
+        if texture is None:
+            texture = atlas.find_region(sprite)
+            if flags:
+                texture = pygame.transform.flip(texture, bool(flags & self.FLIP_HORIZONTAL),
+                                                bool(flags & self.FLIP_VERTICAL))
+            textures[key] = texture
+        return texture
+
+    def draw(self, sprite, position, flags=0, layer=0, atlas=None):
+        """Submits a sprite to be drawn when the batch is rendered. Animations are drawn with the texture they have
+        when submitted.
+
+        :param sprite: The name of the sprite in the atlas, an Animation whose current texture is a sprite name or a
+            surface
+        :type sprite: str or Animation or pygame.Surface
+        :param position: The (x, y) position of the top left of the sprite, in map coordinates
+        :type position: tuple
+        :param flags: The flip flags e.g. SpriteBatch.FLIP_HORIZONTAL | SpriteBatch.FLIP_VERTICAL
+        :type flags: int
+        :param layer: The layer of the sprite. Higher layers are drawn on top.
+        :type layer: int
+        :param atlas: The atlas to find the sprite in. The batch's atlas by default.
+        :type atlas: TextureAtlas
+        :return: None
+        """
+        texture = self.get_texture(sprite, flags, atlas)
+        # Surfaces are grouped together, apart from the sprites of any atlas
+        atlas = None if isinstance(sprite, pygame.Surface) else self.atlas if atlas is None else atlas
+        order = self._atlas_order.get(atlas)
+        if order is None:
+            order = self._atlas_order[atlas] = len(self._atlas_order)
+        sprites = self._sprites
+        if sprites and self._sorted and (layer, order) < sprites[-1][:2]:
+            self._sorted = False
+        sprites.append((layer, order, len(sprites), texture, position[0], position[1]))
+
+    def draw_all(self, sprites, layer=0, atlas=None):
+        """Submits many sprites on the same layer and atlas.
+
+        :param sprites: The (sprite, position) or (sprite, position, flags) of each sprite, as given to draw
+        :type sprites: iterable
+        :param layer: The layer of the sprites
+        :type layer: int
+        :param atlas: The atlas to find the sprites in. The batch's atlas by default.
+        :type atlas: TextureAtlas
+        :return: None
+        """
+        for sprite in sprites:
+            self.draw(sprite[0], sprite[1], sprite[2] if len(sprite) > 2 else 0, layer, atlas)
+
+    def clear(self):
+        """Removes every submitted sprite, ready for the next frame. Found textures are kept.
+
+        :return: None
+        """
+        self._sprites.clear()
+        self._sorted = True
+
+    def clear_textures(self):
+        """Forgets every found texture, e.g. after reloading an atlas.
+
+        :return: None
+        """
+        self._textures.clear()
+
+    def __len__(self):
+        return len(self._sprites)
+
+    @profiled("SpriteBatch.render")
+    def render(self, surface, camera=None, position=(0, 0)):
+        """Blits every submitted sprite that can be seen through the camera onto a surface. The batch isn't cleared.
+
+        :param surface: The surface to render the sprites on
+        :type surface: pygame.Surface
+        :param camera: (Optional) the region of the map to render, in map coordinates. Sprites outside of it are
+            skipped. Every sprite is rendered at its map position if not given.
+        :type camera: pygame.Rect
+        :param position: The (x, y) position on the surface at which to render the top left of the camera
+        :type position: tuple
+        :return: The number of sprites blitted
+        :rtype: int
+        """
+        if not self._sorted:
+            self._sprites.sort(key=lambda sprite: sprite[:3])
+            self._sorted = True
+        surface_x, surface_y = position
+        if camera is None:
+            blit_sequence = [(texture, (surface_x + x, surface_y + y)) for _, _, _, texture, x, y in self._sprites]
+            surface.blits(blit_sequence, doreturn=False)
+        else:
+            left, top, right, bottom = camera.left, camera.top, camera.right, camera.bottom
+            offset_x, offset_y = surface_x - left, surface_y - top
+            blit_sequence = []
+            for _, _, _, texture, x, y in self._sprites:
+                if x < right and y < bottom:
+                    width, height = texture.get_size()
+                    if x + width > left and y + height > top:
+                        blit_sequence.append((texture, (x + offset_x, y + offset_y)))
+            clip = surface.get_clip()
+            surface.set_clip(clip.clip(pygame.Rect(position, camera.size)))
+            surface.blits(blit_sequence, doreturn=False)
+            surface.set_clip(clip)
+
+        profiler = Profiler.active
+        if profiler is not None:
+            profiler.count("SpriteBatch.sprites_blitted", len(blit_sequence))
+        return len(blit_sequence)
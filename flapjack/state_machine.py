@@ -1,8 +1,16 @@
+try:
+    import numpy
+except ImportError:  # numpy is only needed for compiled state machines
+    numpy = None
+
+
 class FiniteStateMachine:
     """A simple Finite State Machine implementation in Python."""
-    def __init__(self, states={}, initial_state=""):
-        self._states = states
+    def __init__(self, states=None, initial_state=""):
+        self._states = {} if states is None else states
         self._current_state = initial_state
+        self._enter_callbacks = {}
+        self._exit_callbacks = {}
 
     def add_state(self, state, actions):
         """Add  a state to the machine.
@@ -44,9 +52,48 @@ class FiniteStateMachine:
         :return: This object so that function calls can be chained.
         """
         if action in self._states[self._current_state].keys():
+            previous_state = self._current_state
             self._current_state = self._states[self._current_state][action]
+            if self._current_state != previous_state:
+                for callback in self._exit_callbacks.get(previous_state, ()):
+                    callback(self._current_state)
+                for callback in self._enter_callbacks.get(self._current_state, ()):
+                    callback(previous_state)
+        return self
+
+    def on_enter(self, state, callback):
+        """Adds a function to be called with the previous state whenever the machine changes into the given state.
+
+        :param state: The state
+        :type state: str
+        :param callback: The function to call
+        :type callback: callable
+        :return: This object so that function calls can be chained.
+        """
+        self._enter_callbacks.setdefault(state, []).append(callback)
         return self
 
+    def on_exit(self, state, callback):
+        """Adds a function to be called with the next state whenever the machine changes out of the given state.
+
+        :param state: The state
+        :type state: str
+        :param callback: The function to call
+        :type callback: callable
+        :return: This object so that function calls can be chained.
+        """
+        self._exit_callbacks.setdefault(state, []).append(callback)
+        return self
+
+    def compile(self):
+        """Compiles the states and actions of the machine into a transition table for running many machines at once.
+        Later changes to this machine don't affect the compiled machine. Requires numpy.
+
+        :return: The compiled machine
+        :rtype: CompiledStateMachine
+        """
+        return CompiledStateMachine(self._states)
+
     @staticmethod
     def load_from_file(path):
         """Creates a FiniteStateMachine instance from a correctly formatted .json file and returns it.
@@ -62,3 +109,158 @@ class FiniteStateMachine:
     def __iter__(self):
         for state, actions in self._states.items():
             yield state, actions
+
+
+class CompiledStateMachine:
+    """A transition table compiled from the states of a FiniteStateMachine, with states and actions interned as
+    integers. Runs the machine for many agents at once, each agent's state being an element of a numpy array.
+    """
+
+    def __init__(self, states):
+        """
+
+        :param states: The map of each state to its map of actions and corresponding states
+        :type states: dict
+        """
+        if numpy is None:
+            raise ImportError("Compiled state machines require numpy to be installed")
+        self.state_names = list(states.keys())
+        self.action_names = []
+        for actions in states.values():
+            for action, next_state in actions.items():
+                if action not in self.action_names:
+                    self.action_names.append(action)
+                if next_state not in self.state_names:
+                    self.state_names.append(next_state)
+        self.state_ids = {state: state_id for state_id, state in enumerate(self.state_names)}
+        self.action_ids = {action: action_id for action_id, action in enumerate(self.action_names)}
+
+        # One row per state and one column per action, plus a final column for action -1 that does nothing
+        dtype = numpy.int16 if len(self.state_names) <= numpy.iinfo(numpy.int16).max else numpy.int32
+        self.table = numpy.repeat(numpy.arange(len(self.state_names), dtype=dtype)[:, numpy.newaxis],
+                                  len(self.action_names) + 1, axis=1)
+        for state, actions in states.items():
+            for action, next_state in actions.items():
+                self.table[self.state_ids[state], self.action_ids[action]] = self.state_ids[next_state]
+
+        self._enter_callbacks = {}
+        self._exit_callbacks = {}
+
+    def get_state_id(self, state):
+        """Get the integer id of a state.
+
+        :param state: The name of the state
+        :type state: str
+        :return: The state id
+        :rtype: int
+        """
+        return self.state_ids[state]
+
+    def get_action_id(self, action):
+        """Get the integer id of an action.
+
+        :param action: The name of the action
+        :type action: str
+        :return: The action id
+        :rtype: int
+        """
+        return self.action_ids[action]
+
+    def get_state_name(self, state_id):
+        """Get the name of a state from its integer id.
+
+        :param state_id: The state id
+        :type state_id: int
+        :return: The name of the state
+        :rtype: str
+        """
+        return self.state_names[state_id]
+
+    def create_states(self, count, initial_state):
+        """Creates the state array of a number of machines.
+
+        :param count: The number of machines
+        :type count: int
+        :param initial_state: The state every machine starts in
+        :type initial_state: str
+        :return: The state id of each machine
+        :rtype: numpy.ndarray
+        """
+        return numpy.full(count, self.state_ids[initial_state], dtype=self.table.dtype)
+
+    def get_action_ids(self, actions):
+        """Interns a sequence of actions, e.g. the actions of every machine this frame.
+
+        :param actions: The actions. None for machines that don't act.
+        :type actions: iterable
+        :return: The action ids, -1 for no action
+        :rtype: numpy.ndarray
+        """
+        return numpy.array([-1 if action is None else self.action_ids[action] for action in actions], dtype=numpy.int32)
+
+    def do_action(self, state_id, action_id):
+        """Gets the state a single machine changes to when performing an action.
+
+        :param state_id: The state id of the machine
+        :type state_id: int
+        :param action_id: The action id, or -1 for no action
+        :type action_id: int
+        :return: The new state id of the machine
+        :rtype: int
+        """
+        return int(self.table[state_id, action_id])
+
+    def do_actions(self, states, actions):
+        """Performs an action on each of many machines at once, changing their states in place accordingly.
+        Enter and exit callbacks are called once per state, with every machine that changed into or out of it.
+
+        :param states: The state id of each machine
+        :type states: numpy.ndarray
+        :param actions: The action id performed by each machine, -1 for no action. A single action id performs the
+            same action on every machine.
+        :type actions: numpy.ndarray or int
+        :return: The indices of the machines that changed state
+        :rtype: numpy.ndarray
+        """
+        next_states = self.table[states, actions]
+        changed = numpy.flatnonzero(next_states != states)
+        if changed.size and (self._exit_callbacks or self._enter_callbacks):
+            previous_states = states[changed]
+            for state_id, callbacks in self._exit_callbacks.items():
+                machines = changed[previous_states == state_id]
+                if machines.size:
+                    for callback in callbacks:
+                        callback(machines, next_states[machines])
+            for state_id, callbacks in self._enter_callbacks.items():
+                entering = next_states[changed] == state_id
+                if entering.any():
+                    for callback in callbacks:
+                        callback(changed[entering], previous_states[entering])
+        states[changed] = next_states[changed]
+        return changed
+
+    def on_enter(self, state, callback):
+        """Adds a function to be called by do_actions whenever machines change into the given state.
+        It is called with the indices of the machines and the state ids they changed from.
+
+        :param state: The state
+        :type state: str
+        :param callback: The function to call
+        :type callback: callable
+        :return: This object so that function calls can be chained.
+        """
+        self._enter_callbacks.setdefault(self.state_ids[state], []).append(callback)
+        return self
+
+    def on_exit(self, state, callback):
+        """Adds a function to be called by do_actions whenever machines change out of the given state.
+        It is called with the indices of the machines and the state ids they are changing to.
+
+        :param state: The state
+        :type state: str
+        :param callback: The function to call
+        :type callback: callable
+        :return: This object so that function calls can be chained.
+        """
+        self._exit_callbacks.setdefault(self.state_ids[state], []).append(callback)
+        return self
@@ -0,0 +1,169 @@
+import pygame
+
+
+class TextLayout:
+    """Class for laying out a block of text with a BitmapFont, keeping its line metrics and glyph positions."""
+
+    alignments = ("left", "center", "right")
+
+    def __init__(self, font, text, width=None, align="left", line_spacing=1, spacing=None, kerning=None):
+        """
+
+        :param font: The font to lay the text out with
+        :type font: BitmapFont
+        :param text: The text. Newlines always start a new line.
+        :type text: str
+        :param width: The (optional) width in pixels to wrap the text to. Only newlines split the text if not given.
+        :type width: int
+        :param align: How each line is aligned within the width of the layout. "left", "center" or "right".
+        :type align: str
+        :param line_spacing: The number of pixels between each line
+        :type line_spacing: int
+        :param spacing: The number of pixels between each character. The font's spacing by default.
+        :type spacing: int
+        :param kerning: The (optional) extra pixels between pairs of characters e.g. {("A", "V"): -1}
+        :type kerning: dict
+        """
+        if align not in self.alignments:
+            raise ValueError("align must be one of " + ", ".join(self.alignments))
+        self.font = font
+        self.text = text
+        self.wrap_width = width
+        self.align = align
+        self.line_spacing = line_spacing
+        self.spacing = font.spacing if spacing is None else spacing
+        self.kerning = {} if kerning is None else kerning
+
+        self.lines = []  # (text, x, y, width) of each line
+        self.glyphs = []  # (char, x, y) of each drawn character
+        self.width, self.height = 0, 0
+
+        self._blit_key = None
+        self._blit_sequence = []
+        self._layout()
+
+    def _get_advance(self, char):
+        width = self.font.get_char_width(char)
+        return self.font.space_width if width is None else width + self.spacing
+
+    def _measure(self, line):
+        """Measures the width of a single line of text.
+
+        :param line: The line of text
+        :type line: str
+        :return: The width in pixels from the start of the line to the end of its last character, ignoring trailing
+            spaces
+        :rtype: int
+        """
+        x, width, previous = 0, 0, None
+        for char in line:
+            x += self.kerning.get((previous, char), 0)
+            char_width = self.font.get_char_width(char)
+            if char_width is None:
+                x += self.font.space_width
+            else:
+                width = x + char_width
+                x += char_width + self.spacing
+            previous = char
+        return width
+
+    def _wrap(self, paragraph):
+        """Splits a paragraph into lines no wider than the wrap width, breaking words only if they don't fit a line.
+
+        :param paragraph: The text without newlines
+        :type paragraph: str
+        :return: The lines of the paragraph
+        :rtype: list
+        """
+        if self.wrap_width is None:
+            return [paragraph]
+        lines = []
+        line = None
+        for word in paragraph.split(" "):
+            candidate = word if line is None else line + " " + word
+            if self._measure(candidate) <= self.wrap_width:
+                line = candidate
+                continue
+            if line is not None:
+                lines.append(line)
+            while len(word) > 1 and self._measure(word) > self.wrap_width:
+                end = 1
+                while end < len(word) and self._measure(word[:end + 1]) <= self.wrap_width:
+                    end += 1
+                lines.append(word[:end])
+                word = word[end:]
+            line = word
+        lines.append("" if line is None else line)
+        return lines
+
+    def _layout(self):
+        lines = []
+        for paragraph in self.text.split("\n"):
+            lines.extend(self._wrap(paragraph))
+        widths = [self._measure(line) for line in lines]
+        self.width = max(widths) if self.wrap_width is None else self.wrap_width
+        line_height = self.font.char_height + self.line_spacing
+        self.height = len(lines) * line_height - self.line_spacing
+
+        for index, (line, line_width) in enumerate(zip(lines, widths)):
+            if self.align == "center":
+                x = (self.width - line_width) // 2
+            elif self.align == "right":
+                x = self.width - line_width
+            else:
+                x = 0
+            y = index * line_height
+            self.lines.append((line, x, y, line_width))
+
+            previous = None
+            for char in line:
+                x += self.kerning.get((previous, char), 0)
+                if self.font.get_char_width(char) is not None:
+                    self.glyphs.append((char, x, y))
+                x += self._get_advance(char)
+                previous = char
+
+    def get_size(self):
+        """Get the size of the laid out text.
+
+        :return: The width, height
+        :rtype: tuple
+        """
+        return self.width, self.height
+
+    def render_on(self, surface, position, colour):
+        """Render the laid out text directly onto a given surface.
+        Rendering again at the same position in the same colour reuses the previous blit sequence.
+
+        :param surface: The surface to render the text on
+        :type surface: pygame.Surface
+        :param position: The (x,y) position of the top left of the layout
+        :type position: tuple
+        :param colour: The colour of the text
+        :type colour: tuple
+        :return: None
+        """
+        x, y = position
+        key = (x, y, tuple(colour))
+        if key != self._blit_key:
+            self._blit_sequence = [(self.font.get_glyph(char, colour), (x + glyph_x, y + glyph_y))
+                                   for char, glyph_x, glyph_y in self.glyphs]
+            self._blit_key = key
+        surface.blits(self._blit_sequence, doreturn=False)
+
+    def render(self, colour, flags=0):
+        """Get a surface with the laid out text rendered on it.
+
+        :param colour: The colour of the text
+        :type colour: tuple
+        :param flags: Optional pygame surface flags e.g pygame.SRCALPHA for per pixel alphas
+        :return: The rendered surface
+        :rtype: pygame.Surface
+        """
+        surface = pygame.Surface(self.get_size(), flags=flags)
+        colorkey = self.font.get_colorkey()
+        if colorkey is not None:
+            surface.fill(colorkey)
+            surface.set_colorkey(colorkey)
+        self.render_on(surface, (0, 0), colour)
+        return surface
@@ -5,7 +5,7 @@ from .asset_manager import AssetManager
 
 class TextureAtlas:
     """Class for storing textures from a spritesheet for easy retrieval with a key"""
-    def __init__(self, name, image_filetype=".png", colorkey=None):
+    def __init__(self, name, image_filetype=".png", colorkey=None, convert=False):
         """
 
         :param name: The name of the atlas you want to load without any file extension. The .json atlas file and the
@@ -15,23 +15,76 @@ class TextureAtlas:
         :type image_filetype: str
         :param colorkey: (Optional) colorkey for textures. The colorkey is displayed as transparent when blitting.
         :type colorkey: tuple
+        :param convert: Whether to convert the spritesheet to the display's pixel format for faster blitting.
+            Requires the display mode to be set.
+        :type convert: bool
         """
-        self._spritesheet = pygame.image.load(name + image_filetype)
-        if colorkey is not None:
-            self._spritesheet.set_colorkey(colorkey)
+        self._name = name
+        self._image_filetype = image_filetype
+        self._colorkey = colorkey
+        self._convert = convert
         self._atlas = AssetManager.load_json(name + ".json")
+        self._regions = {}
+
+        # Pages written by AtlasPacker after the first are only loaded once a region on them is needed
+        page_count = 1 + max((sprite.get("page", 0) for sprite in self._atlas.values()), default=0)
+        self._pages = [None] * page_count
+        self._spritesheet = self._get_page(0)
+
+    @staticmethod
+    def get_page_name(name, page):
+        """Gets the name of the spritesheet image of a page of an atlas, without the file extension.
+
+        :param name: The name of the atlas
+        :type name: str
+        :param page: The page number
+        :type page: int
+        :return: The name of the page
+        :rtype: str
+        """
+        return name if page == 0 else name + "_" + str(page)
+
+    def _get_page(self, page):
+        if self._pages[page] is None:
+            spritesheet = pygame.image.load(self.get_page_name(self._name, page) + self._image_filetype)
+            if self._convert:
+                spritesheet = spritesheet.convert_alpha() if self._colorkey is None else spritesheet.convert()
+            if self._colorkey is not None:
+                spritesheet.set_colorkey(self._colorkey)
+            self._pages[page] = spritesheet
+        return self._pages[page]
 
     def find_region(self, spritename):
         """Find the texture region linked with the name given.
+        Regions are cached, so finding the same sprite again returns the same surface.
 
         :param spritename: The name of the sprite in the texture atlas
         :type spritename: str
         :return: The corresponding texture region of the sprite
         :rtype: TextureRegion
         """
-        sprite = self._atlas[spritename]
-        region = pygame.Rect(sprite["x"],
-                             sprite["y"],
-                             sprite["width"],
-                             sprite["height"])
-        return self._spritesheet.subsurface(region)
+        region = self._regions.get(spritename)
+        if region is None:
+            sprite = self._atlas[spritename]
+            region = self._get_page(sprite.get("page", 0)).subsurface(pygame.Rect(sprite["x"],
+                                                                                   sprite["y"],
+                                                                                   sprite["width"],
+                                                                                   sprite["height"]))
+            self._regions[spritename] = region
+        return region
+
+    def get_sprite_names(self):
+        """Gets the names of every sprite in the atlas.
+
+        :return: The sprite names
+        :rtype: list
+        """
+        return list(self._atlas.keys())
+
+    def get_memory_size(self):
+        """Estimates the number of bytes of pixel data held by the loaded pages of the atlas.
+
+        :return: The size of the atlas in bytes
+        :rtype: int
+        """
+        return sum(page.get_pitch() * page.get_height() for page in self._pages if page is not None)
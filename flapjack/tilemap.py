@@ -1,17 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pygame
 
-from flapjack.flapjack.animation import Animation
+try:
+    import numpy
+except ImportError:  # numpy is only needed for compact tile maps
+    numpy = None
+
+from .animation import Animation
+from .chunk_cache import ChunkCache
+from .profiler import Profiler, profiled
 
 
 class TileMap:
 
+    # Tile flip flags, in the same order as the flag bits of Tiled's global tile ids
+    FLIP_HORIZONTAL = 8
+    FLIP_VERTICAL = 4
+    FLIP_DIAGONAL = 2
+
     map_dict_format = {
-        "chunks": {},  # "x,y": {"layers": []}
+        "chunks": {},  # "x,y": {"layers": []}, or (x, y): {"layers": [numpy.ndarray]} for compact maps
+        # Chunks can also have "flags": a list with the flip flags of the tiles of each layer, or None for layers with
+        # no flipped tiles. The flags are FLIP_HORIZONTAL, FLIP_VERTICAL and FLIP_DIAGONAL combined with |.
+        # Optionally "compact": True if the chunks are already compact, so they are used as they are. This lets
+        # loaders provide chunks lazily through a mapping.
         "chunk_size": [],  # [width, height]
         "tile_size": [],  # [width, height]
     }
 
-    def __init__(self, map_dict, tileset, tile_properties=None, colorkey=None):
+    def __init__(self, map_dict, tileset, tile_properties=None, colorkey=None, max_cached_chunks=None,
+                 max_cache_bytes=None, compact=False, convert_textures=False, animation_clock=None,
+                 flatten_layers=False, separate_layers=()):
         """Create a new TileMap with the given parameters.
 
         :param map_dict: The map data in dict form
@@ -22,42 +42,191 @@ class TileMap:
         :type tile_properties: dict
         :param colorkey: The (optional) colorkey of the tileset for transparent blitting
         :type colorkey: tuple
+        :param max_cached_chunks: The (optional) maximum number of rendered chunks kept in memory
+        :type max_cached_chunks: int
+        :param max_cache_bytes: The (optional) maximum number of bytes of rendered chunk surfaces kept in memory
+        :type max_cache_bytes: int
+        :param compact: Whether to store each chunk layer as a contiguous numpy array keyed by (x, y) tuples
+        :type compact: bool
+        :param convert_textures: Whether to convert the tile textures to the display's pixel format.
+            Requires the display mode to be set.
+        :type convert_textures: bool
+        :param animation_clock: An (optional) clock to time the tile animations with instead of counting frames.
+            It can be shared with other animations so they all advance in one tick.
+        :type animation_clock: AnimationClock
+        :param flatten_layers: Whether to composite each run of static layers of a chunk into one surface, converted
+            to the display's pixel format if the display mode is set. Layers with animated tiles in the chunk are
+            kept separate. A merged run is drawn by render whenever its first layer is drawn. Partly transparent
+            tiles over other partly transparent tiles blend slightly differently when merged.
+        :type flatten_layers: bool
+        :param separate_layers: The indices of layers never merged when flattening, e.g. layers drawn between
+            sprites or with parallax
+        :type separate_layers: iterable
         """
         self.tileset = tileset
         self.tile_properties = {} if tile_properties is None else tile_properties
 
         self.map_dict = map_dict
-        self.chunks = map_dict["chunks"]
         self.chunk_width, self.chunk_height = map_dict["chunk_size"]
         self.colorkey = colorkey
 
         self.tile_width, self.tile_height = map_dict["tile_size"]
 
-        self._chunk_surfaces = {}
+        self.compact = compact
+        if compact:
+            if numpy is None:
+                raise ImportError("Compact tile maps require numpy to be installed")
+            if map_dict.get("compact", False):
+                self.chunks = map_dict["chunks"]
+            else:
+                self.chunks = self._compact_chunks(map_dict["chunks"])
+                self.map_dict = dict(map_dict, chunks=self.chunks, compact=True)
+        else:
+            self.chunks = map_dict["chunks"]
+        self._property_tables = {}
+
+        self._tile_textures = self._get_tile_textures(convert_textures)
+        self._flipped_textures = {}
+
+        self._chunk_surfaces = ChunkCache(max_cached_chunks, max_cache_bytes, on_evict=self._on_chunk_evicted)
 
         self._animations = {}
         for tile_id, properties in self.tile_properties.items():
             if "animation" in properties.keys():
                 self._animations[tile_id] = Animation(properties["animation"])
+        self._tile_animations = {int(tile_id): animation for tile_id, animation in self._animations.items()}
+        self._animation_tile_ids = {animation: tile_id for tile_id, animation in self._animations.items()}
+        # Bumped every time an animation changes keyframe so chunks know which of their animated tiles are stale
+        self._animation_versions = {tile_id: 0 for tile_id in self._animations.keys()}
+        self.animation_clock = None
+        self._clock_tick = 0
+        self.set_animation_clock(animation_clock)
+        # "x,y": {tile_id: {(layer_index, x, y), ...}} for every chunk that has been indexed
+        self._animated_tiles = {}
+        # "x,y": {tile_id: version} of the animation frames currently drawn on each rendered chunk
+        self._drawn_versions = {}
+
+        self._prefetch_executor = None
+        self._prefetching = {}
+        self._prefetched_chunks = set()
+        self.prefetch_hits = 0
+        self.prefetch_waits = 0
+        self.prefetch_fallbacks = 0
 
-    def _render_chunk(self, chunk):
+        self._tile_listeners = []
+
+        self.flatten_layers = flatten_layers
+        self.separate_layers = set(separate_layers)
+        # Chunks edited with set_tile, whose tile data can't be unloaded without losing the edits
+        self._edited_chunks = set()
+        # "x,y": {layer_index: pygame.Rect} of the tiles changed by bulk edits since each rendered chunk was drawn
+        self._dirty_regions = {}
+
+    def _get_tile_dtype(self):
+        """Gets the smallest signed integer type that fits every tile id of the tileset as well as -1.
+
+        :return: The numpy integer type for compact layers
+        :rtype: numpy.dtype
+        """
+        tile_count = (self.tileset.get_width() // self.tile_width) * (self.tileset.get_height() // self.tile_height)
+        return numpy.dtype(numpy.int16 if tile_count <= numpy.iinfo(numpy.int16).max else numpy.int32)
+
+    def _compact_chunks(self, chunks):
+        """Converts chunks into compact chunks with (x, y) keys and contiguous numpy layers.
+
+        :param chunks: The chunks keyed by "x,y" strings or (x, y) tuples with layers as nested lists or arrays
+        :type chunks: dict
+        :return: The compact chunks
+        :rtype: dict
+        """
+        dtype = self._get_tile_dtype()
+        compact_chunks = {}
+        for chunk, chunk_data in chunks.items():
+            compact_chunks[self._get_chunk_key(chunk)] = dict(chunk_data, layers=[
+                numpy.ascontiguousarray(layer, dtype=dtype) for layer in chunk_data["layers"]
+            ])
+            if "flags" in chunk_data.keys():
+                compact_chunks[self._get_chunk_key(chunk)]["flags"] = [
+                    None if flags is None else numpy.ascontiguousarray(flags, dtype=numpy.uint8)
+                    for flags in chunk_data["flags"]
+                ]
+        return compact_chunks
+
+    def _get_chunk_key(self, chunk):
+        """Converts a chunk given as a "x,y" string or an (x, y) tuple to the key used by this map's chunks.
+
+        :param chunk: The chunk
+        :type chunk: str or tuple
+        :return: An (x, y) tuple for compact maps, a "x,y" string otherwise
+        :rtype: str or tuple
+        """
+        if self.compact:
+            if isinstance(chunk, str):
+                chunk_x, chunk_y = chunk.split(",")
+                return int(chunk_x), int(chunk_y)
+            return chunk if isinstance(chunk, tuple) else tuple(chunk)
+        if isinstance(chunk, str):
+            return chunk
+        return str(chunk[0]) + "," + str(chunk[1])
+
+    @profiled("TileMap.render_chunk")
+    def _render_chunk(self, chunk, animated_tiles=None):
         """Returns a list of rendered layer surfaces for this chunk.
+        When flattening layers, the first layer of each merged run holds the surface of the whole run and the other
+        layers of the run hold None.
 
         :param chunk: The chunk key
         :type chunk: str
+        :param animated_tiles: The animated tile index of the chunk, needed when flattening layers
+        :type animated_tiles: dict
         :return: The rendered layers of the chunk
         :rtype: list
         """
-        return [self._render_layer(layer) for layer in self.chunks[chunk]["layers"]]
+        chunk_data = self.chunks[chunk]
+        flags = chunk_data.get("flags")
+        if flags is None:
+            flags = [None] * len(chunk_data["layers"])
+        if not self.flatten_layers:
+            return [self._render_layer(layer, layer_flags) for layer, layer_flags in zip(chunk_data["layers"], flags)]
 
-    def _render_layer(self, layer):
-        """Renders a chunk layer onto a surface.
+        chunk_surfaces = []
+        for layer_indices in self._get_layer_runs(chunk_data["layers"], animated_tiles):
+            if len(layer_indices) == 1:
+                chunk_surfaces.append(self._render_layer(chunk_data["layers"][layer_indices[0]],
+                                                         flags[layer_indices[0]]))
+                continue
+            surface = self._create_layer_surface()
+            blit_sequence = []
+            for layer_index in layer_indices:
+                blit_sequence.extend(self._get_layer_blits(chunk_data["layers"][layer_index], flags[layer_index]))
+            surface.blits(blit_sequence, doreturn=False)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha() if self.colorkey is None else surface.convert()
+            chunk_surfaces.append(surface)
+            chunk_surfaces.extend([None] * (len(layer_indices) - 1))
+        return chunk_surfaces
 
-        :param layer: The chunk layer you want to render
-        :type layer: list
-        :return: The rendered chunk surface
-        :rtype: pygame.Surface
+    def _get_layer_runs(self, layers, animated_tiles):
+        """Splits the layers of a chunk into runs of static layers that can be merged and layers kept separate.
+
+        :param layers: The layers of the chunk
+        :type layers: list
+        :param animated_tiles: The animated tile index of the chunk
+        :type animated_tiles: dict
+        :return: The layer indices of each run in order
+        :rtype: list
         """
+        animated_layers = {layer_index for positions in animated_tiles.values() for layer_index, _, _ in positions}
+        runs = []
+        for layer_index in range(len(layers)):
+            separate = layer_index in self.separate_layers or layer_index in animated_layers
+            if separate or not runs or runs[-1][1]:
+                runs.append(([layer_index], separate))
+            else:
+                runs[-1][0].append(layer_index)
+        return [layer_indices for layer_indices, _ in runs]
+
+    def _create_layer_surface(self):
         layer_region = (self.tile_width * self.chunk_width, self.tile_height * self.chunk_height)
         if self.colorkey is None:
             surface = pygame.Surface(layer_region, pygame.SRCALPHA)
@@ -65,53 +234,369 @@ class TileMap:
             surface = pygame.Surface(layer_region)
             surface.fill(self.colorkey)
             surface.set_colorkey(self.colorkey)
+        return surface
+
+    def _render_layer(self, layer, layer_flags=None):
+        """Renders a chunk layer onto a surface.
 
-        for y in range(self.chunk_height):
-            for x in range(self.chunk_width):
-                tile_id = layer[y][x]
-                self._render_tile(x, y, tile_id, surface)
+        :param layer: The chunk layer you want to render
+        :type layer: list
+        :param layer_flags: The (optional) flip flags of the tiles of the layer
+        :type layer_flags: list
+        :return: The rendered chunk surface
+        :rtype: pygame.Surface
+        """
+        surface = self._create_layer_surface()
+        surface.blits(self._get_layer_blits(layer, layer_flags), doreturn=False)
         return surface
 
-    def _render_tile(self, x, y, tile_id, surface, remove=False):
+    def _get_layer_blits(self, layer, layer_flags=None, region=None):
+        """Gets the blit sequence that draws the tiles of a chunk layer.
+
+        :param layer: The chunk layer
+        :type layer: list
+        :param layer_flags: The (optional) flip flags of the tiles of the layer
+        :type layer_flags: list
+        :param region: The (optional) region of the layer to draw in tiles. The whole layer by default.
+        :type region: pygame.Rect
+        :return: The (texture, position) of each tile
+        :rtype: list
+        """
+        if region is None:
+            left, top, right, bottom = 0, 0, self.chunk_width, self.chunk_height
+        else:
+            left, top, right, bottom = region.left, region.top, region.right, region.bottom
+        if self.compact:
+            ys, xs = numpy.nonzero(layer[top:bottom, left:right] >= 0)
+            ys += top
+            xs += left
+            tiles = zip(xs.tolist(), ys.tolist(), layer[ys, xs].tolist())
+        else:
+            tiles = ((x, y, layer[y][x]) for y in range(top, bottom) for x in range(left, right))
+
+        textures, animations = self._tile_textures, self._tile_animations
+        blit_sequence = []
+        for x, y, tile_id in tiles:
+            if tile_id >= 0:
+                animation = animations.get(tile_id)
+                texture_id = tile_id if animation is None else int(animation.get_current_texture())
+                if layer_flags is not None and layer_flags[y][x]:
+                    texture = self._get_flipped_texture(texture_id, int(layer_flags[y][x]))
+                else:
+                    texture = textures[texture_id]
+                blit_sequence.append((texture, (x * self.tile_width, y * self.tile_height)))
+        if Profiler.active is not None:
+            Profiler.active.count("TileMap.tiles_blitted", len(blit_sequence))
+        return blit_sequence
+
+    def _render_tile(self, x, y, tile_id, surface, remove=False, flags=0):
+        if remove:
+            self._clear_tile(x, y, surface)
         if tile_id >= 0:
-            if str(tile_id) in self._animations.keys():
-                tile_texture = self.get_tile_texture(self._animations[str(tile_id)].get_current_texture())
-            else:
-                tile_texture = self.get_tile_texture(tile_id)
-            surface.blit(tile_texture, (x * self.tile_width, y * self.tile_height))
-        elif remove:
-            if self.colorkey is None:
-                fill = (0, 0, 0, 0)
-            else:
-                fill = self.colorkey
-            pygame.draw.rect(surface,
-                             fill,
-                             pygame.Rect(x * self.tile_width, y * self.tile_height, self.tile_width, self.tile_height))
+            animation = self._tile_animations.get(tile_id)
+            texture_id = tile_id if animation is None else animation.get_current_texture()
+            surface.blit(self._get_flipped_texture(int(texture_id), flags), (x * self.tile_width, y * self.tile_height))
 
-    def _render_animated_tiles(self, chunk, layer_index, layer_surface):
-        layer = self.chunks[chunk]["layers"][layer_index]
-        for y in range(self.chunk_height):
-            for x in range(self.chunk_width):
-                tile_id = layer[y][x]
-                if str(tile_id) in self._animations.keys():
-                    self._render_tile(x, y, tile_id, layer_surface)
-        return layer_surface
+    def _get_flipped_texture(self, texture_id, flags):
+        """Gets the texture of a tile flipped by the given flags. Flipped textures are cached.
+
+        :param texture_id: The tile texture id
+        :type texture_id: int
+        :param flags: The flip flags
+        :type flags: int
+        :return: The flipped texture
+        :rtype: pygame.Surface
+        """
+        if not flags:
+            return self._tile_textures[texture_id]
+        texture = self._flipped_textures.get((texture_id, flags))
+        if texture is None:
+            texture = self._tile_textures[texture_id]
+            if flags & self.FLIP_DIAGONAL:
+                # Swaps the x and y axes, which is applied before the horizontal and vertical flips
+                texture = pygame.transform.flip(pygame.transform.rotate(texture, 90), False, True)
+            texture = pygame.transform.flip(texture, bool(flags & self.FLIP_HORIZONTAL),
+                                            bool(flags & self.FLIP_VERTICAL))
+            self._flipped_textures[(texture_id, flags)] = texture
+        return texture
+
+    def _get_tile_flags(self, chunk, layer_index, x, y):
+        flags = self.chunks[chunk].get("flags")
+        if flags is None or flags[layer_index] is None:
+            return 0
+        return int(flags[layer_index][y][x])
+
+    def _clear_tile(self, x, y, surface):
+        fill = (0, 0, 0, 0) if self.colorkey is None else self.colorkey
+        surface.fill(fill, pygame.Rect(x * self.tile_width, y * self.tile_height, self.tile_width, self.tile_height))
+
+    def _get_animated_tiles(self, chunk):
+        """Gets the positions of the animated tiles in a chunk, indexing the chunk first if needed.
+
+        :param chunk: The chunk key
+        :type chunk: str
+        :return: The set of (layer_index, x, y) positions of each animated tile id in the chunk
+        :rtype: dict
+        """
+        if chunk not in self._animated_tiles.keys():
+            self._animated_tiles[chunk] = self._index_animated_tiles(chunk)
+        return self._animated_tiles[chunk]
+
+    def _index_animated_tiles(self, chunk):
+        """Finds the positions of the animated tiles in a chunk.
+
+        :param chunk: The chunk key
+        :type chunk: str
+        :return: The set of (layer_index, x, y) positions of each animated tile id in the chunk
+        :rtype: dict
+        """
+        animated_tiles = {}
+        if self._animations and self.compact:
+            animated_ids = numpy.array([int(tile_id) for tile_id in self._animations.keys()])
+            for layer_index, layer in enumerate(self.chunks[chunk]["layers"]):
+                ys, xs = numpy.nonzero(numpy.isin(layer, animated_ids))
+                for x, y, tile_id in zip(xs.tolist(), ys.tolist(), layer[ys, xs].tolist()):
+                    animated_tiles.setdefault(str(tile_id), set()).add((layer_index, x, y))
+        elif self._animations:
+            for layer_index, layer in enumerate(self.chunks[chunk]["layers"]):
+                for y in range(self.chunk_height):
+                    for x in range(self.chunk_width):
+                        tile_id = str(layer[y][x])
+                        if tile_id in self._animations.keys():
+                            animated_tiles.setdefault(tile_id, set()).add((layer_index, x, y))
+        return animated_tiles
+
+    def _get_animation_versions(self, animated_tiles):
+        return {tile_id: self._animation_versions[tile_id] for tile_id in animated_tiles.keys()}
+
+    def _install_chunk(self, chunk, chunk_surfaces, drawn_versions, animated_tiles=None):
+        """Adds rendered chunk surfaces to the chunk cache along with the animation frames drawn on them.
+
+        :param chunk: The chunk key
+        :type chunk: str
+        :param chunk_surfaces: The rendered layers of the chunk
+        :type chunk_surfaces: list
+        :param drawn_versions: The versions of the animations drawn on the surfaces
+        :type drawn_versions: dict
+        :param animated_tiles: The (optional) animated tile index the surfaces were rendered with
+        :type animated_tiles: dict
+        :return: The chunk surfaces
+        :rtype: list
+        """
+        if animated_tiles is not None:
+            self._animated_tiles.setdefault(chunk, animated_tiles)
+        self._drawn_versions[chunk] = drawn_versions
+        return self._chunk_surfaces.put(chunk, chunk_surfaces)
+
+    @profiled("TileMap.render_animated_tiles")
+    def _render_animated_tiles(self, chunk, chunk_surfaces):
+        """Redraws the animated tiles of a rendered chunk whose animations changed keyframe since they were drawn.
+
+        :param chunk: The chunk key
+        :type chunk: str
+        :param chunk_surfaces: The rendered layer surfaces of the chunk
+        :type chunk_surfaces: list
+        :return: None
+        """
+        drawn_versions = self._drawn_versions[chunk]
+        for tile_id, positions in self._get_animated_tiles(chunk).items():
+            version = self._animation_versions[tile_id]
+            if drawn_versions.get(tile_id) != version:
+                texture_id = int(self._animations[tile_id].get_current_texture())
+                for layer_index, x, y in positions:
+                    texture = self._get_flipped_texture(texture_id, self._get_tile_flags(chunk, layer_index, x, y))
+                    self._clear_tile(x, y, chunk_surfaces[layer_index])
+                    chunk_surfaces[layer_index].blit(texture, (x * self.tile_width, y * self.tile_height))
+                drawn_versions[tile_id] = version
+                if Profiler.active is not None:
+                    Profiler.active.count("TileMap.animated_tiles_redrawn", len(positions))
+
+    def _on_chunk_evicted(self, chunk, chunk_surfaces):
+        self._drawn_versions.pop(chunk, None)
+        self._dirty_regions.pop(chunk, None)
+        self._prefetched_chunks.discard(chunk)
 
     def get_chunk_surface(self, chunk):
         """Gets a rendered surface of the given chunk.
 
         :param chunk: The chunk key
-        :type chunk: str
+        :type chunk: str or tuple
         :return: The chunk surface
         :type: pygame.Surface
         """
-        if chunk in self._chunk_surfaces.keys():
-            for layer_index, layer_surface in enumerate(self._chunk_surfaces[chunk]):
-                self._render_animated_tiles(chunk, layer_index, layer_surface)
-            return self._chunk_surfaces[chunk]
-        else:
-            self._chunk_surfaces[chunk] = self._render_chunk(chunk)
-            return self._chunk_surfaces[chunk]
+        chunk = self._get_chunk_key(chunk)
+        chunk_surfaces = self._chunk_surfaces.get(chunk)
+        if Profiler.active is not None:
+            Profiler.active.count("TileMap.chunk_cache_hits" if chunk_surfaces is not None else
+                                  "TileMap.chunk_cache_misses")
+        if chunk_surfaces is not None and chunk in self._dirty_regions.keys():
+            chunk_surfaces = self._render_dirty_regions(chunk, chunk_surfaces)
+        if chunk_surfaces is not None:
+            if chunk in self._prefetched_chunks:
+                self._prefetched_chunks.discard(chunk)
+                self.prefetch_hits += 1
+            self._render_animated_tiles(chunk, chunk_surfaces)
+            return chunk_surfaces
+
+        future = self._prefetching.pop(chunk, None)
+        if future is not None and not future.cancelled():
+            done = future.done()
+            # A prefetch that failed is rendered again below instead
+            if future.exception() is None:
+                if done:
+                    self.prefetch_hits += 1
+                else:
+                    self.prefetch_waits += 1
+                chunk_surfaces = self._install_chunk(chunk, *future.result())
+                self._render_animated_tiles(chunk, chunk_surfaces)
+                return chunk_surfaces
+
+        if self._prefetch_executor is not None:
+            self.prefetch_fallbacks += 1
+        animated_tiles = self._get_animated_tiles(chunk)
+        drawn_versions = self._get_animation_versions(animated_tiles)
+        return self._install_chunk(chunk, self._render_chunk(chunk, animated_tiles), drawn_versions)
+
+    def _prefetch_chunk(self, chunk):
+        """Renders a chunk on a prefetch worker without touching any of the map's shared state.
+
+        :param chunk: The chunk key
+        :type chunk: str
+        :return: The rendered layers, the animation versions drawn on them and the animated tile index of the chunk
+        :rtype: tuple
+        """
+        animated_tiles = self._animated_tiles.get(chunk)
+        if animated_tiles is None:
+            animated_tiles = self._index_animated_tiles(chunk)
+        drawn_versions = self._get_animation_versions(animated_tiles)
+        return self._render_chunk(chunk, animated_tiles), drawn_versions, animated_tiles
+
+    def enable_prefetch(self, workers=2):
+        """Starts rendering chunks passed to prefetch on a pool of worker threads.
+        Blitting releases the GIL so the workers render alongside the game loop.
+
+        :param workers: The number of worker threads
+        :type workers: int
+        :return: None
+        """
+        if self._prefetch_executor is None:
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="TileMapPrefetch")
+
+    def disable_prefetch(self):
+        """Stops the prefetch workers, discarding any chunks still being rendered.
+
+        :return: None
+        """
+        if self._prefetch_executor is not None:
+            for future in self._prefetching.values():
+                future.cancel()
+            self._prefetching.clear()
+            self._prefetch_executor.shutdown(wait=True)
+            self._prefetch_executor = None
+
+    def collect_prefetched(self):
+        """Adds every chunk that has finished prefetching to the chunk cache.
+
+        :return: The number of chunks added to the cache
+        :rtype: int
+        """
+        collected = 0
+        for chunk, future in list(self._prefetching.items()):
+            if future.done():
+                del self._prefetching[chunk]
+                # Failed prefetches are forgotten so that the chunk can be prefetched or rendered again
+                if not future.cancelled() and future.exception() is None:
+                    self._install_chunk(chunk, *future.result())
+                    self._prefetched_chunks.add(chunk)
+                    collected += 1
+        return collected
+
+    def prefetch(self, camera, velocity=(0, 0), lookahead=1, margin=0):
+        """Starts rendering the chunks the camera is predicted to see in the background, nearest chunks first.
+        Chunks that finished prefetching since the last call are added to the chunk cache.
+        Does nothing unless enable_prefetch has been called.
+
+        :param camera: The region of the map currently being rendered, in map coordinates
+        :type camera: pygame.Rect
+        :param velocity: The (x, y) distance the camera moves per frame
+        :type velocity: tuple
+        :param lookahead: The number of frames ahead to predict the camera position for
+        :type lookahead: int
+        :param margin: The number of extra pixels around the predicted camera to prefetch
+        :type margin: int
+        :return: The number of chunks submitted for rendering
+        :rtype: int
+        """
+        if self._prefetch_executor is None:
+            return 0
+        self.collect_prefetched()
+        velocity_x, velocity_y = velocity
+        predicted = camera.move(velocity_x * lookahead, velocity_y * lookahead).union(camera)
+        predicted.inflate_ip(margin * 2, margin * 2)
+
+        chunk_pixel_width, chunk_pixel_height = self.chunk_width * self.tile_width, self.chunk_height * self.tile_height
+        chunks = [chunk for chunk in self.get_chunks_in_rect(predicted)
+                  if chunk not in self._chunk_surfaces and chunk not in self._prefetching.keys()]
+        center_x, center_y = camera.center
+
+        def distance(chunk):
+            chunk_x, chunk_y = self.get_chunk_position(chunk)
+            return (abs(chunk_x + chunk_pixel_width // 2 - center_x)
+                    + abs(chunk_y + chunk_pixel_height // 2 - center_y))
+
+        for chunk in sorted(chunks, key=distance):
+            self._prefetching[chunk] = self._prefetch_executor.submit(self._prefetch_chunk, chunk)
+        return len(chunks)
+
+    def get_prefetch_stats(self):
+        """Gets the counters of the background chunk prefetching.
+
+        :return: The number of chunks that were prefetched in time, that had to be waited on, that were rendered
+            synchronously while prefetching was enabled, and that are still being rendered
+        :rtype: dict
+        """
+        return {"hits": self.prefetch_hits,
+                "waits": self.prefetch_waits,
+                "fallbacks": self.prefetch_fallbacks,
+                "pending": len(self._prefetching)}
+
+    def stream_chunks(self, camera, margin=0):
+        """Unloads the tile data of the chunks far from the camera when the map's chunks are loaded lazily, such as
+        by StreamingTiledMapLoader or BinaryMapLoader. They are loaded again when next needed.
+        Chunks edited with set_tile are never unloaded. Rendered chunk surfaces are kept by the chunk cache as usual.
+
+        :param camera: The region of the map currently being rendered, in map coordinates
+        :type camera: pygame.Rect
+        :param margin: The number of extra pixels around the camera to keep the chunks of
+        :type margin: int
+        :return: The number of chunks unloaded
+        :rtype: int
+        """
+        if not hasattr(self.chunks, "unload"):
+            return 0
+        keep = set(self.get_chunks_in_rect(camera.inflate(margin * 2, margin * 2)))
+        unloaded = 0
+        for chunk in self.chunks.get_loaded_chunks():
+            if chunk not in keep and chunk not in self._edited_chunks and chunk not in self._prefetching.keys():
+                self.chunks.unload(chunk)
+                unloaded += 1
+        return unloaded
+
+    def get_memory_size(self):
+        """Estimates the number of bytes of pixel data held by the tileset and the rendered chunks.
+
+        :return: The size of the map's surfaces in bytes
+        :rtype: int
+        """
+        return self.tileset.get_pitch() * self.tileset.get_height() + self._chunk_surfaces.resident_bytes
+
+    def get_chunk_cache_stats(self):
+        """Gets the hit, miss and eviction counters of the rendered chunk cache.
+
+        :return: The chunk cache counters
+        :rtype: dict
+        """
+        return self._chunk_surfaces.get_stats()
 
     def _get_tile_data_at(self, layer, x, y):
         """Gets the tile at the x,y coordinate in the chunk given.
@@ -136,11 +621,48 @@ class TileMap:
         :return: The tile surface.
         :rtype: pygame.Surface
         """
-        tile_id = int(tile_id)
-        columns = self.tileset.get_width() // self.tile_width
-        column, row = tile_id % columns, tile_id // columns
-        region = pygame.Rect(column * self.tile_width, row * self.tile_height, self.tile_width, self.tile_height)
-        return self.tileset.subsurface(region)
+        return self._tile_textures[int(tile_id)]
+
+    def _get_tile_textures(self, convert=False):
+        """Cuts the tileset into a list of tile textures indexed by tile id.
+
+        :param convert: Whether to convert the textures to the display's pixel format
+        :type convert: bool
+        :return: The tile textures
+        :rtype: list
+        """
+        columns, rows = self.tileset.get_width() // self.tile_width, self.tileset.get_height() // self.tile_height
+        textures = []
+        for row in range(rows):
+            for column in range(columns):
+                texture = self.tileset.subsurface(pygame.Rect(column * self.tile_width, row * self.tile_height,
+                                                              self.tile_width, self.tile_height))
+                if convert:
+                    texture = texture.convert_alpha() if self.colorkey is None else texture.convert()
+                textures.append(texture)
+        return textures
+
+    def set_tileset(self, tileset, convert_textures=False):
+        """Replaces the tileset of the map. Every chunk is rendered again with the new tileset when next needed.
+
+        :param tileset: The tileset image as a pygame Surface
+        :type tileset: pygame.Surface
+        :param convert_textures: Whether to convert the tile textures to the display's pixel format.
+            Requires the display mode to be set.
+        :type convert_textures: bool
+        :return: None
+        """
+        for future in self._prefetching.values():
+            future.cancel()
+        self._prefetching.clear()
+        self._prefetched_chunks.clear()
+        self.tileset = tileset
+        self._tile_textures = self._get_tile_textures(convert_textures)
+        self._flipped_textures.clear()
+        self._property_tables.clear()
+        self._chunk_surfaces.clear()
+        self._drawn_versions.clear()
+        self._dirty_regions.clear()
 
     def get_overlapping_tiles(self, rect, layer_index=0, properties=()):
         """Get all the tiles that overlap the given rect that have the given properties set to true.
@@ -158,7 +680,7 @@ class TileMap:
         overlapping_tiles = []
         for x, y in (rect.topleft, rect.topright, rect.bottomleft, rect.bottomright):
             chunk_x, chunk_y = self.get_chunk_at_position((x, y))
-            chunk = str(chunk_x) + "," + str(chunk_y)
+            chunk = self._get_chunk_key((chunk_x, chunk_y))
             real_chunk_x = self.chunk_width * self.tile_width * chunk_x
             real_chunk_y = self.chunk_height * self.tile_height * chunk_y
             relative_x = (x - real_chunk_x) // self.tile_width
@@ -173,6 +695,79 @@ class TileMap:
                                                          self.tile_height))
         return overlapping_tiles
 
+    def _get_property_table(self, tile_property):
+        """Gets a lookup table of whether each tile id has the given property set to true.
+        The table is indexed by tile id + 1 so that empty tiles (-1) map to the first entry.
+
+        :param tile_property: The name of the property
+        :type tile_property: str
+        :return: The lookup table, with a trailing False entry for any tile id outside of the tileset
+        :rtype: numpy.ndarray
+        """
+        if tile_property not in self._property_tables.keys():
+            tile_count = (self.tileset.get_width() // self.tile_width) * (self.tileset.get_height() // self.tile_height)
+            max_id = max([tile_count - 1] + [int(tile_id) for tile_id in self.tile_properties.keys()])
+            table = numpy.zeros(max_id + 3, dtype=bool)
+            for tile_id, properties in self.tile_properties.items():
+                table[int(tile_id) + 1] = bool(properties.get(tile_property, False))
+            self._property_tables[tile_property] = table
+        return self._property_tables[tile_property]
+
+    def get_tiles_with_property(self, tile_property, rect=None, layer_index=0):
+        """Get all the tiles that have the given property set to true, using whole-array lookups on each chunk layer.
+
+        :param tile_property: The name of the property the tiles must declare to be true
+        :type tile_property: str
+        :param rect: The (optional) region to search in. The whole map if not given.
+        :type rect: pygame.Rect
+        :param layer_index: The index of the layer you want to search. Bottom layer by default.
+        :type layer_index: int
+        :return: A list of tile rectangles
+        :rtype: list
+        """
+        if numpy is None:
+            raise ImportError("Property queries require numpy to be installed")
+        table = self._get_property_table(tile_property)
+        if rect is None:
+            chunks = self.chunks.keys()
+            tile_region = None
+        else:
+            tile_region = (rect.left // self.tile_width, rect.top // self.tile_height,
+                           (rect.right - 1) // self.tile_width + 1, (rect.bottom - 1) // self.tile_height + 1)
+            left, top, right, bottom = self._get_chunk_range(rect)
+            chunks = [self._get_chunk_key((x, y)) for y in range(top, bottom) for x in range(left, right)]
+            chunks = [chunk for chunk in chunks if chunk in self.chunks.keys()]
+
+        tiles = []
+        for chunk in chunks:
+            chunk_x, chunk_y = (int(i) for i in chunk.split(",")) if isinstance(chunk, str) else chunk
+            origin_x, origin_y = chunk_x * self.chunk_width, chunk_y * self.chunk_height
+            layer = numpy.asarray(self.chunks[chunk]["layers"][layer_index])
+            matches = numpy.take(table, layer.astype(numpy.intp) + 1, mode="clip")
+            if tile_region is not None:
+                left, top, right, bottom = tile_region
+                matches[:, :max(0, left - origin_x)] = False
+                matches[:, max(0, right - origin_x):] = False
+                matches[:max(0, top - origin_y)] = False
+                matches[max(0, bottom - origin_y):] = False
+            ys, xs = numpy.nonzero(matches)
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                tiles.append(pygame.Rect((origin_x + x) * self.tile_width, (origin_y + y) * self.tile_height,
+                                         self.tile_width, self.tile_height))
+        return tiles
+
+    def _get_chunk_range(self, rect):
+        """Gets the range of chunk coordinates that a rect overlaps.
+
+        :param rect: The rect in map coordinates
+        :type rect: pygame.Rect
+        :return: The left, top, right and bottom chunk coordinates, with right and bottom exclusive
+        :rtype: tuple
+        """
+        chunk_pixel_width, chunk_pixel_height = self.chunk_width * self.tile_width, self.chunk_height * self.tile_height
+        return (rect.left // chunk_pixel_width, rect.top // chunk_pixel_height,
+                (rect.right - 1) // chunk_pixel_width + 1, (rect.bottom - 1) // chunk_pixel_height + 1)
+
     def get_chunk_at_position(self, position):
         """Gets the coordinate pair referencing the chunk location in the map that the position is inside.
 
@@ -195,8 +790,8 @@ class TileMap:
         corner_chunks = [self.get_chunk_at_position(corner) for corner in corners]
         region_chunks = []
         for x in range(corner_chunks[0][0], corner_chunks[1][0] + 1):
-            for y in range(corner_chunks[0][1], corner_chunks[1][1] + 1):
-                if str(x) + "," + str(y) in self.chunks.keys():
+            for y in range(corner_chunks[0][1], corner_chunks[2][1] + 1):
+                if self._get_chunk_key((x, y)) in self.chunks.keys():
                     region_chunks.append((x, y))
         return region_chunks
 
@@ -204,35 +799,442 @@ class TileMap:
         """Gets the real position of the top left corner of the chunk
 
         :param chunk: The chunk key
-        :type chunk: str
+        :type chunk: str or tuple
         :return: The position of the top left corner of the chunk
         :rtype: tuple
         """
-        chunk_x, chunk_y = (int(i) for i in chunk.split(","))
+        chunk_x, chunk_y = (int(i) for i in chunk.split(",")) if isinstance(chunk, str) else chunk
         return self.chunk_width * self.tile_width * chunk_x, self.chunk_height * self.tile_height * chunk_y
 
-    def set_tile(self, tile_id, chunk, layer_index, position):
+    def get_chunks_in_rect(self, rect):
+        """Gets the keys of all chunks that overlap the given rect.
+
+        :param rect: The rect in map coordinates, e.g. a camera
+        :type rect: pygame.Rect
+        :return: A list of chunk keys in row order
+        :rtype: list
+        """
+        left, top, right, bottom = self._get_chunk_range(rect)
+        chunks = []
+        for y in range(top, bottom):
+            for x in range(left, right):
+                chunk = self._get_chunk_key((x, y))
+                if chunk in self.chunks.keys():
+                    chunks.append(chunk)
+        return chunks
+
+    def get_layer_count(self):
+        """Gets the number of layers in the map's chunks.
+
+        :return: The number of layers. 0 if the map has no chunks.
+        :rtype: int
+        """
+        for chunk_data in self.chunks.values():
+            return len(chunk_data["layers"])
+        return 0
+
+    @profiled("TileMap.render")
+    def render(self, surface, camera, position=(0, 0), layers=None, parallax=None, batch=True):
+        """Renders every layer of every chunk visible through the camera onto a surface, bottom layer first.
+
+        :param surface: The surface to render the map on
+        :type surface: pygame.Surface
+        :param camera: The region of the map to render, in map coordinates
+        :type camera: pygame.Rect
+        :param position: The (x, y) position on the surface at which to render the top left of the camera
+        :type position: tuple
+        :param layers: The (optional) indices of the layers to render in order e.g range(0, 2). All layers by default.
+        :type layers: iterable
+        :param parallax: The (optional) scroll factor of each layer index as a float or an (x, y) pair. A layer with
+            a factor of 0.5 scrolls at half the speed of the camera. Layers not given scroll with the camera.
+        :type parallax: dict
+        :param batch: Whether to blit every chunk layer with a single Surface.blits call
+        :type batch: bool
+        :return: The number of chunk layer surfaces blitted
+        :rtype: int
+        """
+        if layers is None:
+            layers = range(self.get_layer_count())
+        parallax = {} if parallax is None else parallax
+        chunk_pixel_width, chunk_pixel_height = self.chunk_width * self.tile_width, self.chunk_height * self.tile_height
+        surface_x, surface_y = position
+
+        chunk_surfaces = {}
+        visible_chunks = {}
+        blit_sequence = []
+        for layer_index in layers:
+            factor = parallax.get(layer_index, 1)
+            factor_x, factor_y = (factor, factor) if isinstance(factor, (int, float)) else factor
+            view_x, view_y = int(camera.x * factor_x), int(camera.y * factor_y)
+            if (view_x, view_y) not in visible_chunks.keys():
+                view = pygame.Rect(view_x, view_y, camera.width, camera.height)
+                visible_chunks[(view_x, view_y)] = self.get_chunks_in_rect(view)
+            for chunk in visible_chunks[(view_x, view_y)]:
+                if chunk not in chunk_surfaces.keys():
+                    chunk_surfaces[chunk] = self.get_chunk_surface(chunk)
+                if layer_index < len(chunk_surfaces[chunk]) and chunk_surfaces[chunk][layer_index] is not None:
+                    chunk_x, chunk_y = chunk if self.compact else (int(i) for i in chunk.split(","))
+                    blit_sequence.append((chunk_surfaces[chunk][layer_index],
+                                          (surface_x + chunk_x * chunk_pixel_width - view_x,
+                                           surface_y + chunk_y * chunk_pixel_height - view_y)))
+
+        clip = surface.get_clip()
+        surface.set_clip(clip.clip(pygame.Rect(position, camera.size)))
+        if batch:
+            surface.blits(blit_sequence, doreturn=False)
+        else:
+            for layer_surface, destination in blit_sequence:
+                surface.blit(layer_surface, destination)
+        surface.set_clip(clip)
+        return len(blit_sequence)
+
+    def set_tile(self, tile_id, chunk, layer_index, position, flags=0):
         """Sets the tile at the given location, on the given layer, at the given chunk as the tile id given.
-        This automatically updates the chunk surfaces of the tilemap.
+        This automatically updates the chunk surfaces of the tilemap if the chunk is currently rendered, otherwise
+        the change shows up when the chunk is next rendered.
 
         :param tile_id: The tile
         :type tile_id: int
         :param chunk: The chunk key
-        :type chunk: str
+        :type chunk: str or tuple
         :param layer_index: The index of the layer you want to set the tile on
         :type layer_index: int
         :param position: The (x, y) location of the tile in the chunk
         :type position tuple
+        :param flags: The flip flags of the tile e.g. TileMap.FLIP_HORIZONTAL | TileMap.FLIP_VERTICAL
+        :type flags: int
         :return: None
         """
+        chunk = self._get_chunk_key(chunk)
         x, y = position
-        self.chunks[chunk]["layers"][layer_index][y][x] = tile_id
-        self._render_tile(x, y, tile_id, self._chunk_surfaces[chunk][layer_index], remove=True)
+        future = self._prefetching.pop(chunk, None)
+        if future is not None:
+            # The worker may have read the chunk before this edit, so its surfaces can't be trusted
+            future.cancel()
+        layer = self.chunks[chunk]["layers"][layer_index]
+        if chunk in self._animated_tiles.keys():
+            animated_tiles = self._animated_tiles[chunk]
+            old_tile_id = str(layer[y][x])
+            if old_tile_id in animated_tiles.keys():
+                animated_tiles[old_tile_id].discard((layer_index, x, y))
+                if not animated_tiles[old_tile_id]:
+                    del animated_tiles[old_tile_id]
+            if str(tile_id) in self._animations.keys():
+                animated_tiles.setdefault(str(tile_id), set()).add((layer_index, x, y))
+        layer[y][x] = tile_id
+        self._set_tile_flags(chunk, layer_index, x, y, flags)
+        self._edited_chunks.add(chunk)
+        chunk_surfaces = self._chunk_surfaces.peek(chunk)
+        if chunk_surfaces is not None:
+            self._redraw_tile(chunk, chunk_surfaces, layer_index, x, y)
+        for listener in self._tile_listeners:
+            listener(chunk, layer_index, position, tile_id)
+
+    def _redraw_tile(self, chunk, chunk_surfaces, layer_index, x, y):
+        """Redraws a tile of a rendered chunk after it was set. The tile is redrawn along with the tiles at the same
+        position on the other layers merged with its layer, or the whole chunk is discarded to be rendered again if
+        an animated tile was set on a merged layer.
+
+        :return: None
+        """
+        first_layer = layer_index
+        while chunk_surfaces[first_layer] is None:
+            first_layer -= 1
+        end_layer = layer_index + 1
+        while end_layer < len(chunk_surfaces) and chunk_surfaces[end_layer] is None:
+            end_layer += 1
+        layers = self.chunks[chunk]["layers"]
+        if end_layer - first_layer == 1:
+            self._render_tile(x, y, int(layers[layer_index][y][x]), chunk_surfaces[layer_index], remove=True,
+                              flags=self._get_tile_flags(chunk, layer_index, x, y))
+        elif int(layers[layer_index][y][x]) in self._tile_animations.keys():
+            self._on_chunk_evicted(chunk, self._chunk_surfaces.discard(chunk))
+        else:
+            self._clear_tile(x, y, chunk_surfaces[first_layer])
+            for merged_layer in range(first_layer, end_layer):
+                self._render_tile(x, y, int(layers[merged_layer][y][x]), chunk_surfaces[first_layer],
+                                  flags=self._get_tile_flags(chunk, merged_layer, x, y))
+
+    def _set_tile_flags(self, chunk, layer_index, x, y, flags):
+        chunk_data = self.chunks[chunk]
+        all_flags = chunk_data.get("flags")
+        if not flags and (all_flags is None or all_flags[layer_index] is None):
+            return
+        if all_flags is None:
+            all_flags = chunk_data["flags"] = [None] * len(chunk_data["layers"])
+        if all_flags[layer_index] is None:
+            if self.compact:
+                all_flags[layer_index] = numpy.zeros((self.chunk_height, self.chunk_width), dtype=numpy.uint8)
+            else:
+                all_flags[layer_index] = [[0] * self.chunk_width for _ in range(self.chunk_height)]
+        all_flags[layer_index][y][x] = flags
+
+    def set_tiles(self, tiles, layer_index=0, create_chunks=False):
+        """Sets many tiles at once by their position in tiles across the whole map, e.g. for destructible terrain.
+        Rendered chunks are only redrawn once, around the changed tiles, when they are next needed.
+
+        :param tiles: The tile id of each (x, y) tile position as a dict, or an iterable of ((x, y), tile_id) pairs.
+            A tile id of -1 removes the tile.
+        :type tiles: dict or iterable
+        :param layer_index: The index of the layer to set the tiles on
+        :type layer_index: int
+        :param create_chunks: Whether to create empty chunks where tiles are set outside the existing chunks.
+            Raises KeyError for tiles outside the existing chunks otherwise. Chunks created in lazily loaded maps are
+            kept in memory by the chunk mapping.
+        :type create_chunks: bool
+        :return: The keys of the chunks that changed
+        :rtype: list
+        """
+        chunk_tiles = {}
+        for (tile_x, tile_y), tile_id in (tiles.items() if isinstance(tiles, dict) else tiles):
+            chunk = (tile_x // self.chunk_width, tile_y // self.chunk_height)
+            chunk_tiles.setdefault(chunk, []).append((tile_x % self.chunk_width, tile_y % self.chunk_height, tile_id))
+
+        self._check_edited_chunks(chunk_tiles.keys(), layer_index, create_chunks)
+        changed_chunks = []
+        for chunk, positions in chunk_tiles.items():
+            chunk = self._get_edited_chunk(chunk, layer_index, create_chunks)
+            layer = self.chunks[chunk]["layers"][layer_index]
+            if self.compact:
+                xs, ys, tile_ids = numpy.array(positions).T
+                layer[ys, xs] = tile_ids
+            else:
+                xs, ys, _ = zip(*positions)
+                for x, y, tile_id in positions:
+                    layer[y][x] = tile_id
+            if self.chunks[chunk].get("flags") is not None:
+                for x, y, _ in positions:
+                    self._set_tile_flags(chunk, layer_index, x, y, 0)
+            left, top = int(min(xs)), int(min(ys))
+            self._mark_dirty(chunk, layer_index, pygame.Rect(left, top, int(max(xs)) - left + 1,
+                                                             int(max(ys)) - top + 1))
+            changed_chunks.append(chunk)
+        return changed_chunks
+
+    def fill_tiles(self, rect, tile_id, layer_index=0, create_chunks=False):
+        """Sets every tile in a region of the map to the same tile, e.g. to clear or paint an area in a level editor.
+        Rendered chunks are only redrawn once, around the changed tiles, when they are next needed.
+
+        :param rect: The region to fill in tiles across the whole map
+        :type rect: pygame.Rect
+        :param tile_id: The tile to fill the region with. -1 removes the tiles.
+        :type tile_id: int
+        :param layer_index: The index of the layer to fill
+        :type layer_index: int
+        :param create_chunks: Whether to create empty chunks where the region is outside the existing chunks.
+            Raises KeyError for regions outside the existing chunks otherwise. Chunks created in lazily loaded maps are
+            kept in memory by the chunk mapping.
+        :type create_chunks: bool
+        :return: The keys of the chunks that changed
+        :rtype: list
+        """
+        rect = pygame.Rect(rect)
+        changed_chunks = []
+        if rect.width <= 0 or rect.height <= 0:
+            return changed_chunks
+        chunks = [(chunk_x, chunk_y)
+                  for chunk_y in range(rect.top // self.chunk_height, (rect.bottom - 1) // self.chunk_height + 1)
+                  for chunk_x in range(rect.left // self.chunk_width, (rect.right - 1) // self.chunk_width + 1)]
+        self._check_edited_chunks(chunks, layer_index, create_chunks)
+        for chunk_x, chunk_y in chunks:
+            chunk_rect = pygame.Rect(chunk_x * self.chunk_width, chunk_y * self.chunk_height,
+                                     self.chunk_width, self.chunk_height)
+            region = rect.clip(chunk_rect).move(-chunk_rect.x, -chunk_rect.y)
+            chunk = self._get_edited_chunk((chunk_x, chunk_y), layer_index, create_chunks)
+            layer = self.chunks[chunk]["layers"][layer_index]
+            if self.compact:
+                layer[region.top:region.bottom, region.left:region.right] = tile_id
+            else:
+                for y in range(region.top, region.bottom):
+                    layer[y][region.left:region.right] = [tile_id] * region.width
+            if self.chunks[chunk].get("flags") is not None:
+                for y in range(region.top, region.bottom):
+                    for x in range(region.left, region.right):
+                        self._set_tile_flags(chunk, layer_index, x, y, 0)
+            self._mark_dirty(chunk, layer_index, region)
+            changed_chunks.append(chunk)
+        return changed_chunks
+
+    def _check_edited_chunks(self, chunks, layer_index, create_chunks):
+        """Checks that every chunk of a bulk edit can be edited before any of them are, so a failed edit changes
+        nothing.
+
+        :param chunks: The (x, y) of each chunk
+        :type chunks: iterable
+        :param layer_index: The index of the layer to edit
+        :type layer_index: int
+        :param create_chunks: Whether missing chunks will be created
+        :type create_chunks: bool
+        :return: None
+        """
+        for chunk in chunks:
+            chunk = self._get_chunk_key(chunk)
+            if chunk not in self.chunks.keys():
+                if not create_chunks:
+                    raise KeyError(chunk)
+            elif not -len(self.chunks[chunk]["layers"]) <= layer_index < len(self.chunks[chunk]["layers"]):
+                raise IndexError("Chunk " + str(chunk) + " has no layer " + str(layer_index))
+
+    def _get_edited_chunk(self, chunk, layer_index, create_chunks):
+        """Gets the key of a chunk about to be edited, creating the chunk if needed.
+
+        :param chunk: The (x, y) of the chunk
+        :type chunk: tuple
+        :return: The chunk key
+        :rtype: str or tuple
+        """
+        chunk = self._get_chunk_key(chunk)
+        if chunk not in self.chunks.keys():
+            if not create_chunks:
+                raise KeyError(chunk)
+            layer_count = max(self.get_layer_count(), layer_index + 1)
+            if self.compact:
+                layers = [numpy.full((self.chunk_height, self.chunk_width), -1, dtype=self._get_tile_dtype())
+                          for _ in range(layer_count)]
+            else:
+                layers = [[[-1] * self.chunk_width for _ in range(self.chunk_height)] for _ in range(layer_count)]
+            self.chunks[chunk] = {"layers": layers}
+        return chunk
+
+    def _mark_dirty(self, chunk, layer_index, region):
+        """Records that tiles of a chunk changed so that the chunk is redrawn around them when next needed.
+
+        :param chunk: The chunk key
+        :type chunk: str or tuple
+        :param layer_index: The index of the layer that changed
+        :type layer_index: int
+        :param region: The changed tiles in the chunk
+        :type region: pygame.Rect
+        :return: None
+        """
+        self._edited_chunks.add(chunk)
+        future = self._prefetching.pop(chunk, None)
+        if future is not None:
+            future.cancel()
+        # Indexed again when next needed
+        self._animated_tiles.pop(chunk, None)
+        if self._chunk_surfaces.peek(chunk) is not None:
+            dirty_regions = self._dirty_regions.setdefault(chunk, {})
+            if layer_index in dirty_regions.keys():
+                region = dirty_regions[layer_index].union(region)
+            dirty_regions[layer_index] = region
+        for listener in self._tile_listeners:
+            listener(chunk, layer_index, None, None)
+
+    def _render_dirty_regions(self, chunk, chunk_surfaces):
+        """Redraws the regions of a rendered chunk changed by bulk edits.
+
+        :param chunk: The chunk key
+        :type chunk: str or tuple
+        :param chunk_surfaces: The rendered layers of the chunk
+        :type chunk_surfaces: list
+        :return: The redrawn chunk surfaces, or None if the chunk has to be rendered again because its layers
+            can no longer be merged the same way
+        :rtype: list
+        """
+        dirty_regions = self._dirty_regions.pop(chunk)
+        layers = self.chunks[chunk]["layers"]
+        flags = self.chunks[chunk].get("flags")
+        if flags is None:
+            flags = [None] * len(layers)
+        surface_runs = self._get_surface_runs(chunk_surfaces)
+        if len(chunk_surfaces) != len(layers) or (
+                self.flatten_layers and self._get_layer_runs(layers, self._get_animated_tiles(chunk)) != surface_runs):
+            self._on_chunk_evicted(chunk, self._chunk_surfaces.discard(chunk))
+            return None
+
+        fill = (0, 0, 0, 0) if self.colorkey is None else self.colorkey
+        for layer_index, region in dirty_regions.items():
+            run = next(layer_indices for layer_indices in surface_runs if layer_index in layer_indices)
+            surface = chunk_surfaces[run[0]]
+            surface.fill(fill, pygame.Rect(region.x * self.tile_width, region.y * self.tile_height,
+                                           region.width * self.tile_width, region.height * self.tile_height))
+            blit_sequence = []
+            for merged_layer in run:
+                blit_sequence.extend(self._get_layer_blits(layers[merged_layer], flags[merged_layer], region))
+            surface.blits(blit_sequence, doreturn=False)
+        return chunk_surfaces
+
+    @staticmethod
+    def _get_surface_runs(chunk_surfaces):
+        """Gets the layer indices drawn on each surface of a rendered chunk, which is a run of merged layers when
+        flattening layers.
+
+        :param chunk_surfaces: The rendered layers of the chunk
+        :type chunk_surfaces: list
+        :return: The layer indices of each run in order
+        :rtype: list
+        """
+        runs = []
+        for layer_index, surface in enumerate(chunk_surfaces):
+            if surface is None:
+                runs[-1].append(layer_index)
+            else:
+                runs.append([layer_index])
+        return runs
+
+    def add_tile_listener(self, listener):
+        """Adds a function to be called whenever tiles of the map change.
+        The listener is called with the chunk key, layer index, (x, y) position in the chunk and new tile id.
+        A position and tile id of None mean the whole chunk may have changed.
+
+        :param listener: The function to call
+        :type listener: callable
+        :return: The added listener
+        :rtype: callable
+        """
+        self._tile_listeners.append(listener)
+        return listener
+
+    def remove_tile_listener(self, listener):
+        """Stops calling a function when tiles of the map change.
+
+        :param listener: The function added with add_tile_listener
+        :type listener: callable
+        :return: None
+        """
+        if listener in self._tile_listeners:
+            self._tile_listeners.remove(listener)
+
+    def set_animation_clock(self, animation_clock):
+        """Sets the clock that times the tile animations, unregistering them from the previous one.
+        Pass None to go back to counting frames, e.g. before discarding a map whose clock is shared with other maps.
+
+        :param animation_clock: The clock, or None
+        :type animation_clock: AnimationClock
+        :return: None
+        """
+        if self.animation_clock is not None:
+            for animation in self._animations.values():
+                self.animation_clock.unregister(animation)
+        self.animation_clock = animation_clock
+        if animation_clock is not None:
+            self._clock_tick = animation_clock.ticks
+            for animation in self._animations.values():
+                animation_clock.register(animation)
+        # Any keyframe changes not yet caught up on are lost, so every animated tile is redrawn
+        for tile_id in self._animation_versions.keys():
+            self._animation_versions[tile_id] += 1
 
-    def update_animations(self):
+    def update_animations(self, delta=None):
         """Updates all animated tiles in the tileset.
+        Without an animation clock, each call advances the animations by a frame. With one, the clock is ticked by
+        delta if given, and the tiles catch up with every keyframe change since the last update. Pass no delta if the
+        shared clock is ticked elsewhere.
 
+        :param delta: The (optional) number of milliseconds to tick the animation clock by
+        :type delta: float
         :return: None
         """
-        for animation in self._animations.values():
-            animation.update()
+        if self.animation_clock is None:
+            for tile_id, animation in self._animations.items():
+                if animation.update():
+                    self._animation_versions[tile_id] += 1
+            return
+        if delta is not None:
+            self.animation_clock.tick(delta)
+        tile_ids = self._animation_tile_ids
+        for animation in self.animation_clock.get_changed_since(self._clock_tick):
+            if animation in tile_ids.keys():
+                self._animation_versions[tile_ids[animation]] += 1
+        self._clock_tick = self.animation_clock.ticks